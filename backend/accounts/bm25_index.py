@@ -0,0 +1,198 @@
+"""
+Persistent BM25 inverted index over DocumentChunk.bm25_tokens
+Term frequencies are computed once at ingest time; queries only fetch the
+postings for their own terms through the GIN index on bm25_tokens. Stopwords
+never become postings, and terms that occur in most of the searched chunks are
+dropped from queries, so a typical question never turns into a corpus scan
+"""
+
+import logging
+import math
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from django.db.models import Avg, Count, F, Func, IntegerField, TextField, Value
+from django.db.models.functions import Cast
+
+from accounts.esrs_classifier import TopicPrefilter
+from accounts.vector_models import DocumentChunk
+
+logger = logging.getLogger(__name__)
+
+# Function words of the document languages (English, Slovenian) - no BM25 weight, huge postings lists
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he
+her here hers him his how i if in into is it its itself just me more most my no nor not now of off on
+once only or other our ours out over own same she should so some such than that the their theirs them
+then there these they this those through to too under until up very was we were what when where which
+while who whom why will with would you your yours
+ali bi bil bila bilo bo bodo da do ga ima in iz je jih jo ki kaj kako kar ko kot le med mu na nad naj ne
+ni niso o ob od pa po pod pri s sa se so ta tako te ter tudi v vse za z že
+""".split())
+
+# Terms found in more than this share of the searched chunks are dropped from queries
+# (almost no idf weight, but their postings cover most of the corpus)
+MAX_DOC_FREQ_RATIO = 0.5
+
+# Below this many chunks every term is kept - scanning the postings is cheap anyway
+MIN_CORPUS_FOR_DF_CUT = 200
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokenizer shared by ingest and query time (lowercase whitespace split, stopwords removed)"""
+    return [token for token in text.lower().split() if token not in STOPWORDS]
+
+
+def term_frequencies(text: str) -> Dict[str, int]:
+    """Build the bm25_tokens postings payload for a chunk"""
+    return dict(Counter(tokenize(text)))
+
+
+class BM25Index:
+    """
+    BM25 scoring backed by postings stored in Postgres
+
+    Corpus statistics (chunk count, average length, document frequency) are
+    computed for the selected documents only, so scores match a BM25 index
+    built over exactly those chunks.
+    """
+
+    def __init__(
+        self,
+        document_ids: List[int],
+        k1: float = 1.5,
+        b: float = 0.75,
+        corpus_stats: Optional[Tuple[int, float]] = None,
+        prefilter: Optional[TopicPrefilter] = None
+    ):
+        """
+        Args:
+            document_ids: Documents that form the corpus
+            k1: Term frequency saturation parameter
+            b: Length normalization parameter
+            corpus_stats: Precomputed (chunk count, average length), e.g. from a snapshot
+            prefilter: Only the chunks a topic prefilter keeps
+        """
+        self.document_ids = list(document_ids)
+        self.prefilter = prefilter
+        self.k1 = k1
+        self.b = b
+
+        if corpus_stats is None:
+            stats = self._chunks().aggregate(total=Count('id'), avgdl=Avg('word_count'))
+            corpus_stats = (stats['total'] or 0, stats['avgdl'] or 0)
+
+        self.corpus_size, self.avgdl = corpus_stats
+        self._term_selective: Dict[str, bool] = {}
+
+    def get_scores(self, query: str) -> Dict[int, float]:
+        """BM25 scores for one query: {chunk_id: score} (chunks without matches are omitted)"""
+        return self.get_batch_scores([query])[0]
+
+    def get_batch_scores(self, queries: List[str]) -> List[Dict[int, float]]:
+        """
+        Score several queries with a single postings lookup
+
+        Returns:
+            One {chunk_id: score} dict per query, in query order
+        """
+        if not self.corpus_size:
+            return [{} for _ in queries]
+
+        query_terms = [list(dict.fromkeys(tokenize(query))) for query in queries]
+        selective = set(self._selective_terms({term for terms in query_terms for term in terms}))
+        query_terms = [[term for term in terms if term in selective] for terms in query_terms]
+        all_terms = list(dict.fromkeys(term for terms in query_terms for term in terms))
+
+        if not all_terms:
+            return [{} for _ in queries]
+
+        postings = self._fetch_postings(all_terms)
+
+        # Document frequency of each term within this corpus
+        doc_freqs = Counter()
+        for _, _, tfs in postings:
+            for term, tf in tfs.items():
+                if tf:
+                    doc_freqs[term] += 1
+
+        idf = {
+            term: math.log((self.corpus_size - df + 0.5) / (df + 0.5) + 1)
+            for term, df in doc_freqs.items()
+        }
+
+        results = []
+        for terms in query_terms:
+            scores = {}
+            for chunk_id, doc_len, tfs in postings:
+                score = 0.0
+                for term in terms:
+                    tf = tfs.get(term)
+                    if not tf:
+                        continue
+                    numerator = tf * (self.k1 + 1)
+                    denominator = tf + self.k1 * (1 - self.b + self.b * (doc_len / self.avgdl))
+                    score += idf[term] * (numerator / denominator)
+                if score:
+                    scores[chunk_id] = score
+            results.append(scores)
+
+        return results
+
+    def _chunks(self):
+        chunks = DocumentChunk.objects.filter(document_id__in=self.document_ids)
+        if self.prefilter:
+            chunks = chunks.filter(self.prefilter.condition())
+        return chunks
+
+    def _selective_terms(self, terms) -> List[str]:
+        """
+        Terms whose document frequency is at most MAX_DOC_FREQ_RATIO of the corpus
+
+        Each check counts at most max_df + 1 postings (LIMIT inside the count),
+        so a very common term costs a bounded probe instead of a full pass.
+        """
+        if self.corpus_size < MIN_CORPUS_FOR_DF_CUT:
+            return list(terms)
+
+        max_df = int(self.corpus_size * MAX_DOC_FREQ_RATIO)
+        for term in terms:
+            if term not in self._term_selective:
+                probe = self._chunks().filter(bm25_tokens__has_key=term)[:max_df + 1]
+                self._term_selective[term] = probe.count() <= max_df
+                if not self._term_selective[term]:
+                    logger.debug(f"[BM25] Dropping common term '{term}' (in over {max_df} chunks)")
+        return [term for term in terms if self._term_selective[term]]
+
+    def _fetch_postings(self, terms: List[str]) -> List[tuple]:
+        """
+        Fetch (chunk_id, length, {term: tf}) for chunks containing any of the terms
+        Only the requested term frequencies are read from the JSON column
+        (jsonb_extract_path_text always treats the term as an object key, so
+        numeric terms such as years are not turned into array indexes)
+        """
+        annotations = {
+            f'tf_{i}': Cast(
+                Func(F('bm25_tokens'), Value(term, output_field=TextField()),
+                     function='jsonb_extract_path_text', output_field=TextField()),
+                IntegerField()
+            )
+            for i, term in enumerate(terms)
+        }
+
+        rows = self._chunks().filter(
+            bm25_tokens__has_any_keys=terms
+        ).annotate(**annotations).values('id', 'word_count', *annotations.keys())
+
+        postings = []
+        for row in rows:
+            tfs = {
+                term: row[f'tf_{i}']
+                for i, term in enumerate(terms)
+                if row[f'tf_{i}']
+            }
+            postings.append((row['id'], row['word_count'], tfs))
+
+        logger.debug(f"[BM25] {len(postings)} postings for {len(terms)} terms")
+        return postings
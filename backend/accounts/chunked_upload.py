@@ -0,0 +1,148 @@
+"""
+Resumable multipart document uploads
+init -> append parts at the current offset -> complete. Parts are written
+straight to a partial file on disk, so no request holds more than one part
+and a dropped connection resumes from DocumentUpload.received_bytes. Complete
+verifies size and SHA-256 before the file is moved into document storage
+"""
+
+import hashlib
+import logging
+import os
+from typing import BinaryIO, Optional
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from accounts.models import Document, DocumentUpload
+
+logger = logging.getLogger(__name__)
+
+# Suggested part size returned by init (clients may send smaller parts)
+UPLOAD_PART_SIZE = 8 * 1024 * 1024
+
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+class UploadOffsetMismatch(ValueError):
+    """Part does not start at the upload's current offset"""
+
+    def __init__(self, received_bytes: int):
+        super().__init__(f"Part must start at offset {received_bytes}")
+        self.received_bytes = received_bytes
+
+
+def partial_path(upload: DocumentUpload) -> str:
+    return os.path.join(settings.MEDIA_ROOT, 'uploads', 'partial', f'{upload.upload_id}.part')
+
+
+def init_upload(user, file_name: str, file_size: int, sha256: str, file_type: str = '', is_global: bool = False) -> DocumentUpload:
+    from accounts.document_parser import get_supported_formats_message, is_supported_format
+
+    file_name = os.path.basename(file_name)
+    if not is_supported_format(file_name):
+        raise ValueError(f"Unsupported file format. {get_supported_formats_message()}")
+    if file_size <= 0 or file_size > settings.DOCUMENT_UPLOAD_MAX_SIZE:
+        raise ValueError(f"File size must be between 1 byte and {settings.DOCUMENT_UPLOAD_MAX_SIZE} bytes")
+    if len(sha256) != 64:
+        raise ValueError("sha256 must be a hex SHA-256 digest")
+
+    return DocumentUpload.objects.create(
+        user=user,
+        file_name=file_name,
+        file_size=file_size,
+        file_type=file_type,
+        sha256=sha256.lower(),
+        is_global=is_global
+    )
+
+
+def append_part(upload_id, user, offset: int, stream: BinaryIO, part_sha256: Optional[str] = None) -> int:
+    """
+    Append one part read from stream at offset
+
+    The part is hashed while it is written; on a checksum or size error the
+    partial file is truncated back to offset, so the client can resend it.
+
+    Returns:
+        Bytes received so far
+    """
+    with transaction.atomic():
+        upload = DocumentUpload.objects.select_for_update().get(upload_id=upload_id, user=user, status='uploading')
+        if offset != upload.received_bytes:
+            raise UploadOffsetMismatch(upload.received_bytes)
+
+        path = partial_path(upload)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        digest = hashlib.sha256()
+        written = 0
+
+        with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+            f.seek(offset)
+            f.truncate()
+            for block in iter(lambda: stream.read(READ_BLOCK_SIZE), b''):
+                written += len(block)
+                if offset + written > upload.file_size:
+                    f.truncate(offset)
+                    raise ValueError(f"Part exceeds declared file size {upload.file_size}")
+                digest.update(block)
+                f.write(block)
+
+            if part_sha256 and digest.hexdigest() != part_sha256.lower():
+                f.truncate(offset)
+                raise ValueError("Part checksum mismatch")
+
+        upload.received_bytes = offset + written
+        upload.save(update_fields=['received_bytes', 'updated_at'])
+        return upload.received_bytes
+
+
+def complete_upload(upload_id, user) -> Document:
+    """
+    Verify size and checksum, move the file into the user's document folder
+    and create its Document (the caller starts RAG processing)
+    """
+    with transaction.atomic():
+        upload = DocumentUpload.objects.select_for_update().get(upload_id=upload_id, user=user, status='uploading')
+        path = partial_path(upload)
+        if upload.received_bytes != upload.file_size or not os.path.exists(path):
+            raise ValueError(f"Upload incomplete: {upload.received_bytes}/{upload.file_size} bytes")
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(READ_BLOCK_SIZE), b''):
+                digest.update(block)
+        if digest.hexdigest() != upload.sha256.lower():
+            raise ValueError("File checksum mismatch")
+
+        with open(path, 'rb') as f:
+            saved_path = default_storage.save(
+                f"documents/user_{upload.user_id}/{upload.file_name}", File(f, name=upload.file_name)
+            )
+
+        document = Document.objects.create(
+            user=upload.user,
+            file_name=upload.file_name,
+            file_path=saved_path,
+            file_size=upload.file_size,
+            file_type=upload.file_type,
+            is_global=upload.is_global
+        )
+        upload.status = 'completed'
+        upload.document = document
+        upload.save(update_fields=['status', 'document', 'updated_at'])
+
+    os.remove(path)
+    logger.info(f"[ChunkedUpload] {upload.upload_id} complete: {upload.file_size} bytes -> {saved_path}")
+    return document
+
+
+def abort_upload(upload_id, user):
+    upload = DocumentUpload.objects.get(upload_id=upload_id, user=user, status='uploading')
+    path = partial_path(upload)
+    if os.path.exists(path):
+        os.remove(path)
+    upload.status = 'aborted'
+    upload.save(update_fields=['status', 'updated_at'])
@@ -0,0 +1,113 @@
+"""
+Precomputed retrieval query embeddings for ESRS / ISO disclosures
+The disclosure catalog is static reference data shared by all tenants, so each
+disclosure's query text is embedded once per active embedding model instead of
+on every AI answer run
+"""
+
+import hashlib
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from accounts.embedding_service import EmbeddingService, shared_embedding_service
+from accounts.vector_models import DisclosureQueryEmbedding, EmbeddingModel
+
+logger = logging.getLogger(__name__)
+
+# Texts per embedding request when precomputing
+PRECOMPUTE_BATCH_SIZE = 100
+
+
+def disclosure_query_text(disclosure) -> str:
+    """Retrieval query used for AI answers: code + name + requirement (or custom prompt)"""
+    requirement = disclosure.ai_prompt if disclosure.ai_prompt else disclosure.requirement_text
+    return f"{disclosure.code} {disclosure.name} {requirement}"
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def lookup_query_embeddings(provider: str, model: str, queries: List[str]) -> Dict[str, List[float]]:
+    """Precomputed embeddings for any of the queries: {query: embedding} (one DB round trip)"""
+    hashes = {content_hash(query): query for query in queries}
+    rows = DisclosureQueryEmbedding.objects.filter(
+        provider=provider,
+        model_id=model,
+        content_hash__in=list(hashes)
+    ).values_list('content_hash', 'embedding')
+    return {hashes[digest]: embedding.tolist() for digest, embedding in rows}
+
+
+def active_embedding_services() -> List[EmbeddingService]:
+    """Embedding services for every active model that has an API key configured (or runs locally)"""
+    services = []
+    for model_obj in EmbeddingModel.objects.filter(is_active=True).order_by('-is_default'):
+        if not EmbeddingService.has_credentials(model_obj.provider):
+            continue
+        try:
+            services.append(shared_embedding_service(provider=model_obj.provider, model=model_obj.model_id))
+        except Exception as e:
+            logger.warning(f"[DisclosureEmbeddings] Skipping {model_obj.provider}/{model_obj.model_id}: {e}")
+    return services
+
+
+def precompute_disclosure_embeddings(
+    disclosures: Optional[Iterable] = None,
+    services: Optional[List[EmbeddingService]] = None,
+    batch_size: int = PRECOMPUTE_BATCH_SIZE
+) -> Dict[str, int]:
+    """
+    Embed disclosure query texts that have no stored embedding yet
+
+    Args:
+        disclosures: ESRSDisclosure objects (default: all)
+        services: Embedding services (default: all active models with an API key)
+        batch_size: Texts per embedding request
+
+    Returns:
+        {'provider/model': number of new embeddings}
+    """
+    from accounts.models import ESRSDisclosure
+
+    if disclosures is None:
+        disclosures = ESRSDisclosure.objects.only('id', 'code', 'name', 'requirement_text', 'ai_prompt')
+    if services is None:
+        services = active_embedding_services()
+
+    # One row per distinct query text
+    queries = {}
+    for disclosure in disclosures:
+        text = disclosure_query_text(disclosure)
+        queries.setdefault(content_hash(text), (disclosure.id, text))
+
+    created = {}
+    for service in services:
+        existing = set(DisclosureQueryEmbedding.objects.filter(
+            provider=service.provider,
+            model_id=service.model,
+            content_hash__in=list(queries)
+        ).values_list('content_hash', flat=True))
+
+        missing = [(digest, *queries[digest]) for digest in queries if digest not in existing]
+        label = f"{service.provider}/{service.model}"
+        logger.info(f"[DisclosureEmbeddings] {label}: {len(missing)} of {len(queries)} queries need embeddings")
+
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            embeddings = service.embed_batch([text for _, _, text in batch])
+            DisclosureQueryEmbedding.objects.bulk_create([
+                DisclosureQueryEmbedding(
+                    disclosure_id=disclosure_id,
+                    provider=service.provider,
+                    model_id=service.model,
+                    content_hash=digest,
+                    query_text=text,
+                    embedding=embedding
+                )
+                for (digest, disclosure_id, text), embedding in zip(batch, embeddings)
+            ], ignore_conflicts=True)
+
+        created[label] = len(missing)
+
+    return created
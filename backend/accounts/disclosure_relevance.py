@@ -0,0 +1,174 @@
+"""
+Ingest-time disclosure relevance matrix
+When a document finishes RAG processing its chunks are scored against every
+precomputed disclosure query embedding in one matrix product; the top-k chunks
+of each document are stored as (disclosure, chunk, score) rows so AI answer
+tasks read their candidate set with one index range scan instead of running a
+full-corpus search
+"""
+
+import logging
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from django.db import transaction
+
+from accounts.disclosure_embeddings import content_hash, disclosure_query_text
+from accounts.embedding_service import EmbeddingService
+from accounts.vector_models import DisclosureQueryEmbedding, DisclosureRelevance
+
+logger = logging.getLogger(__name__)
+
+# Candidate chunks kept per (user, disclosure, document) - any selection of
+# documents still has up to k candidates from each of them
+RELEVANCE_TOP_K = 50
+
+
+def disclosure_embedding_matrix(provider: str, model: str):
+    """
+    Current query embeddings of all disclosures for one embedding model
+
+    Returns:
+        (disclosure_ids, (Dn, D) normalized float32 matrix)
+    """
+    from accounts.models import ESRSDisclosure
+
+    # Disclosures with identical query text share one embedding row
+    current_hashes = {}
+    for disclosure in ESRSDisclosure.objects.only('id', 'code', 'name', 'requirement_text', 'ai_prompt'):
+        current_hashes.setdefault(content_hash(disclosure_query_text(disclosure)), []).append(disclosure.id)
+    rows = list(DisclosureQueryEmbedding.objects.filter(
+        provider=provider,
+        model_id=model,
+        content_hash__in=list(current_hashes)
+    ).values_list('content_hash', 'embedding'))
+
+    if not rows:
+        return [], np.zeros((0, 0), dtype=np.float32)
+
+    disclosure_ids, embeddings = [], []
+    for digest, embedding in rows:
+        for disclosure_id in current_hashes[digest]:
+            disclosure_ids.append(disclosure_id)
+            embeddings.append(embedding)
+    matrix = EmbeddingService.normalize_rows(np.stack(embeddings))
+    return disclosure_ids, matrix
+
+
+class DocumentRelevance:
+    """
+    Running top_k chunks of one document per disclosure
+
+    Chunks are added in batches as they are embedded, so a large document
+    never needs all its chunk vectors in memory; save() then replaces the
+    document's relevance rows.
+    """
+
+    def __init__(self, provider: str, model: str, top_k: int = RELEVANCE_TOP_K):
+        self.embedding_model = f"{provider}/{model}"
+        self.top_k = top_k
+        self.disclosure_ids, self.disclosure_matrix = disclosure_embedding_matrix(provider, model)
+        # (Dn, <=k) best chunk ids and similarities so far
+        self.chunk_ids = np.zeros((len(self.disclosure_ids), 0), dtype=np.int64)
+        self.scores = np.zeros((len(self.disclosure_ids), 0), dtype=np.float32)
+        self.chunks_scored = 0
+
+    def add(self, chunk_ids: Sequence[int], chunk_embeddings: Sequence[Optional[Sequence[float]]]):
+        embedded = [(chunk_id, emb) for chunk_id, emb in zip(chunk_ids, chunk_embeddings) if emb is not None]
+        if not embedded or not self.disclosure_ids:
+            return
+
+        batch_ids = np.array([chunk_id for chunk_id, _ in embedded], dtype=np.int64)
+        chunk_matrix = EmbeddingService.normalize_rows(np.stack([emb for _, emb in embedded]))
+
+        # (Dn, Nb) similarities for every disclosure against every new chunk, merged with the kept ones
+        scores = np.concatenate([self.scores, self.disclosure_matrix @ chunk_matrix.T], axis=1)
+        ids = np.concatenate(
+            [self.chunk_ids, np.broadcast_to(batch_ids, (len(self.disclosure_ids), len(batch_ids)))], axis=1
+        )
+        k = min(self.top_k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        self.scores = np.take_along_axis(scores, top, axis=1)
+        self.chunk_ids = np.take_along_axis(ids, top, axis=1)
+        self.chunks_scored += len(embedded)
+
+    def save(self, user_id: int, document_id: int) -> int:
+        """
+        Replace the document's relevance rows with its current top_k chunks per disclosure
+
+        Other documents' rows are not touched, so concurrent ingests of different
+        documents do not interfere.
+
+        Returns:
+            Number of rows written
+        """
+        if not self.chunks_scored:
+            return 0
+
+        rows = [
+            DisclosureRelevance(
+                user_id=user_id,
+                disclosure_id=disclosure_id,
+                document_id=document_id,
+                chunk_id=int(chunk_id),
+                score=float(score),
+                embedding_model=self.embedding_model
+            )
+            for row_idx, disclosure_id in enumerate(self.disclosure_ids)
+            for chunk_id, score in zip(self.chunk_ids[row_idx], self.scores[row_idx])
+        ]
+
+        with transaction.atomic():
+            DisclosureRelevance.objects.filter(document_id=document_id).delete()
+            # A concurrent run for the same document may have written the same chunks
+            DisclosureRelevance.objects.bulk_create(rows, batch_size=2000, ignore_conflicts=True)
+
+        logger.info(
+            f"[Relevance] Document {document_id}: scored {self.chunks_scored} chunks against "
+            f"{len(self.disclosure_ids)} disclosures for user {user_id}"
+        )
+        return len(rows)
+
+
+def disclosure_candidates(
+    user_id: int,
+    disclosure_id: int,
+    document_ids: List[int],
+    embedding_model: Optional[str] = None,
+    min_candidates: int = RELEVANCE_TOP_K
+) -> Optional[Dict[int, float]]:
+    """
+    Precomputed candidate chunks for a disclosure, restricted to the given documents
+
+    Returns None (caller runs the full search) when any of the processed
+    documents has no rows for the disclosure yet (rows go away with the chunks
+    they point to, so a reprocessed document is uncovered until its new rows
+    land), when rows were scored with another embedding model, or when fewer
+    than min_candidates chunks are found (the full search is cheap for such
+    small selections and loses no recall).
+
+    Returns:
+        {chunk_id: cosine similarity} best first
+    """
+    from accounts.models import Document
+
+    rows = list(
+        DisclosureRelevance.objects.filter(
+            user_id=user_id, disclosure_id=disclosure_id, document_id__in=document_ids
+        ).order_by('-score').values_list('chunk_id', 'document_id', 'score', 'embedding_model')
+    )
+    if embedding_model and any(row_model != embedding_model for *_, row_model in rows):
+        return None
+
+    covered = {document_id for _, document_id, _, _ in rows}
+    completed = Document.objects.filter(id__in=document_ids, rag_processing_status='completed').values_list('id', flat=True)
+    for document_id in completed:
+        if document_id not in covered:
+            logger.info(f"[Relevance] Disclosure {disclosure_id}: document {document_id} not covered - full search")
+            return None
+
+    candidates = {chunk_id: score for chunk_id, _, score, _ in rows}
+    if len(candidates) < min_candidates:
+        logger.info(f"[Relevance] Disclosure {disclosure_id}: only {len(candidates)} candidates - full search")
+        return None
+    return candidates
@@ -4,7 +4,7 @@ Supported formats: PDF, Word, Excel, CSV, TXT, Images (OCR)
 """
 
 import logging
-from typing import Tuple
+from typing import Iterator, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -29,36 +29,156 @@ def get_supported_formats_message() -> str:
     return f"Supported formats: {', '.join(formats).upper()}"
 
 
-def extract_text_from_pdf_with_ocr(file_path: str) -> str:
+# PDF extraction: pages are split into shards handled by a bounded process pool.
+# Scanned pages are rendered a few at a time (never the whole document) and their
+# OCR text is cached per page, keyed by file content hash
+PDF_PAGES_PER_SHARD = 25
+OCR_PAGES_PER_SHARD = 8
+OCR_RENDER_BATCH = 4
+OCR_DPI = 200
+
+
+def _pdf_workers() -> int:
+    import os
+    from django.conf import settings
+
+    return max(1, getattr(settings, 'PDF_EXTRACT_WORKERS', 0) or min(4, os.cpu_count() or 1))
+
+
+def _run_shards(fn, shards: list) -> list:
     """
-    Extract text from image-based PDF using OCR
-    Converts PDF pages to images and applies OCR to each page
+    fn(*shard) for each shard, in a process pool when there is more than one
+    Falls back to running in-process where child processes cannot be started
     """
-    try:
-        from pdf2image import convert_from_path
-        from PIL import Image
-        import pytesseract
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = min(_pdf_workers(), len(shards))
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                return list(pool.map(fn, *zip(*shards)))
+        except (AssertionError, OSError, NotImplementedError) as e:
+            # e.g. daemonic worker processes may not have children
+            logger.warning(f'PDF process pool unavailable ({e}), extracting in-process')
+    return [fn(*shard) for shard in shards]
 
-        logger.info(f'Converting PDF to images for OCR: {file_path}')
 
-        # Convert PDF to list of images (one per page)
-        images = convert_from_path(file_path)
+def _file_hash(file_path: str) -> str:
+    import hashlib
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _ocr_cache_path(file_hash: str, page_num: int) -> str:
+    import os
+    from django.conf import settings
+
+    return os.path.join(settings.MEDIA_ROOT, 'ocr_cache', file_hash[:2], file_hash, f'p{page_num}_{OCR_DPI}.txt')
+
+
+def _read_ocr_cache(file_hash: str, page_num: int):
+    try:
+        with open(_ocr_cache_path(file_hash, page_num), 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
 
-        text_content = []
-        for page_num, image in enumerate(images, start=1):
-            logger.info(f'Running OCR on page {page_num}/{len(images)}')
 
-            # Extract text using OCR
+def _write_ocr_cache(file_hash: str, page_num: int, text: str):
+    import os
+
+    path = _ocr_cache_path(file_hash, page_num)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f'Failed to cache OCR text for page {page_num}: {e}')
+
+
+def _extract_pdf_text_range(file_path: str, first_page: int, last_page: int) -> list:
+    """[(page number, text)] for pages first_page..last_page (1-based, inclusive)"""
+    import PyPDF2
+
+    pages = []
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page_num in range(first_page, last_page + 1):
+            try:
+                text = pdf_reader.pages[page_num - 1].extract_text() or ''
+            except Exception as e:
+                logger.warning(f'Text extraction failed on PDF page {page_num}: {e}')
+                text = ''
+            pages.append((page_num, text))
+    return pages
+
+
+def _ocr_pdf_pages(file_path: str, file_hash: str, page_numbers: list) -> list:
+    """[(page number, OCR text)] rendering up to OCR_RENDER_BATCH consecutive pages per call"""
+    from pdf2image import convert_from_path
+    import pytesseract
+
+    results = []
+    batch_start = 0
+    while batch_start < len(page_numbers):
+        batch_end = batch_start + 1
+        while (batch_end < len(page_numbers) and batch_end - batch_start < OCR_RENDER_BATCH
+               and page_numbers[batch_end] == page_numbers[batch_end - 1] + 1):
+            batch_end += 1
+        first_page, last_page = page_numbers[batch_start], page_numbers[batch_end - 1]
+
+        images = convert_from_path(file_path, dpi=OCR_DPI, first_page=first_page, last_page=last_page)
+        for page_num, image in zip(range(first_page, last_page + 1), images):
             text = pytesseract.image_to_string(image)
+            _write_ocr_cache(file_hash, page_num, text)
+            results.append((page_num, text))
+            image.close()
+        batch_start = batch_end
 
-            if text.strip():
-                text_content.append(f"--- Page {page_num} ---\n{text}")
+    return results
 
-        if not text_content:
-            return "[No text detected in PDF using OCR]"
 
-        logger.info(f'Successfully extracted text from {len(images)} pages using OCR')
-        return '\n\n'.join(text_content)
+def extract_text_from_pdf_with_ocr(file_path: str, page_numbers: list = None, file_hash: str = None) -> dict:
+    """
+    Extract text from image-based PDF pages using OCR
+    Renders only the requested pages (default: all) a few at a time and reuses
+    per-page OCR text cached by earlier runs
+
+    Returns:
+        {page number: text}
+    """
+    try:
+        if page_numbers is None:
+            import PyPDF2
+            with open(file_path, 'rb') as file:
+                page_numbers = list(range(1, len(PyPDF2.PdfReader(file).pages) + 1))
+        file_hash = file_hash or _file_hash(file_path)
+
+        texts = {}
+        missing = []
+        for page_num in page_numbers:
+            cached = _read_ocr_cache(file_hash, page_num)
+            if cached is None:
+                missing.append(page_num)
+            else:
+                texts[page_num] = cached
+
+        logger.info(f'Running OCR on {len(missing)} PDF pages ({len(texts)} cached): {file_path}')
+
+        shards = [
+            (file_path, file_hash, missing[i:i + OCR_PAGES_PER_SHARD])
+            for i in range(0, len(missing), OCR_PAGES_PER_SHARD)
+        ]
+        for shard_pages in _run_shards(_ocr_pdf_pages, shards):
+            texts.update(shard_pages)
+
+        return texts
 
     except ImportError as e:
         logger.error(f'OCR dependencies not available: {str(e)}')
@@ -72,27 +192,40 @@ def extract_text_from_pdf_with_ocr(file_path: str) -> str:
 
 
 def extract_text_from_pdf(file_path: str) -> str:
-    """Extract text from PDF file (with OCR fallback for image-based PDFs)"""
+    """Extract text from PDF file (with OCR fallback for pages without a text layer)"""
     try:
         import PyPDF2
 
-        text_content = []
         with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            num_pages = len(pdf_reader.pages)
-
-            logger.info(f'Extracting text from PDF: {num_pages} pages')
-
-            for page_num in range(num_pages):
-                page = pdf_reader.pages[page_num]
-                text = page.extract_text()
-                if text.strip():
-                    text_content.append(f"--- Page {page_num + 1} ---\n{text}")
-
-        # If no text was extracted, try OCR (image-based PDF)
-        if not text_content:
-            logger.info('No text extracted with PyPDF2, attempting OCR on PDF pages')
-            return extract_text_from_pdf_with_ocr(file_path)
+            num_pages = len(PyPDF2.PdfReader(file).pages)
+
+        logger.info(f'Extracting text from PDF: {num_pages} pages')
+
+        shards = [
+            (file_path, first, min(first + PDF_PAGES_PER_SHARD - 1, num_pages))
+            for first in range(1, num_pages + 1, PDF_PAGES_PER_SHARD)
+        ]
+        page_texts = dict(page for shard in _run_shards(_extract_pdf_text_range, shards) for page in shard)
+
+        # OCR only the pages that came back empty (scanned pages)
+        empty_pages = [page_num for page_num, text in sorted(page_texts.items()) if not text.strip()]
+        if empty_pages:
+            logger.info(f'No text on {len(empty_pages)}/{num_pages} PDF pages, attempting OCR')
+            try:
+                page_texts.update(extract_text_from_pdf_with_ocr(file_path, empty_pages))
+            except Exception as e:
+                # Fully scanned document - nothing to fall back to
+                if len(empty_pages) == num_pages:
+                    raise
+                logger.warning(f'OCR failed, keeping text of {num_pages - len(empty_pages)} pages: {e}')
+
+        text_content = [
+            f"--- Page {page_num} ---\n{text}"
+            for page_num, text in sorted(page_texts.items())
+            if text.strip()
+        ]
+        if not text_content and empty_pages:
+            return "[No text detected in PDF using OCR]"
 
         return '\n\n'.join(text_content)
 
@@ -115,12 +248,20 @@ def extract_text_from_word(file_path: str) -> str:
             if paragraph.text.strip():
                 text_content.append(paragraph.text)
         
-        # Extract text from tables
-        for table in doc.tables:
+        # Extract text from tables - one block per table, first row as the header line
+        # (same layout as spreadsheet sheets, so the table chunker keeps rows whole)
+        for table_num, table in enumerate(doc.tables, start=1):
+            rows = []
             for row in table.rows:
-                row_text = ' | '.join(cell.text.strip() for cell in row.cells)
-                if row_text.strip():
-                    text_content.append(row_text)
+                row_text = ' | '.join(' '.join(cell.text.split()) for cell in row.cells)
+                if row_text.strip(' |'):
+                    rows.append(row_text)
+            if rows:
+                text_content.append(
+                    f"=== TABLE: Table {table_num} ===\n{rows[0]}\n{'-' * min(len(rows[0]), 120)}\n"
+                    + '\n'.join(rows[1:])
+                    + f"\n=== END OF TABLE: Table {table_num} ==="
+                )
         
         return '\n\n'.join(text_content)
     
@@ -129,43 +270,102 @@ def extract_text_from_word(file_path: str) -> str:
         raise Exception(f'Failed to extract text from Word document: {str(e)}')
 
 
+# Spreadsheet/CSV rows are read and rendered in batches (bounded memory, no row cap)
+ROW_BATCH_SIZE = 5000
+
+
+def _render_rows(frame) -> str:
+    """'a | b | c' line per row, concatenated column-wise"""
+    if frame.empty:
+        return ''
+    cells = frame.fillna('').astype(str)
+    lines = cells.iloc[:, 0]
+    if cells.shape[1] > 1:
+        lines = lines.str.cat([cells.iloc[:, i] for i in range(1, cells.shape[1])], sep=' | ')
+    return '\n'.join(lines) + '\n'
+
+
+def _sheet_header(sheet_name: str, headers: list) -> str:
+    header_line = ' | '.join('' if col is None else str(col) for col in headers)
+    return (
+        f"\n\n{'='*80}\n=== SHEET: {sheet_name} ===\n{'='*80}\n\n"
+        + header_line + '\n' + '-' * min(len(header_line), 120) + '\n'
+    )
+
+
+def _sheet_footer(sheet_name: str) -> str:
+    # End marker preserves sheet boundaries
+    return f"\n{'='*80}\n=== END OF SHEET: {sheet_name} ===\n{'='*80}\n\n"
+
+
+def iter_excel_text(file_path: str) -> Iterator[str]:
+    """
+    Text of an Excel file in blocks: per sheet a header block, then row batches
+    .xlsx is streamed with openpyxl read_only; legacy .xls goes through pandas (one read per sheet)
+    """
+    import pandas as pd
+
+    if file_path.lower().endswith('.xls'):
+        excel_file = pd.ExcelFile(file_path)
+        logger.info(f'Extracting text from Excel: {len(excel_file.sheet_names)} sheets')
+        for index, sheet_name in enumerate(excel_file.sheet_names):
+            df = excel_file.parse(sheet_name)
+            yield ('\n\n' if index else '') + _sheet_header(sheet_name, list(df.columns))
+            for start in range(0, len(df), ROW_BATCH_SIZE):
+                yield _render_rows(df.iloc[start:start + ROW_BATCH_SIZE])
+            yield _sheet_footer(sheet_name)
+        return
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        logger.info(f'Extracting text from Excel: {len(workbook.sheetnames)} sheets')
+        for index, sheet in enumerate(workbook.worksheets):
+            rows = sheet.iter_rows(values_only=True)
+            headers = next(rows, ())
+            yield ('\n\n' if index else '') + _sheet_header(sheet.title, list(headers))
+
+            row_count = 0
+            batch = []
+            for row in rows:
+                if any(value is not None for value in row):
+                    batch.append(row)
+                if len(batch) >= ROW_BATCH_SIZE:
+                    yield _render_rows(pd.DataFrame(batch))
+                    row_count += len(batch)
+                    batch = []
+            if batch:
+                yield _render_rows(pd.DataFrame(batch))
+                row_count += len(batch)
+
+            logger.info(f'Sheet {sheet.title}: {row_count} rows')
+            yield _sheet_footer(sheet.title)
+    finally:
+        workbook.close()
+
+
+def iter_csv_text(file_path: str) -> Iterator[str]:
+    """Text of a CSV file: header block, then row batches read in chunks"""
+    import pandas as pd
+
+    reader = pd.read_csv(file_path, chunksize=ROW_BATCH_SIZE, dtype=str, keep_default_na=False)
+    row_count = 0
+    for index, chunk in enumerate(reader):
+        if index == 0:
+            headers = ' | '.join(str(col) for col in chunk.columns)
+            yield "=== CSV Data ===\n\n" + headers + '\n' + '-' * len(headers) + '\n'
+        yield _render_rows(chunk)
+        row_count += len(chunk)
+
+    logger.info(f'Extracted text from CSV: {row_count} rows')
+
+
 def extract_text_from_excel(file_path: str) -> str:
     """Extract text from Excel file (.xlsx, .xls)"""
     try:
-        import pandas as pd
-        
-        # Read all sheets
-        excel_file = pd.ExcelFile(file_path)
-        text_content = []
-        
-        logger.info(f'Extracting text from Excel: {len(excel_file.sheet_names)} sheets')
-        
-        for sheet_name in excel_file.sheet_names:
-            df = pd.read_excel(file_path, sheet_name=sheet_name)
-            
-            # Convert DataFrame to text with better table preservation
-            sheet_text = f"\n\n{'='*80}\n=== SHEET: {sheet_name} ===\n{'='*80}\n\n"
-            
-            # Add column headers with clear separator
-            headers = ' | '.join(str(col) for col in df.columns)
-            sheet_text += headers + '\n' + '-' * min(len(headers), 120) + '\n'
-            
-            # Add rows (limit to avoid too much data) with clear row separation
-            max_rows = 1000
-            for idx, row in df.head(max_rows).iterrows():
-                row_text = ' | '.join(str(val) if pd.notna(val) else '' for val in row.values)
-                sheet_text += row_text + '\n'
-            
-            if len(df) > max_rows:
-                sheet_text += f'\n[... {len(df) - max_rows} more rows truncated ...]\n'
-            
-            # Add end marker to preserve sheet boundaries
-            sheet_text += f"\n{'='*80}\n=== END OF SHEET: {sheet_name} ===\n{'='*80}\n\n"
-            
-            text_content.append(sheet_text)
-        
-        return '\n\n'.join(text_content)
-    
+        return ''.join(iter_excel_text(file_path))
+
     except Exception as e:
         logger.error(f'Excel extraction failed: {str(e)}')
         raise Exception(f'Failed to extract text from Excel: {str(e)}')
@@ -174,30 +374,8 @@ def extract_text_from_excel(file_path: str) -> str:
 def extract_text_from_csv(file_path: str) -> str:
     """Extract text from CSV file"""
     try:
-        import pandas as pd
-        
-        df = pd.read_csv(file_path)
-        
-        logger.info(f'Extracting text from CSV: {len(df)} rows, {len(df.columns)} columns')
-        
-        # Convert to text representation
-        text_content = "=== CSV Data ===\n\n"
-        
-        # Add column headers
-        headers = ' | '.join(str(col) for col in df.columns)
-        text_content += headers + '\n' + '-' * len(headers) + '\n'
-        
-        # Add rows (limit to avoid too much data)
-        max_rows = 1000
-        for idx, row in df.head(max_rows).iterrows():
-            row_text = ' | '.join(str(val) if pd.notna(val) else '' for val in row.values)
-            text_content += row_text + '\n'
-        
-        if len(df) > max_rows:
-            text_content += f'\n[... {len(df) - max_rows} more rows truncated ...]'
-        
-        return text_content
-    
+        return ''.join(iter_csv_text(file_path))
+
     except Exception as e:
         logger.error(f'CSV extraction failed: {str(e)}')
         raise Exception(f'Failed to extract text from CSV: {str(e)}')
@@ -312,6 +490,24 @@ def parse_document(file_path: str, file_name: str) -> Tuple[str, str]:
         raise Exception(f'Failed to parse {file_name}: {str(e)}')
 
 
+def iter_document_text(file_path: str, file_name: str) -> Iterator[str]:
+    """
+    Document text in blocks - spreadsheets and CSV stream row batches,
+    other formats yield the parse_document text in one block
+    """
+    import os
+    _, file_ext = os.path.splitext(file_name.lower())
+    file_ext = file_ext.lstrip('.')
+
+    if file_ext == 'xlsx':
+        yield from iter_excel_text(file_path)
+    elif file_ext == 'csv':
+        yield from iter_csv_text(file_path)
+    else:
+        text, _ = parse_document(file_path, file_name)
+        yield text
+
+
 def is_supported_format(file_name: str) -> bool:
     """Check if file format is supported"""
     file_ext = file_name.lower().split('.')[-1] if '.' in file_name else ''
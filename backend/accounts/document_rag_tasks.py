@@ -4,15 +4,39 @@ Generates chunks, contexts, and embeddings for uploaded documents
 """
 
 import logging
+import os
 import time
+import uuid
+from itertools import chain, islice
+from typing import Iterable, Iterator, List
+
 from celery import shared_task
+from django.db import transaction
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
 from accounts.models import Document
 from accounts.vector_models import DocumentChunk as VectorDocumentChunk
-from accounts.rag_engine import SemanticChunker, ContextGenerator
-from accounts.embedding_service import get_embedding_service
+from accounts.rag_engine import TableChunker, ContextGenerator, HybridRAGEngine
+from accounts.embedding_service import get_embedding_service, shared_embedding_service
+from accounts.embedding_store import serving_model, store_chunk_embeddings
+from accounts.bm25_index import term_frequencies
+from accounts.esrs_classifier import classify_text
+from accounts.ingest_cache import cached_contexts, embed_with_cache, hit_rate, store_context, text_hash
+from accounts.rate_budget import provider_budget
+from accounts.tokenization import tokenizer_name
 
 logger = logging.getLogger(__name__)
 
+# Chunks contextualized, embedded and saved per round - bounds memory on large documents
+INGEST_BATCH_CHUNKS = 256
+
+# Documents with more chunks skip Anthropic contextual chunking (rate limits)
+CONTEXTUAL_MAX_CHUNKS = 100
+
+# Characters per block when streaming a stored extraction artifact
+ARTIFACT_BLOCK_CHARS = 1024 * 1024
+
 
 class AnthropicRateLimiter:
     """
@@ -51,6 +75,76 @@ class AnthropicRateLimiter:
         self.chunks_processed += 1
 
 
+class _BlockRecorder:
+    """Passes text blocks through, keeping them until drop() so a small document's full text is at hand"""
+    
+    def __init__(self, blocks: Iterable[str]):
+        self.blocks = blocks
+        self.length = 0
+        self._kept: List[str] = []
+    
+    def __iter__(self) -> Iterator[str]:
+        for block in self.blocks:
+            self.length += len(block)
+            if self._kept is not None:
+                self._kept.append(block)
+            yield block
+    
+    def text(self) -> str:
+        return ''.join(self._kept or [])
+    
+    def drop(self):
+        self._kept = None
+
+
+def _with_positions(chunks: Iterable) -> Iterator[tuple]:
+    """(index, position, chunk) for a chunk stream - 'end' needs one chunk of lookahead"""
+    iterator = iter(chunks)
+    current = next(iterator, None)
+    index = 0
+    while current is not None:
+        following = next(iterator, None)
+        position = 'beginning' if index == 0 else ('end' if following is None else 'middle')
+        yield index, position, current
+        current, index = following, index + 1
+
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _chunk_object(document: Document, staging_run: str, index: int, position: str, chunk_text: str, context: str,
+                  metadata: dict, tokens: int) -> VectorDocumentChunk:
+    return VectorDocumentChunk(
+        document=document,
+        chunk_index=index,
+        chunk_id=f"{document.id}_{index}_{staging_run}",
+        staging_run=staging_run,
+        content=chunk_text,
+        context=context,
+        contextualized_content=f"{context}\n\n{chunk_text}",
+        position=position,
+        char_count=len(chunk_text),
+        word_count=len(chunk_text.split()),
+        token_count=tokens,
+        metadata={**metadata, 'tokenizer': tokenizer_name()},
+        bm25_tokens=term_frequencies(chunk_text),
+        esrs_categories=classify_text(chunk_text),
+        language='en',
+    )
+
+
+def _swap_in_chunks(document: Document, staging_run: str):
+    """Replace the document's live chunks with one staged generation (call inside a transaction)"""
+    VectorDocumentChunk.all_objects.filter(document=document, staging_run='').delete()
+    VectorDocumentChunk.all_objects.filter(document=document, staging_run=staging_run).update(
+        staging_run='',
+        chunk_id=Concat(Value(f"{document.id}_"), Cast('chunk_index', CharField()))
+    )
+
+
 @shared_task(bind=True)
 def process_document_with_rag(self, document_id: int):
     """
@@ -91,51 +185,42 @@ def process_document_with_rag(self, document_id: int):
         document.save(update_fields=['rag_processing_status'])
         
         task_status.progress = 10
-        task_status.metadata = {'stage': 'reading_file'}
+        task_status.metadata = {'stage': 'extracting_text'}
         task_status.save()
         
-        # Read document content
-        content = _read_document_content(document)
-        if not content:
+        # Text blocks go from the extractor (or the stored artifact) straight into the chunker:
+        # token-based chunking for text (256 tokens, 50 overlap); sheets, CSV data and Word tables are
+        # chunked by whole rows with the sheet name and header line repeated in every chunk
+        blocks = _BlockRecorder(_iter_document_blocks(document))
+        chunk_stream = TableChunker.chunk_stream(blocks, max_tokens=256, overlap_tokens=50)
+        
+        # Read just far enough to know whether the document is small enough for contextual chunking
+        head = list(islice(chunk_stream, CONTEXTUAL_MAX_CHUNKS + 1))
+        if not head:
             raise ValueError(f"Could not extract text from document {document.file_name}")
+        small_document = len(head) <= CONTEXTUAL_MAX_CHUNKS
+        content = blocks.text() if small_document else ''
+        blocks.drop()
         
         task_status.progress = 20
-        task_status.metadata = {'stage': 'chunking', 'content_length': len(content)}
-        task_status.save()
-        
-        # Semantic chunking with larger size for Excel/CSV (better table preservation)
-        chunker = SemanticChunker()
-        if document.file_type in ['application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 
-                                   'application/vnd.ms-excel', 'text/csv']:
-            # Larger chunks for structured data (tables) - prevents splitting rows
-            chunks = chunker.chunk_by_paragraphs(content, max_chunk_size=2000, overlap=300)
-            logger.info(f'Created {len(chunks)} LARGE chunks for Excel/CSV document {document.file_name}')
-        else:
-            # Normal chunks for text documents
-            chunks = chunker.chunk_by_paragraphs(content, max_chunk_size=1000, overlap=200)
-            logger.info(f'Created {len(chunks)} chunks for document {document.file_name}')
-        
-        task_status.progress = 30
-        task_status.metadata = {'stage': 'generating_contexts', 'total_chunks': len(chunks)}
+        task_status.metadata = {'stage': 'generating_contexts'}
         task_status.save()
         
         # Generate contexts for each chunk using Anthropic Contextual Retrieval
         context_generator = ContextGenerator()
-        chunk_contexts = []
         
         # Anthropic Contextual Retrieval with Prompt Caching
         # This improves RAG accuracy by 49% according to Anthropic research
         from anthropic import Anthropic
         from django.conf import settings
-        import os
         
         # Check if contextual chunking is enabled (default: True with rate limiting)
         enable_contextual_chunking = os.getenv('ENABLE_CONTEXTUAL_CHUNKING', 'true').lower() == 'true'
         
         # For large documents (>100 chunks) - disable to avoid rate limits
         # But for normal Excel files with reasonable size, keep enabled
-        if len(chunks) > 100:
-            logger.warning(f'⚠️ Very large document ({len(chunks)} chunks) - disabling contextual chunking')
+        if not small_document:
+            logger.warning(f'⚠️ Very large document (>{CONTEXTUAL_MAX_CHUNKS} chunks) - disabling contextual chunking')
             enable_contextual_chunking = False
         
         # For Excel/CSV files - use slower rate limit but keep enabled for better RAG quality
@@ -156,11 +241,24 @@ def process_document_with_rag(self, document_id: int):
         else:
             logger.info('⚡ Contextual chunking disabled - using fast simple context')
         
-        for i, chunk_text in enumerate(chunks):
-            position = 'beginning' if i == 0 else ('end' if i == len(chunks)-1 else 'middle')
+        # Contexts generated for identical (document, chunk) text in earlier runs
+        # (only small documents get here, and those are all in head)
+        context_model = "claude-3-5-haiku-20241022"
+        document_hash = text_hash(content) if anthropic_client else ''
+        known_contexts = cached_contexts(document_hash, [text for text, _, _ in head]) if anthropic_client else {}
+        context_hits = context_misses = 0
+        
+        def chunk_context(i, chunk_text, position):
+            nonlocal context_hits, context_misses
+            chunk_hash = text_hash(chunk_text)
             
             # Try Anthropic Contextual Retrieval first, fallback to simple context
+            if anthropic_client and chunk_hash in known_contexts:
+                context_hits += 1
+                return known_contexts[chunk_hash]
+            
             if anthropic_client:
+                context_misses += 1
                 # Wait if we're hitting rate limits
                 if rate_limiter:
                     rate_limiter.wait_if_needed()
@@ -169,7 +267,7 @@ def process_document_with_rag(self, document_id: int):
                     # Anthropic prompt for context generation WITH PROMPT CACHING
                     # Cache the whole document once, reuse for all chunks (90% cheaper!)
                     response = anthropic_client.messages.create(
-                        model="claude-3-5-haiku-20241022",
+                        model=context_model,
                         max_tokens=200,
                         temperature=0.0,
                         system=[
@@ -203,74 +301,141 @@ Please give a short succinct context to situate this chunk within the overall do
                     )
                     
                     context = response.content[0].text
+                    store_context(document_hash, chunk_hash, context, context_model)
+                    known_contexts[chunk_hash] = context
                     
                     # Log cache performance
                     usage = response.usage
+                    provider_budget('anthropic').record(usage.input_tokens + usage.output_tokens)
                     cache_read = getattr(usage, 'cache_read_input_tokens', 0)
                     cache_creation = getattr(usage, 'cache_creation_input_tokens', 0)
-                    logger.info(f'Chunk {i}/{len(chunks)}: context={len(context)} chars, cache_read={cache_read}, cache_creation={cache_creation}')
+                    logger.info(f'Chunk {i}/{len(head)}: context={len(context)} chars, cache_read={cache_read}, cache_creation={cache_creation}')
+                    
+                    # Update progress (rate-limited calls are the slow part of small documents)
+                    task_status.progress = 20 + int((i / len(head)) * 40)
+                    task_status.save()
+                    return context
                     
                 except Exception as e:
                     logger.warning(f'Anthropic context generation failed for chunk {i}: {e}, falling back to simple context')
-                    context = context_generator.generate_chunk_context(
-                        chunk_text=chunk_text,
-                        document_name=document.file_name,
-                        chunk_position=position
-                    )
-            else:
-                # Fallback to simple context generation
-                context = context_generator.generate_chunk_context(
-                    chunk_text=chunk_text,
-                    document_name=document.file_name,
-                    chunk_position=position
-                )
-            
-            chunk_contexts.append((chunk_text, context))
             
-            # Update progress
-            progress = 30 + int((i / len(chunks)) * 20)
-            task_status.progress = progress
-            task_status.save()
-        
-        task_status.progress = 50
-        task_status.metadata = {'stage': 'generating_embeddings'}
-        task_status.save()
+            # Fallback to simple context generation
+            return context_generator.generate_chunk_context(
+                chunk_text=chunk_text,
+                document_name=document.file_name,
+                chunk_position=position
+            )
         
         # Get embedding service (uses default from database with fallback)
         embedding_service = get_embedding_service()
-        
-        if not embedding_service:
-            # No embedding service available (no API keys configured)
-            logger.warning(f'No embedding service available for document {document.file_name}. Skipping embeddings.')
+        serving_service = relevance = None
+        if embedding_service:
+            logger.info(f'Using embedding model: {embedding_service.provider}/{embedding_service.model}')
             
-            # Still save chunks without embeddings
+            # While a new default model is being backfilled the previous one keeps serving
+            # retrieval - it needs vectors for these chunks too
+            serving = serving_model()
+            if serving != (embedding_service.provider, embedding_service.model):
+                try:
+                    serving_service = shared_embedding_service(*serving)
+                except Exception as e:
+                    logger.warning(f'Failed to load serving model {serving} for document {document.id}: {e}', exc_info=True)
+            
+            # Running top-k of the new chunks against all disclosure query embeddings
+            # (candidate sets for AI answers)
+            try:
+                from accounts.disclosure_relevance import DocumentRelevance
+                relevance = DocumentRelevance(*serving)
+            except Exception as e:
+                logger.warning(f'Failed to load disclosure embeddings for document {document.id}: {e}', exc_info=True)
+        else:
+            # No embedding service available (no API keys configured) - still save chunks without embeddings
+            logger.warning(f'No embedding service available for document {document.file_name}. Skipping embeddings.')
+        
+        embedding_hits = embedding_misses = 0
+        table_chunks = chunks_saved = 0
+        
+        # Chunks are contextualized, embedded and saved a batch at a time as a staged
+        # generation; the live chunks keep serving until the swap at the end
+        # (staged rows left behind by a crashed run are dropped first)
+        VectorDocumentChunk.all_objects.filter(document=document).exclude(staging_run='').delete()
+        staging_run = uuid.uuid4().hex
+        
+        for batch_number, batch in enumerate(_batches(_with_positions(chain(head, chunk_stream)), INGEST_BATCH_CHUNKS)):
             chunk_objects = []
-            for i, (chunk_text, context) in enumerate(chunk_contexts):
-                chunk_id = f"{document.id}_{i}"
-                position = 'beginning' if i == 0 else ('end' if i == len(chunks)-1 else 'middle')
-                
-                chunk_obj = VectorDocumentChunk(
-                    document=document,
-                    chunk_index=i,
-                    chunk_id=chunk_id,
-                    content=chunk_text,
-                    context=context,
-                    contextualized_content=f"{context}\n\n{chunk_text}",
-                    position=position,
-                    char_count=len(chunk_text),
-                    word_count=len(chunk_text.split()),
-                    token_count=len(chunk_text) // 4,
-                    language='en',
-                )
-                chunk_objects.append(chunk_obj)
+            for i, position, (chunk_text, metadata, tokens) in batch:
+                context = chunk_context(i, chunk_text, position)
+                chunk_objects.append(_chunk_object(document, staging_run, i, position, chunk_text, context, metadata, tokens))
+                table_chunks += metadata.get('type') == 'table'
             
-            VectorDocumentChunk.objects.bulk_create(chunk_objects)
+            # Unchanged text comes from the embedding cache, the rest goes out in
+            # token-bounded concurrent requests
+            contextualized_texts = [chunk.contextualized_content for chunk in chunk_objects]
+            embeddings = serving_embeddings = None
+            if embedding_service:
+                embeddings, embedding_stats = embed_with_cache(embedding_service, contextualized_texts)
+                embedding_hits += embedding_stats['hits']
+                embedding_misses += embedding_stats['misses']
+                serving_embeddings = embeddings
+                if serving_service:
+                    try:
+                        serving_embeddings, _ = embed_with_cache(serving_service, contextualized_texts)
+                    except Exception as e:
+                        logger.warning(f'Failed to embed document {document.id} with serving model {serving}: {e}', exc_info=True)
+                        serving_service = serving_embeddings = relevance = None
+                elif serving != (embedding_service.provider, embedding_service.model):
+                    serving_embeddings = None
             
+            # Chunks and their vectors per model (chunk_embeddings) land together
+            with transaction.atomic():
+                VectorDocumentChunk.objects.bulk_create(chunk_objects)
+                chunk_ids = [chunk.id for chunk in chunk_objects]
+                if embeddings is not None:
+                    store_chunk_embeddings(chunk_ids, embeddings, embedding_service.provider, embedding_service.model)
+                if serving_embeddings is not None and serving_embeddings is not embeddings:
+                    store_chunk_embeddings(chunk_ids, serving_embeddings, *serving)
+            
+            if relevance and serving_embeddings is not None:
+                try:
+                    relevance.add(chunk_ids, serving_embeddings)
+                except Exception as e:
+                    logger.warning(f'Failed to score document {document.id} against disclosures: {e}', exc_info=True)
+                    relevance = None
+            
+            chunks_saved += len(chunk_objects)
+            task_status.progress = min(90, 60 + 5 * batch_number)
+            task_status.metadata = {
+                'stage': 'processing_chunks',
+                'content_length': blocks.length,
+                'chunks_processed': chunks_saved,
+            }
+            task_status.save()
+        
+        # Swap the new generation in: the old chunks (and their vectors) go, the staged ones become live
+        with transaction.atomic():
+            _swap_in_chunks(document, staging_run)
+            if embedding_service:
+                document.rag_processing_status = 'completed'
+                document.rag_chunks_count = chunks_saved
+                document.rag_processed_at = timezone.now()
+                document.rag_error = ''
+                document.save(update_fields=['rag_processing_status', 'rag_chunks_count', 'rag_processed_at', 'rag_error'])
+        
+        logger.info(f'Saved {chunks_saved} chunks ({table_chunks} table chunks) for document {document.file_name}')
+        
+        cache_stats = {
+            'context_cache_hits': context_hits,
+            'context_cache_misses': context_misses,
+            'context_cache_hit_rate': hit_rate(context_hits, context_misses),
+        }
+        
+        if not embedding_service:
             task_status.status = 'completed'
             task_status.progress = 100
             task_status.metadata = {
                 'stage': 'completed_without_embeddings',
-                'total_chunks': len(chunk_objects),
+                'total_chunks': chunks_saved,
+                'tokenizer': tokenizer_name(),
                 'warning': 'No embedding API keys configured'
             }
             task_status.save()
@@ -279,79 +444,39 @@ Please give a short succinct context to situate this chunk within the overall do
                 'success': True,
                 'document_id': document_id,
                 'filename': document.file_name,
-                'chunks_created': len(chunk_objects),
+                'chunks_created': chunks_saved,
                 'embeddings_generated': False,
                 'warning': 'No embedding API keys configured'
             }
         
-        logger.info(f'Using embedding model: {embedding_service.provider}/{embedding_service.model}')
-        
-        # Generate embeddings for all chunks (batch processing)
-        contextualized_texts = [f"{ctx}\n\n{txt}" for txt, ctx in chunk_contexts]
-        embeddings = embedding_service.embed_batch(contextualized_texts)
-        
-        task_status.progress = 70
-        task_status.metadata = {'stage': 'saving_to_database'}
-        task_status.save()
-        
-        # Delete old chunks for this document
-        VectorDocumentChunk.objects.filter(document=document).delete()
-        
-        # Save chunks to database with embeddings
-        chunk_objects = []
-        for i, ((chunk_text, context), embedding) in enumerate(zip(chunk_contexts, embeddings)):
-            chunk_id = f"{document.id}_{i}"
-            position = 'beginning' if i == 0 else ('end' if i == len(chunks)-1 else 'middle')
-            
-            chunk_obj = VectorDocumentChunk(
-                document=document,
-                chunk_index=i,
-                chunk_id=chunk_id,
-                content=chunk_text,
-                context=context,
-                contextualized_content=f"{context}\n\n{chunk_text}",
-                position=position,
-                char_count=len(chunk_text),
-                word_count=len(chunk_text.split()),
-                token_count=len(chunk_text) // 4,  # Rough estimate
-                language='en',
-            )
-            
-            # Set primary embedding based on provider
-            if embedding_service.provider == 'openai':
-                chunk_obj.embedding = embedding
-            elif embedding_service.provider == 'voyage':
-                chunk_obj.voyage_embedding = embedding
-            elif embedding_service.provider == 'jina':
-                chunk_obj.jina_embedding = embedding
-            
-            chunk_objects.append(chunk_obj)
-            
-            # Update progress
-            progress = 70 + int((i / len(chunks)) * 25)
-            task_status.progress = progress
-            task_status.save()
+        cache_stats.update({
+            'embedding_cache_hits': embedding_hits,
+            'embedding_cache_misses': embedding_misses,
+            'embedding_cache_hit_rate': hit_rate(embedding_hits, embedding_misses),
+        })
         
-        # Bulk create all chunks
-        VectorDocumentChunk.objects.bulk_create(chunk_objects)
-        
-        logger.info(f'Saved {len(chunk_objects)} chunks to database')
+        # Refresh the user's memory-mapped embedding snapshot (retrieval falls back to the DB if this fails)
+        try:
+            HybridRAGEngine.refresh(document.user_id)
+        except Exception as e:
+            logger.warning(f'Failed to refresh embedding snapshot for user {document.user_id}: {e}', exc_info=True)
         
-        # Update document RAG status
-        from django.utils import timezone
-        document.rag_processing_status = 'completed'
-        document.rag_chunks_count = len(chunk_objects)
-        document.rag_processed_at = timezone.now()
-        document.rag_error = ''
-        document.save(update_fields=['rag_processing_status', 'rag_chunks_count', 'rag_processed_at', 'rag_error'])
+        if relevance:
+            try:
+                relevance.save(document.user_id, document.id)
+            except Exception as e:
+                logger.warning(f'Failed to update disclosure relevance for document {document.id}: {e}', exc_info=True)
         
         task_status.status = 'completed'
         task_status.progress = 100
         task_status.metadata = {
             'stage': 'completed',
-            'total_chunks': len(chunk_objects),
+            'total_chunks': chunks_saved,
+            'content_length': blocks.length,
+            'tokenizer': tokenizer_name(),
             'embedding_model': f"{embedding_service.provider}/{embedding_service.model}",
-            'embedding_dimensions': embedding_service.get_dimensions()
+            'embedding_dimensions': embedding_service.get_dimensions(),
+            **cache_stats
         }
         task_status.save()
         
@@ -359,7 +484,7 @@ Please give a short succinct context to situate this chunk within the overall do
             'success': True,
             'document_id': document_id,
             'filename': document.file_name,
-            'chunks_created': len(chunk_objects)
+            'chunks_created': chunks_saved
         }
     
     except Document.DoesNotExist:
@@ -377,6 +502,10 @@ Please give a short succinct context to situate this chunk within the overall do
         error = f'Error processing document {document_id}: {str(e)}'
         logger.error(error, exc_info=True)
         
+        # Drop this run's staged chunks - the previous generation stays live
+        if locals().get('staging_run'):
+            VectorDocumentChunk.all_objects.filter(document=document, staging_run=staging_run).delete()
+        
         # Update document status to failed
         if 'document' in locals():
             document.rag_processing_status = 'failed'
@@ -391,76 +520,207 @@ Please give a short succinct context to situate this chunk within the overall do
         return {'success': False, 'error': error}
 
 
-def _read_document_content(doc: Document) -> str:
-    """Read extracted text content from document"""
-    import os
-    from django.conf import settings
+@shared_task(bind=True)
+def reembed_chunks_task(self, provider: str, model: str):
+    """
+    Blue/green re-embedding: fill chunk_embeddings for the model while the current
+    serving model keeps answering queries, then switch serving atomically once
+    every chunk is covered (only if the model is still the default by then)
+    """
+    from django.core.cache import cache
+    from accounts.disclosure_embeddings import precompute_disclosure_embeddings
+    from accounts.embedding_store import (
+        backfill_embeddings, coverage, ensure_model_index, model_label, switch_serving_model, users_with_documents
+    )
+    from accounts.vector_models import EmbeddingModel
     
-    # Try to read extracted text file first
-    extracted_file = f"{doc.file_path}.extracted.txt"
-    extracted_path = os.path.join(settings.MEDIA_ROOT, extracted_file)
+    label = model_label(provider, model)
+    lock_key = f'reembed_lock:{label}'
+    if not cache.add(lock_key, self.request.id, timeout=6 * 3600):
+        logger.info(f'Re-embedding with {label} already running')
+        return {'success': False, 'error': 'already running'}
     
-    if os.path.exists(extracted_path):
-        try:
-            with open(extracted_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception as e:
-            logger.warning(f'Failed to read extracted file {extracted_path}: {e}')
+    try:
+        ensure_model_index(provider, model)
+        precompute_disclosure_embeddings(services=[shared_embedding_service(provider, model)])
+        
+        # Second pass picks up chunks ingested while the first one ran
+        embedded = backfill_embeddings(provider, model)
+        embedded += backfill_embeddings(provider, model)
+        
+        current = coverage(provider, model)
+        logger.info(f'Re-embedding with {label}: {embedded} chunks embedded, coverage {current}')
+        
+        switched = False
+        if EmbeddingModel.objects.filter(provider=provider, model_id=model, is_default=True).exists():
+            switched = switch_serving_model(provider, model)
+        
+        if switched:
+            # Snapshots built from the previous model are stale now
+            for user_id in users_with_documents():
+                try:
+                    HybridRAGEngine.refresh(user_id)
+                except Exception as e:
+                    logger.warning(f'Failed to refresh embedding snapshot for user {user_id}: {e}', exc_info=True)
+        
+        return {'success': True, 'embedded': embedded, 'coverage': current, 'switched': switched}
+    
+    finally:
+        cache.delete(lock_key)
+
+
+def extracted_text_path(document_id: int) -> str:
+    """Storage path of the document's extracted text (written once by the RAG task)"""
+    return f"documents/extracted/{document_id}.txt"
+
+
+def _iter_document_blocks(doc: Document) -> Iterator[str]:
+    """
+    Extracted text of the document as a stream of blocks
+    
+    Reads the extraction artifact of an earlier run, or extracts from the original
+    file and writes the artifact as the blocks go by; it is renamed into place once
+    the whole text has been read, so a concurrent reader never sees a partial file
+    """
+    from django.conf import settings
+    
+    # Extraction artifact from an earlier run
+    extracted_path = os.path.join(settings.MEDIA_ROOT, extracted_text_path(doc.id))
+    legacy_path = os.path.join(settings.MEDIA_ROOT, f"{doc.file_path}.extracted.txt")
+    for path in (extracted_path, legacy_path):
+        if os.path.exists(path):
+            try:
+                f = open(path, 'r', encoding='utf-8')
+            except OSError as e:
+                logger.warning(f'Failed to read extracted file {path}: {e}')
+                continue
+            with f:
+                while block := f.read(ARTIFACT_BLOCK_CHARS):
+                    yield block
+            return
     
-    # Fallback: extract text from original file
+    # Extract text from original file
     file_path = os.path.join(settings.MEDIA_ROOT, doc.file_path)
     if not os.path.exists(file_path):
-        return ""
+        return
     
+    from accounts.document_parser import iter_document_text
+    
+    os.makedirs(os.path.dirname(extracted_path), exist_ok=True)
+    tmp_path = f"{extracted_path}.{os.getpid()}.tmp"
+    length = 0
+    has_text = False
     try:
-        from accounts.document_parser import parse_document
-        # Use actual file path for extension detection, not display name
-        text, _ = parse_document(file_path, os.path.basename(file_path))
-        
-        if text:
-            # Save extracted text for future use
-            os.makedirs(os.path.dirname(extracted_path), exist_ok=True)
-            with open(extracted_path, 'w', encoding='utf-8') as f:
-                f.write(text)
-        
-        return text
-    except Exception as e:
-        logger.error(f'Failed to extract text from {file_path}: {e}')
-        return ""
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            # Use actual file path for extension detection, not display name
+            for block in iter_document_text(file_path, os.path.basename(file_path)):
+                f.write(block)
+                length += len(block)
+                has_text = has_text or bool(block.strip())
+                yield block
+    except BaseException as e:
+        # Also a consumer that stops early (GeneratorExit) - the artifact would be incomplete
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if isinstance(e, Exception):
+            logger.error(f'Failed to extract text from {file_path}: {e}')
+        raise
+    
+    if not has_text:
+        os.remove(tmp_path)
+        return
+    os.replace(tmp_path, extracted_path)
+    logger.info(f'Extracted {length} characters from document {doc.id}')
 
 
-@shared_task
-def reprocess_all_documents():
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True, max_retries=None)
+def reprocess_all_documents(self, job_id: int = None, batch_number: int = 0, user_id: int = None,
+                            batch_size: int = None):
     """
     Reprocess all existing documents with RAG engine
     Useful after upgrading chunking or embedding models
+    
+    Without job_id: resumes the unfinished job if there is one, otherwise starts
+    a new one, and queues its next batch. With job_id: processes one batch of
+    documents (waiting for provider rate budget headroom before each), records
+    the checkpoint after every document and queues the following batch at low
+    priority. Duplicate or stale batch messages exit without doing anything.
+    
+    Args:
+        job_id: AITaskStatus id of the job (set on batch tasks)
+        batch_number: Batch this message is for (must match the job's next_batch)
+        user_id: Owner of a new job's status row (default: first superuser)
+        batch_size: Documents per batch
     """
-    from accounts.models import Document
+    from django.conf import settings
+    from django.core.cache import cache
+    from accounts.models import AITaskStatus, User
+    from accounts.reprocessing import (
+        REPROCESS_BATCH_SIZE, REPROCESS_LOCK_SECONDS, REPROCESS_PRIORITY, TASK_TYPE,
+        active_job, finish_job, next_document_ids, record_document, start_job
+    )
     
-    documents = Document.objects.all()
-    total = documents.count()
+    batch_size = batch_size or REPROCESS_BATCH_SIZE
     
-    logger.info(f'Reprocessing {total} documents with RAG engine')
+    def queue_batch(job, number):
+        reprocess_all_documents.apply_async(
+            kwargs={'job_id': job.pk, 'batch_number': number, 'batch_size': batch_size},
+            priority=REPROCESS_PRIORITY
+        )
     
-    results = {
-        'total': total,
-        'success': 0,
-        'failed': 0,
-        'errors': []
-    }
+    if job_id is None:
+        job = active_job()
+        if job:
+            logger.info(f'Resuming reprocessing job {job.pk} at document {job.metadata["checkpoint"]}')
+        else:
+            users = User.objects.filter(id=user_id) if user_id else User.objects.filter(is_superuser=True)
+            user = users.order_by('id').first()
+            if user is None:
+                return {'success': False, 'error': 'No user to own the job status'}
+            job = start_job(self.request.id, user)
+            logger.info(f'Reprocessing {job.total_items} documents with RAG engine (job {job.pk})')
+        queue_batch(job, job.metadata['next_batch'])
+        return {'success': True, 'job_id': job.pk, 'total': job.total_items}
     
-    for i, doc in enumerate(documents):
-        try:
-            logger.info(f'Processing document {i+1}/{total}: {doc.filename}')
-            process_document_with_rag.delay(doc.id)
-            results['success'] += 1
-        except Exception as e:
-            logger.error(f'Failed to queue document {doc.id}: {e}')
-            results['failed'] += 1
-            results['errors'].append({
-                'document_id': doc.id,
-                'filename': doc.filename,
-                'error': str(e)
-            })
+    job = AITaskStatus.objects.filter(pk=job_id, task_type=TASK_TYPE).first()
+    if job is None or job.status not in ('pending', 'running') or job.metadata['next_batch'] != batch_number:
+        return {'success': False, 'error': 'stale batch'}
+    
+    # One worker per batch; a crashed batch's lock expires and the redelivered message takes over
+    lock_key = f'reprocess_lock:{job.pk}:{batch_number}'
+    if not cache.add(lock_key, self.request.id, timeout=REPROCESS_LOCK_SECONDS):
+        raise self.retry(countdown=REPROCESS_LOCK_SECONDS)
+    
+    try:
+        # Hosted providers this job spends tokens on; keep part of each budget for interactive work
+        embedding_service = get_embedding_service()
+        budgets = []
+        if embedding_service and embedding_service.provider not in embedding_service.LOCAL_PROVIDERS:
+            budgets.append(provider_budget(embedding_service.provider))
+        if getattr(settings, 'ANTHROPIC_API_KEY', None):
+            budgets.append(provider_budget('anthropic'))
+        
+        document_ids = next_document_ids(job, batch_size)
+        for document_id in document_ids:
+            started = time.monotonic()
+            throttled = sum(budget.wait(settings.RAG_REPROCESS_BUDGET_SHARE) for budget in budgets)
+            
+            result = process_document_with_rag.apply(args=[document_id]).result
+            success = isinstance(result, dict) and result.get('success', False)
+            error = '' if success else str(result.get('error') if isinstance(result, dict) else result)
+            
+            record_document(job, document_id, success, time.monotonic() - started, throttled, error)
+            cache.set(lock_key, self.request.id, timeout=REPROCESS_LOCK_SECONDS)
+        
+        if len(document_ids) < batch_size:
+            finish_job(job)
+            return {'success': True, 'job_id': job.pk, **{k: job.metadata[k] for k in ('processed', 'failed')}}
+        
+        job.metadata['next_batch'] = batch_number + 1
+        job.save(update_fields=['metadata', 'updated_at'])
+        queue_batch(job, batch_number + 1)
+        return {'success': True, 'job_id': job.pk, 'batch': batch_number, 'documents': len(document_ids)}
     
-    return results
+    finally:
+        if cache.get(lock_key) == self.request.id:
+            cache.delete(lock_key)
@@ -0,0 +1,151 @@
+"""
+Two-level cache for query embeddings
+Level 1: bounded in-process LRU (per worker), level 2: the shared Redis cache
+Keys are (provider, model, sha256(text)), so identical queries are embedded
+once across re-runs, tenants and bulk jobs
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class QueryEmbeddingCache:
+    """
+    LRU + Redis cache of embedding vectors
+
+    Vectors are stored as float32 bytes (12 KB for 3072 dims). Entries expire
+    after their TTL in both levels; the local level also evicts least recently
+    used entries beyond max_entries. Redis errors are logged and treated as misses.
+    """
+
+    KEY_PREFIX = 'query_embedding'
+
+    def __init__(self, max_entries: int = 1024, local_ttl: int = 3600, redis_ttl: int = 7 * 24 * 3600):
+        self.max_entries = max_entries
+        self.local_ttl = local_ttl
+        self.redis_ttl = redis_ttl
+
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()  # key -> (expires_at, bytes)
+        self._lock = threading.Lock()
+
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def make_key(cls, provider: str, model: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return f'{cls.KEY_PREFIX}:{provider}:{model}:{digest}'
+
+    # ----- Lookup -----
+
+    def get_many(self, provider: str, model: str, texts: List[str]) -> Dict[str, List[float]]:
+        """Cached embeddings for the given texts: {text: embedding} (misses are omitted)"""
+        keys = {self.make_key(provider, model, text): text for text in dict.fromkeys(texts)}
+        found = {}
+
+        now = time.monotonic()
+        with self._lock:
+            for key, text in keys.items():
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[0] < now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[text] = entry[1]
+            self.local_hits += len(found)
+
+        remote_keys = [key for key, text in keys.items() if text not in found]
+        if remote_keys:
+            try:
+                remote = cache.get_many(remote_keys)
+            except Exception as e:
+                logger.warning(f"[EmbeddingCache] Redis lookup failed: {e}")
+                remote = {}
+
+            for key, payload in remote.items():
+                found[keys[key]] = payload
+                self._store_local(key, payload)
+
+            with self._lock:
+                self.redis_hits += len(remote)
+                self.misses += len(remote_keys) - len(remote)
+
+        return {text: np.frombuffer(payload, dtype=np.float32).tolist() for text, payload in found.items()}
+
+    def get(self, provider: str, model: str, text: str) -> Optional[List[float]]:
+        return self.get_many(provider, model, [text]).get(text)
+
+    # ----- Store -----
+
+    def set_many(self, provider: str, model: str, embeddings: Dict[str, List[float]]):
+        """Store {text: embedding} in both levels"""
+        payloads = {
+            self.make_key(provider, model, text): np.asarray(embedding, dtype=np.float32).tobytes()
+            for text, embedding in embeddings.items()
+            if embedding is not None
+        }
+        for key, payload in payloads.items():
+            self._store_local(key, payload)
+
+        if payloads:
+            try:
+                cache.set_many(payloads, timeout=self.redis_ttl)
+            except Exception as e:
+                logger.warning(f"[EmbeddingCache] Redis store failed: {e}")
+
+    def set(self, provider: str, model: str, text: str, embedding: List[float]):
+        self.set_many(provider, model, {text: embedding})
+
+    def _store_local(self, key: str, payload: bytes):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.local_ttl, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # ----- Stats -----
+
+    def clear_local(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for this process"""
+        with self._lock:
+            lookups = self.local_hits + self.redis_hits + self.misses
+            return {
+                'local_hits': self.local_hits,
+                'redis_hits': self.redis_hits,
+                'misses': self.misses,
+                'hit_rate': (self.local_hits + self.redis_hits) / lookups if lookups else 0.0,
+                'local_entries': len(self._entries),
+                'max_entries': self.max_entries,
+            }
+
+
+_query_embedding_cache: Optional[QueryEmbeddingCache] = None
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    """Process-wide query embedding cache configured from settings"""
+    global _query_embedding_cache
+    if _query_embedding_cache is None:
+        _query_embedding_cache = QueryEmbeddingCache(
+            max_entries=getattr(settings, 'EMBEDDING_CACHE_MAX_ENTRIES', 1024),
+            local_ttl=getattr(settings, 'EMBEDDING_CACHE_LOCAL_TTL', 3600),
+            redis_ttl=getattr(settings, 'EMBEDDING_CACHE_REDIS_TTL', 7 * 24 * 3600),
+        )
+    return _query_embedding_cache
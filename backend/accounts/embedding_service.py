@@ -1,16 +1,79 @@
 """
 Embedding Service - Support multiple embedding providers
-Allows switching between OpenAI, Voyage, Jina, Cohere models
+Allows switching between OpenAI, Voyage, Jina, Cohere and local (CPU) models
 Based on LlamaIndex research showing JinaAI-Base + CohereRerank = 0.933 hit rate
 """
 
 import logging
-from typing import List, Optional, Dict
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Dict, Tuple
 import numpy as np
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+# Retry backoff for rate-limited / failed embedding requests (seconds)
+EMBEDDING_BACKOFF_BASE = 1.0
+EMBEDDING_BACKOFF_MAX = 60.0
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+# Resolved default embedding model: per-process memo in front of a shared Redis entry
+DEFAULT_MODEL_CACHE_KEY = 'embedding_default_model'
+DEFAULT_MODEL_CACHE_TTL = 600
+DEFAULT_MODEL_LOCAL_TTL = 30
+
+# Provider API clients shared by every service in the process (keep-alive connection pools)
+_provider_clients: Dict[str, object] = {}
+_provider_clients_lock = threading.Lock()
+
+
+def _shared_client(provider: str, factory):
+    client = _provider_clients.get(provider)
+    if client is None:
+        with _provider_clients_lock:
+            client = _provider_clients.get(provider)
+            if client is None:
+                client = _provider_clients[provider] = factory()
+    return client
+
+
+def estimate_tokens(text: str) -> int:
+    """Conservative token estimate (~3 chars per token) for request sizing"""
+    return len(text) // 3 + 1
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, 'status_code', None) or getattr(error, 'http_status', None)
+    if status is None and getattr(error, 'response', None) is not None:
+        status = getattr(error.response, 'status_code', None)
+    return status
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors, timeouts and connection failures"""
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    name = type(error).__name__
+    return any(marker in name for marker in ('RateLimit', 'Timeout', 'Connection', 'ServiceUnavailable', 'ServerError'))
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Delay requested by the provider's Retry-After header, if any"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        value = headers.get('retry-after') or headers.get('Retry-After')
+        return min(float(value), EMBEDDING_BACKOFF_MAX) if value else None
+    except (TypeError, ValueError):
+        return None
+
 
 class EmbeddingService:
     """
@@ -20,8 +83,9 @@ class EmbeddingService:
     
     SUPPORTED_MODELS = {
         'openai': {
-            'text-embedding-3-small': {'dimensions': 1536, 'cost_per_1m': 0.02},
-            'text-embedding-3-large': {'dimensions': 3072, 'cost_per_1m': 0.13},
+            # Matryoshka-trained: leading dimensions are a usable lower-dimensional embedding
+            'text-embedding-3-small': {'dimensions': 1536, 'cost_per_1m': 0.02, 'matryoshka': True},
+            'text-embedding-3-large': {'dimensions': 3072, 'cost_per_1m': 0.13, 'matryoshka': True},
             'text-embedding-ada-002': {'dimensions': 1536, 'cost_per_1m': 0.10},
         },
         'voyage': {
@@ -36,15 +100,36 @@ class EmbeddingService:
         'cohere': {
             'embed-english-v3.0': {'dimensions': 1024, 'cost_per_1m': 0.10},
             'embed-multilingual-v3.0': {'dimensions': 1024, 'cost_per_1m': 0.10},
+        },
+        # sentence-transformers on CPU (384 dims) - stored in chunk_embeddings like every other model
+        'local': {
+            'paraphrase-multilingual-MiniLM-L12-v2': {
+                'dimensions': 384, 'cost_per_1m': 0, 'hf_name': 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+            },
+            'multilingual-e5-small': {
+                'dimensions': 384, 'cost_per_1m': 0, 'hf_name': 'intfloat/multilingual-e5-small',
+                'query_prefix': 'query: ', 'passage_prefix': 'passage: '
+            },
         }
     }
     
+    # Providers that run in-process and need no API key
+    LOCAL_PROVIDERS = {'local'}
+    
+    # Per-request limits used to split embed_batch calls (kept below the documented maximums)
+    BATCH_LIMITS = {
+        'openai': {'max_items': 512, 'max_tokens': 250_000},
+        'voyage': {'max_items': 128, 'max_tokens': 100_000},
+        'jina': {'max_items': 512, 'max_tokens': 100_000},
+        'cohere': {'max_items': 96, 'max_tokens': 50_000},
+    }
+    
     def __init__(self, provider: str = 'openai', model: str = None):
         """
         Initialize embedding service
         
         Args:
-            provider: 'openai', 'voyage', 'jina', 'cohere'
+            provider: 'openai', 'voyage', 'jina', 'cohere', 'local'
             model: Specific model name (optional, uses default if not specified)
         """
         self.provider = provider.lower()
@@ -54,16 +139,32 @@ class EmbeddingService:
         self._validate_provider()
         self._initialize_client()
     
+    @property
+    def _handle(self):
+        """
+        Registry handle of the local model, looked up per call - the service
+        never holds the model itself, so registry eviction really frees it
+        """
+        from accounts.model_registry import get_model_registry
+        return get_model_registry().sentence_transformer(self._model_info()['hf_name'])
+    
     def _get_default_model(self) -> str:
         """Get default model for provider"""
         defaults = {
             'openai': 'text-embedding-3-large',
             'voyage': 'voyage-large-2',
             'jina': 'jina-embeddings-v2-base-en',
-            'cohere': 'embed-english-v3.0'
+            'cohere': 'embed-english-v3.0',
+            'local': 'paraphrase-multilingual-MiniLM-L12-v2'
         }
         return defaults.get(self.provider, 'text-embedding-3-large')
     
+    @classmethod
+    def has_credentials(cls, provider: str) -> bool:
+        """Whether the provider can be used here (API key configured, or a local model)"""
+        provider = provider.lower()
+        return provider in cls.LOCAL_PROVIDERS or bool(getattr(settings, f'{provider.upper()}_API_KEY', None))
+    
     def _validate_provider(self):
         """Validate provider and model combination"""
         if self.provider not in self.SUPPORTED_MODELS:
@@ -77,37 +178,48 @@ class EmbeddingService:
             )
     
     def _initialize_client(self):
-        """Initialize API client for provider"""
+        """
+        Initialize API client for provider
+        SDK retries are turned off - _embed_with_retry is the only retry loop
+        """
         try:
             if self.provider == 'openai':
                 import openai
                 api_key = getattr(settings, 'OPENAI_API_KEY', None)
                 if not api_key:
                     raise ValueError("OPENAI_API_KEY not found in settings. Please add it to use OpenAI embeddings.")
-                self.client = openai.OpenAI(api_key=api_key)
+                self.client = _shared_client('openai', lambda: openai.OpenAI(api_key=api_key, max_retries=0))
             
             elif self.provider == 'voyage':
                 import voyageai
                 api_key = getattr(settings, 'VOYAGE_API_KEY', None)
                 if not api_key:
                     raise ValueError("VOYAGE_API_KEY not found in settings. Please add it to use Voyage AI embeddings.")
-                self.client = voyageai.Client(api_key=api_key)
+                self.client = _shared_client('voyage', lambda: voyageai.Client(api_key=api_key, max_retries=0))
             
             elif self.provider == 'jina':
                 import requests
-                self.client = requests.Session()
                 api_key = getattr(settings, 'JINA_API_KEY', None)
                 if not api_key:
                     logger.warning("JINA_API_KEY not found. Jina embeddings will not work.")
-                else:
-                    self.client.headers.update({'Authorization': f'Bearer {api_key}'})
+                
+                def jina_session():
+                    session = requests.Session()
+                    if api_key:
+                        session.headers.update({'Authorization': f'Bearer {api_key}'})
+                    return session
+                self.client = _shared_client('jina', jina_session)
             
             elif self.provider == 'cohere':
                 import cohere
                 api_key = getattr(settings, 'COHERE_API_KEY', None)
                 if not api_key:
                     raise ValueError("COHERE_API_KEY not found in settings. Please add it to use Cohere embeddings.")
-                self.client = cohere.Client(api_key)
+                self.client = _shared_client('cohere', lambda: cohere.Client(api_key))
+            
+            elif self.provider == 'local':
+                # Loaded once per process and shared through the model registry (load now, not on first use)
+                self._handle
             
             logger.info(f"Initialized {self.provider} embedding client with model {self.model}")
         
@@ -121,22 +233,76 @@ class EmbeddingService:
             logger.error(f"Failed to initialize {self.provider} client: {e}")
             raise
     
-    def embed_text(self, text: str) -> List[float]:
+    def embed_text(self, text: str, use_cache: bool = True) -> List[float]:
         """
         Generate embedding for single text
+        Query embeddings are served from the two-level cache (in-process LRU + Redis)
         
         Args:
             text: Input text to embed
+            use_cache: Look up / store the embedding in the query embedding cache
         
         Returns:
             List of floats representing the embedding vector
         """
-        return self.embed_batch([text])[0]
+        return self.embed_queries([text], use_cache=use_cache)[0]
+    
+    def embed_queries(self, queries: List[str], use_cache: bool = True) -> List[List[float]]:
+        """
+        Embed a set of search queries (original + variations) in one request
+        Cached queries are skipped; all misses go to the provider in a single embed_batch call
+        
+        Args:
+            queries: Query texts
+            use_cache: Look up / store the embeddings in the query embedding cache
+        
+        Returns:
+            Embedding vectors in query order
+        """
+        if not queries:
+            return []
+        
+        if not use_cache:
+            return self._embed_query_batch(queries)
+        
+        from accounts.embedding_cache import get_query_embedding_cache
+        embedding_cache = get_query_embedding_cache()
+        
+        embeddings = embedding_cache.get_many(self.provider, self.model, queries)
+        
+        missing = [query for query in dict.fromkeys(queries) if query not in embeddings]
+        if missing:
+            fresh = dict(zip(missing, self._embed_query_batch(missing)))
+            embedding_cache.set_many(self.provider, self.model, fresh)
+            embeddings.update(fresh)
+        
+        return [embeddings[query] for query in queries]
+    
+    def _embed_query_batch(self, queries: List[str]) -> List[List[float]]:
+        if self.provider == 'local':
+            return self._embed_local(queries, self._model_info().get('query_prefix', ''))
+        return self.embed_batch(queries)
+    
+    def _embed_local(self, texts: List[str], prefix: str = '') -> List[List[float]]:
+        """
+        Encode with the shared local sentence-transformer
+        Concurrent callers in the process are coalesced into shared forward passes
+        """
+        batch_size = getattr(settings, 'LOCAL_EMBEDDING_BATCH_SIZE', 32)
+        vectors = self._handle.batcher.submit(
+            'encode',
+            [f"{prefix}{text}" for text in texts],
+            batch_size=batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return [np.asarray(vector, dtype=np.float32).tolist() for vector in vectors]
     
     def embed_batch(self, texts: List[str]) -> List[List[float]]:
         """
         Generate embeddings for batch of texts
-        More efficient than multiple single calls
+        Large inputs are split into provider-sized requests that run concurrently
         
         Args:
             texts: List of texts to embed
@@ -147,52 +313,141 @@ class EmbeddingService:
         if not texts:
             return []
         
-        try:
-            if self.provider == 'openai':
-                response = self.client.embeddings.create(
-                    model=self.model,
-                    input=texts
-                )
-                return [data.embedding for data in response.data]
-            
-            elif self.provider == 'voyage':
-                response = self.client.embed(
-                    texts=texts,
-                    model=self.model
-                )
-                return response.embeddings
-            
-            elif self.provider == 'jina':
-                url = "https://api.jina.ai/v1/embeddings"
-                response = self.client.post(
-                    url,
-                    json={
-                        'model': self.model,
-                        'input': texts
-                    }
-                )
-                response.raise_for_status()
-                data = response.json()
-                return [item['embedding'] for item in data['data']]
-            
-            elif self.provider == 'cohere':
-                response = self.client.embed(
-                    texts=texts,
-                    model=self.model
+        if self.provider == 'local':
+            return self._embed_local(texts, self._model_info().get('passage_prefix', ''))
+        
+        embeddings = []
+        for _, batch_embeddings in self.iter_embed_batches(texts):
+            embeddings.extend(batch_embeddings)
+        return embeddings
+    
+    def iter_embed_batches(self, texts: List[str]) -> Iterator[Tuple[int, List[List[float]]]]:
+        """
+        Embed texts in token- and item-bounded requests, yielding results in input order
+        
+        Up to EMBEDDING_MAX_CONCURRENCY requests are in flight; each batch is yielded
+        as soon as it and all batches before it have landed, so callers can report
+        progress and start storing results early.
+        
+        Yields:
+            (index of the batch's first text, embeddings of the batch)
+        """
+        if not texts:
+            return
+        
+        if self.provider == 'local':
+            yield 0, self.embed_batch(texts)
+            return
+        
+        batches = self.plan_batches(texts)
+        concurrency = max(1, getattr(settings, 'EMBEDDING_MAX_CONCURRENCY', 4))
+        
+        if len(batches) == 1 or concurrency == 1:
+            for start, end in batches:
+                yield start, self._embed_with_retry(texts[start:end])
+            return
+        
+        logger.info(f"[Embeddings] {len(texts)} texts in {len(batches)} requests ({concurrency} concurrent)")
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='embed') as executor:
+            try:
+                for start, end in batches:
+                    # Bounded window - don't queue the whole document up front
+                    if len(pending) >= concurrency * 2:
+                        first, future = pending.popleft()
+                        yield first, future.result()
+                    pending.append((start, executor.submit(self._embed_with_retry, texts[start:end])))
+                
+                while pending:
+                    first, future = pending.popleft()
+                    yield first, future.result()
+            finally:
+                for _, future in pending:
+                    future.cancel()
+    
+    def plan_batches(self, texts: List[str]) -> List[Tuple[int, int]]:
+        """Split texts into (start, end) ranges within the provider's per-request limits"""
+        limits = self.BATCH_LIMITS.get(self.provider, {'max_items': 96, 'max_tokens': 50_000})
+        
+        batches = []
+        start, tokens = 0, 0
+        for i, text in enumerate(texts):
+            text_tokens = estimate_tokens(text)
+            if i > start and (i - start >= limits['max_items'] or tokens + text_tokens > limits['max_tokens']):
+                batches.append((start, i))
+                start, tokens = i, 0
+            tokens += text_tokens
+        batches.append((start, len(texts)))
+        return batches
+    
+    def _embed_with_retry(self, texts: List[str]) -> List[List[float]]:
+        """One provider request, retried with exponential backoff on rate limits, 5xx and network errors"""
+        max_retries = getattr(settings, 'EMBEDDING_MAX_RETRIES', 5)
+        for attempt in range(max_retries + 1):
+            try:
+                return self._embed_request(texts)
+            except Exception as e:
+                if attempt >= max_retries or not _is_retryable(e):
+                    logger.error(f"Failed to generate embeddings with {self.provider}: {e}")
+                    raise
+                delay = _retry_after(e) or min(EMBEDDING_BACKOFF_BASE * 2 ** attempt, EMBEDDING_BACKOFF_MAX)
+                delay += random.uniform(0, delay / 4)
+                logger.warning(
+                    f"[Embeddings] {self.provider} request of {len(texts)} texts failed ({e}), "
+                    f"retry {attempt + 1}/{max_retries} in {delay:.1f}s"
                 )
-                return response.embeddings
-            
-        except Exception as e:
-            logger.error(f"Failed to generate embeddings with {self.provider}: {e}")
-            raise
+                time.sleep(delay)
+    
+    def _embed_request(self, texts: List[str]) -> List[List[float]]:
+        """Single embeddings API call"""
+        if self.provider == 'openai':
+            response = self.client.embeddings.create(
+                model=self.model,
+                input=texts
+            )
+            return [data.embedding for data in response.data]
+        
+        elif self.provider == 'voyage':
+            response = self.client.embed(
+                texts=texts,
+                model=self.model
+            )
+            return response.embeddings
+        
+        elif self.provider == 'jina':
+            url = "https://api.jina.ai/v1/embeddings"
+            response = self.client.post(
+                url,
+                json={
+                    'model': self.model,
+                    'input': texts
+                }
+            )
+            response.raise_for_status()
+            data = response.json()
+            return [item['embedding'] for item in data['data']]
+        
+        elif self.provider == 'cohere':
+            # cohere 5.x sets retries per request, not on the client
+            response = self.client.embed(
+                texts=texts,
+                model=self.model,
+                request_options={'max_retries': 0}
+            )
+            return response.embeddings
+        
+        raise ValueError(f"Unsupported provider: {self.provider}")
+    
+    def _model_info(self) -> Dict:
+        return self.SUPPORTED_MODELS[self.provider][self.model]
     
     def get_dimensions(self) -> int:
         """Get embedding dimensions for current model"""
-        return self.SUPPORTED_MODELS[self.provider][self.model]['dimensions']
+        return self._model_info()['dimensions']
     
     def get_cost_per_1m_tokens(self) -> float:
         """Get cost per 1M tokens for current model"""
-        return self.SUPPORTED_MODELS[self.provider][self.model]['cost_per_1m']
+        return self._model_info()['cost_per_1m']
     
     @staticmethod
     def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
@@ -215,19 +470,34 @@ class EmbeddingService:
         Calculate cosine similarity between query and multiple documents
         Vectorized for efficiency
         """
-        query_np = np.array(query_vec)
-        docs_np = np.array(doc_vecs)
-        
-        # Normalize query
-        query_norm = query_np / np.linalg.norm(query_np)
-        
-        # Normalize documents
-        doc_norms = docs_np / np.linalg.norm(docs_np, axis=1, keepdims=True)
+        return EmbeddingService.cosine_similarity_matrix([query_vec], doc_vecs)[0].tolist()
+    
+    @staticmethod
+    def normalize_rows(vectors) -> np.ndarray:
+        """L2-normalize rows into a contiguous float32 matrix (zero rows stay zero)"""
+        matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+    
+    @staticmethod
+    def cosine_similarity_matrix(query_vecs, doc_vecs, doc_vecs_normalized: bool = False) -> np.ndarray:
+        """
+        Cosine similarity of several queries against many documents in one matrix multiply
         
-        # Compute similarities
-        similarities = np.dot(doc_norms, query_norm)
+        Args:
+            query_vecs: (Q, D) query vectors
+            doc_vecs: (N, D) document vectors
+            doc_vecs_normalized: Skip normalizing doc_vecs (already unit length)
         
-        return similarities.tolist()
+        Returns:
+            (Q, N) float32 similarity matrix
+        """
+        queries = EmbeddingService.normalize_rows(query_vecs)
+        docs = doc_vecs if doc_vecs_normalized else EmbeddingService.normalize_rows(doc_vecs)
+        return queries @ docs.T
 
 
 class RerankerService:
@@ -241,9 +511,15 @@ class RerankerService:
             'rerank-english-v3.0': {'cost_per_1k': 2.00},
             'rerank-multilingual-v3.0': {'cost_per_1k': 2.00},
         },
+        # Local sentence-transformers cross-encoders; hub_id defaults to BAAI/<model>
         'bge': {
             'bge-reranker-large': {'cost_per_1k': 0},  # Free, local model
             'bge-reranker-base': {'cost_per_1k': 0},
+            'bge-reranker-v2-m3': {'cost_per_1k': 0},  # Multilingual, ~568M params
+            'mmarco-mMiniLMv2-L12-H384-v1': {  # Multilingual, ~118M params
+                'cost_per_1k': 0,
+                'hub_id': 'cross-encoder/mmarco-mMiniLMv2-L12-H384-v1',
+            },
         }
     }
     
@@ -261,10 +537,17 @@ class RerankerService:
         
         self._initialize_client()
     
+    @property
+    def _handle(self):
+        """Registry handle of the local cross-encoder, looked up per call (see EmbeddingService._handle)"""
+        from accounts.model_registry import get_model_registry
+        hub_id = self.SUPPORTED_MODELS['bge'].get(self.model, {}).get('hub_id', f'BAAI/{self.model}')
+        return get_model_registry().cross_encoder(hub_id)
+    
     def _get_default_model(self) -> str:
         defaults = {
             'cohere': 'rerank-english-v3.0',
-            'bge': 'bge-reranker-large'
+            'bge': 'mmarco-mMiniLMv2-L12-H384-v1'
         }
         return defaults.get(self.provider, 'rerank-english-v3.0')
     
@@ -279,8 +562,8 @@ class RerankerService:
                 self.client = cohere.Client(api_key)
             
             elif self.provider == 'bge':
-                from sentence_transformers import CrossEncoder
-                self.client = CrossEncoder(f'BAAI/{self.model}')
+                # Shared per process - loading the weights takes seconds, so load now
+                self._handle
             
             logger.info(f"Initialized {self.provider} reranker with model {self.model}")
         
@@ -288,6 +571,25 @@ class RerankerService:
             logger.error(f"Failed to initialize {self.provider} reranker: {e}")
             raise
     
+    def score(self, query: str, documents: List[str], batch_size: int = 16) -> List[float]:
+        """
+        Relevance score for every document, in input order
+        The local bge cross-encoder scores pairs in batches of batch_size; concurrent
+        callers in the same process share forward passes through the registry batcher
+        """
+        if not documents:
+            return []
+        
+        if self.provider == 'bge':
+            pairs = [[query, doc] for doc in documents]
+            scores = self._handle.batcher.submit('predict', pairs, batch_size=batch_size, show_progress_bar=False)
+            return [float(score) for score in scores]
+        
+        scores = [0.0] * len(documents)
+        for result in self.rerank(query, documents, top_k=len(documents)):
+            scores[result['index']] = result['score']
+        return scores
+    
     def rerank(
         self,
         query: str,
@@ -324,11 +626,7 @@ class RerankerService:
                 ]
             
             elif self.provider == 'bge':
-                # Create query-document pairs
-                pairs = [[query, doc] for doc in documents]
-                
-                # Get scores
-                scores = self.client.predict(pairs)
+                scores = self.score(query, documents)
                 
                 # Sort by score and take top_k
                 ranked = sorted(
@@ -353,6 +651,81 @@ class RerankerService:
 
 # Factory functions for easy instantiation
 
+_embedding_services: Dict[tuple, EmbeddingService] = {}
+_embedding_services_lock = threading.Lock()
+_default_model_memo = {'value': None, 'expires': 0.0}
+
+
+def shared_embedding_service(provider: str = 'openai', model: Optional[str] = None) -> EmbeddingService:
+    """
+    Per-process EmbeddingService for (provider, model)
+    Raises like the constructor if the provider cannot be initialized
+    """
+    key = (provider.lower(), model)
+    service = _embedding_services.get(key)
+    if service is None:
+        with _embedding_services_lock:
+            service = _embedding_services.get(key)
+            if service is None:
+                service = _embedding_services[key] = EmbeddingService(provider=provider, model=model)
+    return service
+
+
+def _find_default_embedding_model() -> Optional[Tuple[str, str]]:
+    """Default (or first active) embedding model whose provider is usable here"""
+    from accounts.vector_models import EmbeddingModel
+    
+    for model_obj in EmbeddingModel.objects.filter(is_active=True).order_by('-is_default'):
+        # Check if API key exists (local models need none)
+        if EmbeddingService.has_credentials(model_obj.provider):
+            logger.info(f"Using {model_obj.provider}/{model_obj.model_id} (credentials found)")
+            return model_obj.provider, model_obj.model_id
+    return None
+
+
+def resolve_default_embedding_model() -> Optional[Tuple[str, str]]:
+    """
+    (provider, model) of the default embedding model
+    Memoized per process for DEFAULT_MODEL_LOCAL_TTL seconds and shared via Redis,
+    so the EmbeddingModel table is only scanned after invalidation
+    """
+    from django.core.cache import cache
+    
+    now = time.monotonic()
+    if _default_model_memo['value'] and now < _default_model_memo['expires']:
+        return _default_model_memo['value']
+    
+    try:
+        resolved = cache.get(DEFAULT_MODEL_CACHE_KEY)
+    except Exception as e:
+        logger.warning(f"Default embedding model cache lookup failed: {e}")
+        resolved = None
+    
+    if resolved is None:
+        resolved = _find_default_embedding_model()
+        if resolved is None:
+            return None
+        try:
+            cache.set(DEFAULT_MODEL_CACHE_KEY, resolved, timeout=DEFAULT_MODEL_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Default embedding model cache store failed: {e}")
+    
+    resolved = tuple(resolved)
+    _default_model_memo.update(value=resolved, expires=now + DEFAULT_MODEL_LOCAL_TTL)
+    return resolved
+
+
+def invalidate_default_embedding_model():
+    """Forget the resolved default model (call after changing EmbeddingModel defaults / active flags)"""
+    from django.core.cache import cache
+    
+    _default_model_memo.update(value=None, expires=0.0)
+    try:
+        cache.delete(DEFAULT_MODEL_CACHE_KEY)
+    except Exception as e:
+        logger.warning(f"Default embedding model cache invalidation failed: {e}")
+
+
 def get_embedding_service(
     provider: Optional[str] = None,
     model: Optional[str] = None
@@ -360,45 +733,32 @@ def get_embedding_service(
     """
     Get embedding service instance with fallback logic
     Returns None if no valid provider with API key is found
+    Services are shared per process (see shared_embedding_service)
     """
-    from django.conf import settings
-    
     if not provider:
-        # Get default from database
-        from accounts.vector_models import EmbeddingModel
         try:
-            # Try to find active model with available API key
-            active_models = EmbeddingModel.objects.filter(is_active=True).order_by('-is_default')
-            
-            for model_obj in active_models:
-                test_provider = model_obj.provider
-                test_model = model_obj.model_id
-                
-                # Check if API key exists
-                api_key_name = f'{test_provider.upper()}_API_KEY'
-                api_key = getattr(settings, api_key_name, None)
-                
-                if api_key:
-                    provider = test_provider
-                    model = test_model
-                    logger.info(f"Using {provider}/{model} (API key found)")
-                    break
-            else:
-                # No model with API key found
-                logger.warning("No embedding model with valid API key found. Please configure API keys in settings.")
-                return None
-                
+            resolved = resolve_default_embedding_model()
         except Exception as e:
             logger.error(f"Error finding embedding model: {e}")
             return None
+        
+        if resolved is None:
+            # No model with API key found
+            logger.warning("No embedding model with valid API key found. Please configure API keys in settings.")
+            return None
+        provider, model = resolved
     
     try:
-        return EmbeddingService(provider=provider, model=model)
+        return shared_embedding_service(provider=provider, model=model)
     except ValueError as e:
         logger.error(f"Cannot create embedding service: {e}")
         return None
 
 
+_reranker_services: Dict[tuple, RerankerService] = {}
+_reranker_services_lock = threading.Lock()
+
+
 def get_reranker_service(
     provider: Optional[str] = None,
     model: Optional[str] = None
@@ -406,6 +766,7 @@ def get_reranker_service(
     """
     Get reranker service instance
     Uses default from database RerankerModel if not specified
+    Instances are reused per (provider, model) within the process
     """
     if not provider:
         # Get default from database
@@ -426,4 +787,11 @@ def get_reranker_service(
             provider = 'cohere'
             model = 'rerank-english-v3.0'
     
-    return RerankerService(provider=provider, model=model)
+    key = (provider.lower(), model)
+    service = _reranker_services.get(key)
+    if service is None:
+        with _reranker_services_lock:
+            service = _reranker_services.get(key)
+            if service is None:
+                service = _reranker_services[key] = RerankerService(provider=provider, model=model)
+    return service
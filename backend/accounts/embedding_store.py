@@ -0,0 +1,267 @@
+"""
+Model-agnostic chunk embedding storage (chunk_embeddings side table)
+A chunk can hold vectors for several embedding models and retrieval reads the
+serving model's rows. Model changes are blue/green: the new default model is
+backfilled in the background while the old one keeps serving, and the serving
+flag moves atomically once every chunk has a vector for the new model
+"""
+
+import logging
+import re
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+
+from accounts.embedding_service import EmbeddingService, shared_embedding_service
+from accounts.vector_models import ChunkEmbedding, DocumentChunk, EmbeddingModel
+
+logger = logging.getLogger(__name__)
+
+# Model that populated DocumentChunk.embedding before the side table existed
+LEGACY_MODEL = ('openai', 'text-embedding-3-large')
+
+# Resolved serving model: per-process memo in front of a shared Redis entry
+SERVING_MODEL_CACHE_KEY = 'embedding_serving_model'
+SERVING_MODEL_CACHE_TTL = 600
+SERVING_MODEL_LOCAL_TTL = 30
+
+# Chunks per backfill step (one embedding cache lookup + provider requests + upsert)
+BACKFILL_BATCH_SIZE = 256
+
+# pgvector HNSW limit for halfvec
+MAX_INDEX_DIMENSIONS = 4000
+
+# Shadow vectors for first-stage search: leading dimensions of Matryoshka-trained
+# models (text-embedding-3-*) as halfvec, otherwise sign bits of the full vector.
+# Small models are indexed directly - their full index is already cheap
+SHADOW_DIMENSIONS = 256
+SHADOW_MIN_DIMENSIONS = 1024
+
+_serving_memo = {'value': None, 'expires': 0.0}
+
+
+def model_label(provider: str, model: str) -> str:
+    return f"{provider}/{model}"
+
+
+def model_dimensions(provider: str, model: str) -> int:
+    return EmbeddingService.SUPPORTED_MODELS[provider][model]['dimensions']
+
+
+def shadow_kind(provider: str, model: str) -> Optional[str]:
+    """
+    Compact vector searched before exact rescoring: 'matryoshka', 'binary' or None
+
+    RAG_SHADOW_VECTORS: 'auto' (Matryoshka prefix when the model supports it,
+    else binary), 'binary' or 'off'
+    """
+    mode = getattr(settings, 'RAG_SHADOW_VECTORS', 'auto')
+    info = EmbeddingService.SUPPORTED_MODELS[provider][model]
+    if mode == 'off' or info['dimensions'] < SHADOW_MIN_DIMENSIONS:
+        return None
+    if mode == 'auto' and info.get('matryoshka'):
+        return 'matryoshka'
+    return 'binary'
+
+
+# ----- Serving model -----
+
+def serving_model() -> Tuple[str, str]:
+    """(provider, model) whose vectors retrieval reads"""
+    from django.core.cache import cache
+
+    now = time.monotonic()
+    if _serving_memo['value'] and now < _serving_memo['expires']:
+        return _serving_memo['value']
+
+    try:
+        resolved = cache.get(SERVING_MODEL_CACHE_KEY)
+    except Exception as e:
+        logger.warning(f"[EmbeddingStore] Serving model cache lookup failed: {e}")
+        resolved = None
+
+    if resolved is None:
+        resolved = EmbeddingModel.objects.filter(is_serving=True).values_list('provider', 'model_id').first()
+        resolved = resolved or LEGACY_MODEL
+        try:
+            cache.set(SERVING_MODEL_CACHE_KEY, resolved, timeout=SERVING_MODEL_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"[EmbeddingStore] Serving model cache store failed: {e}")
+
+    resolved = tuple(resolved)
+    _serving_memo.update(value=resolved, expires=now + SERVING_MODEL_LOCAL_TTL)
+    return resolved
+
+
+def invalidate_serving_model():
+    from django.core.cache import cache
+
+    _serving_memo.update(value=None, expires=0.0)
+    try:
+        cache.delete(SERVING_MODEL_CACHE_KEY)
+    except Exception as e:
+        logger.warning(f"[EmbeddingStore] Serving model cache invalidation failed: {e}")
+
+
+def serving_embedding_service() -> EmbeddingService:
+    """Embedding service for queries - must match the vectors retrieval reads"""
+    return shared_embedding_service(*serving_model())
+
+
+# ----- Reading / writing vectors -----
+
+def embeddings_for(provider: str, model: str):
+    """Vectors of live chunks for one model (staged chunks of a running ingest are left out)"""
+    return ChunkEmbedding.objects.filter(provider=provider, model_id=model, chunk__staging_run='')
+
+
+def load_embeddings(chunk_ids: Sequence[int], provider: str, model: str) -> Dict[int, np.ndarray]:
+    """{chunk_id: vector} for the chunks that have one for this model"""
+    return dict(embeddings_for(provider, model).filter(chunk_id__in=list(chunk_ids)).values_list('chunk_id', 'embedding'))
+
+
+def store_chunk_embeddings(
+    chunk_ids: Sequence[int],
+    embeddings: Sequence[Optional[Sequence[float]]],
+    provider: str,
+    model: str
+) -> int:
+    """Insert or replace the vectors of the given chunks for one model"""
+    rows = [
+        ChunkEmbedding(chunk_id=chunk_id, provider=provider, model_id=model, embedding=embedding)
+        for chunk_id, embedding in zip(chunk_ids, embeddings)
+        if embedding is not None
+    ]
+    ChunkEmbedding.objects.bulk_create(
+        rows,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['chunk', 'provider', 'model_id'],
+        update_fields=['embedding'],
+    )
+    return len(rows)
+
+
+# ----- Blue/green model migration -----
+
+def missing_chunks(provider: str, model: str):
+    """Chunks without a vector for the model"""
+    return DocumentChunk.objects.filter(
+        ~Exists(embeddings_for(provider, model).filter(chunk=OuterRef('pk')))
+    )
+
+
+def coverage(provider: str, model: str) -> Dict:
+    total = DocumentChunk.objects.count()
+    embedded = embeddings_for(provider, model).count()
+    return {
+        'embedded': embedded,
+        'total': total,
+        'ratio': round(embedded / total, 4) if total else 1.0,
+    }
+
+
+def ensure_model_index(provider: str, model: str):
+    """
+    Partial HNSW index over one model's vectors - the index ann_candidate_ids searches:
+    the shadow vector when the model has one, else a halfvec cast of the full vector
+    """
+    dimensions = model_dimensions(provider, model)
+    kind = shadow_kind(provider, model)
+    slug = re.sub(r'[^a-z0-9]+', '_', f'{provider}_{model}'.lower())[:40]
+
+    if kind == 'matryoshka':
+        name = f'chunk_emb_{slug}_m{SHADOW_DIMENSIONS}_hnsw'
+        expression = f'(subvector(embedding, 1, {SHADOW_DIMENSIONS})::halfvec({SHADOW_DIMENSIONS})) halfvec_cosine_ops'
+    elif kind == 'binary':
+        name = f'chunk_emb_{slug}_bit_hnsw'
+        expression = f'(binary_quantize(embedding)::bit({dimensions})) bit_hamming_ops'
+    elif dimensions <= MAX_INDEX_DIMENSIONS:
+        name = f'chunk_emb_{slug}_hnsw'
+        expression = f'(embedding::halfvec({dimensions})) halfvec_cosine_ops'
+    else:
+        logger.warning(f"[EmbeddingStore] {model_label(provider, model)}: {dimensions} dims - no ANN index")
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON chunk_embeddings '
+            f'USING hnsw ({expression}) WITH (m = 16, ef_construction = 64) '
+            f'WHERE provider = %s AND model_id = %s',
+            [provider, model]
+        )
+
+
+def backfill_embeddings(
+    provider: str,
+    model: str,
+    batch_size: int = BACKFILL_BATCH_SIZE,
+    max_chunks: Optional[int] = None
+) -> int:
+    """
+    Embed chunks that have no vector for the model yet
+    Texts already embedded with this model at ingest come from the embedding cache.
+
+    Returns:
+        Number of chunks embedded
+    """
+    from accounts.ingest_cache import embed_with_cache
+
+    service = shared_embedding_service(provider, model)
+    label = model_label(provider, model)
+    done, last_id = 0, 0
+
+    while max_chunks is None or done < max_chunks:
+        batch = list(
+            missing_chunks(provider, model).filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'contextualized_content', 'content')[:batch_size]
+        )
+        if not batch:
+            break
+
+        texts = [contextualized or content for _, contextualized, content in batch]
+        embeddings, stats = embed_with_cache(service, texts)
+        store_chunk_embeddings([chunk_id for chunk_id, _, _ in batch], embeddings, provider, model)
+
+        last_id = batch[-1][0]
+        done += len(batch)
+        logger.info(f"[EmbeddingStore] Backfill {label}: {done} chunks ({stats['hits']} from cache in last batch)")
+
+    return done
+
+
+def switch_serving_model(provider: str, model: str, require_full_coverage: bool = True) -> bool:
+    """
+    Make the model the one retrieval reads, in one transaction
+    Refuses (returns False) while any chunk still lacks a vector for it
+    """
+    with transaction.atomic():
+        target = EmbeddingModel.objects.select_for_update().filter(provider=provider, model_id=model).first()
+        if target is None:
+            raise ValueError(f"No EmbeddingModel row for {model_label(provider, model)}")
+
+        if require_full_coverage:
+            current = coverage(provider, model)
+            if current['embedded'] < current['total']:
+                logger.info(f"[EmbeddingStore] Not switching to {target.name}: coverage {current}")
+                return False
+
+        EmbeddingModel.objects.filter(is_serving=True).exclude(pk=target.pk).update(is_serving=False)
+        EmbeddingModel.objects.filter(pk=target.pk).update(is_serving=True, is_active=True)
+        transaction.on_commit(invalidate_serving_model)
+
+    logger.info(f"[EmbeddingStore] Serving model switched to {model_label(provider, model)}")
+    return True
+
+
+def users_with_documents() -> List[int]:
+    from accounts.models import Document
+
+    return list(
+        Document.objects.filter(rag_processing_status='completed')
+        .values_list('user_id', flat=True).distinct()
+    )
@@ -0,0 +1,234 @@
+"""
+Keyword classifier that tags chunks with ESRS topical standards (E1-E5, S1-S4, G1)
+and the cross-cutting ESRS 2 topics. Runs at ingest time and is cheap enough to
+run on every chunk; the tags are stored in DocumentChunk.esrs_categories and used
+by run_tier_rag to prefilter candidates for topic-specific disclosures.
+Keywords cover English and Slovenian; chunks it cannot tag are never filtered out
+"""
+
+import logging
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+CROSS_CUTTING = 'ESRS 2'
+
+# Keyword stems per topic (English, then Slovenian) - a token matches when it
+# starts with the stem (stems of 3 characters or less must match the whole token).
+# Words every sustainability report uses (policy, risk, impact, target,
+# sustainability) are deliberately left out: they would tag nearly every chunk ESRS 2
+TOPIC_KEYWORDS: Dict[str, List[str]] = {
+    'E1': [
+        'climate', 'ghg', 'greenhouse', 'emission', 'co2', 'carbon', 'decarboni', 'scope',
+        'energy', 'renewable', 'fossil', 'electricity', 'mwh', 'gwh', 'kwh', 'tco2', 'net-zero',
+        'warming', 'mitigation', 'adaptation',
+        'podnebn', 'toplogred', 'izpust', 'emisij', 'ogljik', 'ogljičn', 'razogljič', 'energij',
+        'energetsk', 'obnovljiv', 'fosiln', 'električn', 'elektrik', 'segrevanj', 'blaženj', 'prilagajanj',
+    ],
+    'E2': [
+        'pollut', 'contaminat', 'nox', 'sox', 'particulate', 'hazardous', 'toxic',
+        'microplastic', 'substance', 'effluent', 'discharge', 'spill',
+        'onesnaž', 'kontaminac', 'nevarn', 'strupen', 'mikroplast', 'snovi', 'izliv', 'izpušč',
+    ],
+    'E3': [
+        'water', 'marine', 'ocean', 'withdrawal', 'wastewater', 'drought', 'aquatic', 'sea',
+        'freshwater', 'groundwater',
+        'voda', 'vodn', 'vodo', 'morj', 'morsk', 'oceanov', 'suša', 'suše', 'podtaln', 'sladkovod',
+    ],
+    'E4': [
+        'biodiversity', 'ecosystem', 'species', 'habitat', 'deforestation', 'land-use', 'nature',
+        'protected', 'wildlife', 'forest', 'soil',
+        'biotsk', 'raznovrstnost', 'ekosistem', 'habitatov', 'krčenj', 'narav', 'zavarovan', 'gozd', 'prst',
+    ],
+    'E5': [
+        'circular', 'waste', 'recycl', 'reuse', 'packaging', 'landfill', 'resource', 'materials',
+        'inflow', 'outflow', 'durability', 'repair',
+        'krožn', 'odpad', 'reciklir', 'recikla', 'embalaž', 'odlagališč', 'surovin', 'popravil', 'trajnejš',
+    ],
+    'S1': [
+        'employee', 'workforce', 'worker', 'staff', 'wage', 'salary', 'remuneration', 'training',
+        'health', 'safety', 'injur', 'fatalit', 'diversity', 'gender', 'turnover', 'collective',
+        'headcount', 'absentee',
+        'zaposlen', 'delavc', 'delavk', 'kadr', 'plača', 'plače', 'plačn', 'nagrajevanj', 'izobraževanj',
+        'usposablj', 'zdravj', 'varnost', 'poškodb', 'nesreč', 'raznolikost', 'spol', 'fluktuacij',
+        'kolektivn', 'bolniš', 'odsotnost',
+    ],
+    'S2': [
+        'supplier', 'supply', 'value-chain', 'subcontract', 'forced', 'child', 'sourcing',
+        'procurement',
+        'dobavitelj', 'dobavn', 'podizvajal', 'prisiln', 'otrošk', 'nabav',
+    ],
+    'S3': [
+        'communit', 'indigenous', 'resettlement', 'local', 'land-rights', 'neighbour', 'neighbor',
+        'skupnost', 'staroselsk', 'preselitv', 'lokaln', 'sosesk',
+    ],
+    'S4': [
+        'consumer', 'customer', 'end-user', 'privacy', 'product', 'labelling', 'labeling',
+        'marketing', 'accessibility',
+        'potrošnik', 'kupc', 'kupec', 'uporabnik', 'zasebnost', 'izdelk', 'izdelek', 'označevanj',
+        'oglaševanj', 'trženj', 'dostopnost',
+    ],
+    'G1': [
+        'corruption', 'bribery', 'whistleblow', 'ethic', 'lobbying', 'political', 'compliance',
+        'payment', 'fraud', 'anti-competitive', 'conduct',
+        'korupcij', 'protikorupcij', 'podkup', 'žvižgač', 'etičn', 'etik', 'lobir', 'politič',
+        'skladnost', 'plačil', 'goljuf', 'protikonkurenčn',
+    ],
+    CROSS_CUTTING: [
+        'materiality', 'governance', 'board', 'strategy', 'stakeholder', 'due-diligence',
+        'opportunit', 'csrd', 'esrs',
+        'bistvenost', 'upravljanj', 'strategij', 'deležnik', 'priložnost',
+    ],
+}
+
+# Multi-word phrases count as strong evidence (matched on the lowercased text)
+TOPIC_PHRASES: Dict[str, List[str]] = {
+    'E1': [
+        'climate change', 'scope 1', 'scope 2', 'scope 3', 'transition plan', 'energy consumption',
+        'podnebne spremembe', 'podnebnih sprememb', 'obseg 1', 'obseg 2', 'obseg 3', 'prehodni načrt',
+        'poraba energije', 'porabe energije',
+    ],
+    'E2': [
+        'air quality', 'substances of concern', 'pollution of air',
+        'kakovost zraka', 'onesnaževanje zraka', 'zaskrbljujoče snovi',
+    ],
+    'E3': [
+        'water consumption', 'water withdrawal', 'marine resources',
+        'poraba vode', 'porabe vode', 'odvzem vode', 'morski viri', 'odpadne vode', 'odpadnih voda',
+    ],
+    'E4': [
+        'land use', 'ecosystem services', 'sensitive areas',
+        'raba tal', 'ekosistemske storitve', 'občutljiva območja',
+    ],
+    'E5': [
+        'circular economy', 'resource use', 'waste management',
+        'krožno gospodarstvo', 'krožnega gospodarstva', 'raba virov', 'ravnanje z odpadki',
+    ],
+    'S1': [
+        'own workforce', 'health and safety', 'adequate wages', 'work-life balance',
+        'lastna delovna sila', 'lastne delovne sile', 'zdravje in varnost', 'varnost in zdravje pri delu',
+    ],
+    'S2': [
+        'value chain workers', 'workers in the value chain', 'supply chain',
+        'delavci v vrednostni verigi', 'dobavna veriga', 'dobavni verigi', 'otroško delo', 'prisilno delo',
+    ],
+    'S3': [
+        'affected communities', 'indigenous peoples',
+        'prizadete skupnosti', 'lokalne skupnosti', 'staroselska ljudstva',
+    ],
+    'S4': [
+        'consumers and end-users', 'customer satisfaction', 'data protection',
+        'potrošniki in končni uporabniki', 'zadovoljstvo kupcev', 'varstvo osebnih podatkov',
+    ],
+    'G1': [
+        'business conduct', 'corporate culture', 'payment practices', 'anti-corruption',
+        'poslovno ravnanje', 'korporativna kultura', 'plačilne prakse',
+    ],
+    CROSS_CUTTING: [
+        'double materiality', 'due diligence', 'business model', 'value chain', 'impacts, risks and opportunities',
+        'sustainability policy', 'sustainability strategy', 'sustainability targets',
+        'dvojna bistvenost', 'dvojne bistvenosti', 'skrbni pregled', 'poslovni model', 'vrednostna veriga',
+        'vrednostni verigi', 'vplivi, tveganja in priložnosti', 'trajnostna strategija',
+    ],
+}
+
+TOPIC_CODES = [topic for topic in TOPIC_KEYWORDS if topic != CROSS_CUTTING]
+
+PHRASE_WEIGHT = 3
+MIN_SCORE = 3
+MAX_TOPICS = 3
+
+# Letters of any script (č, š, ž, ...) and digits, optionally hyphenated
+_TOKEN_RE = re.compile(r'[^\W_](?:[^\W_]|-)*')
+
+
+def _keyword_index() -> Dict[str, List[str]]:
+    """Map each keyword stem to the topics that use it"""
+    index: Dict[str, List[str]] = {}
+    for topic, stems in TOPIC_KEYWORDS.items():
+        for stem in stems:
+            index.setdefault(stem, []).append(topic)
+    return index
+
+
+_KEYWORDS = _keyword_index()
+_STEMS_BY_PREFIX: Dict[str, List[str]] = {}
+for _stem in _KEYWORDS:
+    _STEMS_BY_PREFIX.setdefault(_stem[:3], []).append(_stem)
+
+
+def topic_scores(text: str) -> Counter:
+    """Keyword + phrase hit counts per topic"""
+    lowered = text.lower()
+    scores = Counter()
+
+    for token, count in Counter(_TOKEN_RE.findall(lowered)).items():
+        for stem in _STEMS_BY_PREFIX.get(token[:3], ()):
+            if token == stem or (len(stem) > 3 and token.startswith(stem)):
+                for topic in _KEYWORDS[stem]:
+                    scores[topic] += count
+
+    for topic, phrases in TOPIC_PHRASES.items():
+        for phrase in phrases:
+            hits = lowered.count(phrase)
+            if hits:
+                scores[topic] += hits * PHRASE_WEIGHT
+
+    return scores
+
+
+def classify_text(text: str, min_score: int = MIN_SCORE, max_topics: int = MAX_TOPICS) -> List[str]:
+    """
+    ESRS topic codes for a chunk, strongest first
+
+    Returns:
+        e.g. ['E1', 'ESRS 2'] - empty when no topic reaches min_score
+    """
+    if not text:
+        return []
+
+    scores = topic_scores(text)
+    return [topic for topic, score in scores.most_common(max_topics) if score >= min_score]
+
+
+def disclosure_topics(disclosure) -> Optional[List[str]]:
+    """
+    Categories to prefilter chunks for a disclosure: its topical standard plus cross-cutting topics
+    None for non-ESRS standards and for ESRS 1 / ESRS 2 disclosures, which need the full corpus
+    """
+    if disclosure.standard_type != 'ESRS':
+        return None
+
+    code = (disclosure.standard.code or '').strip().upper()
+    if code not in TOPIC_CODES:
+        return None
+
+    return [code, CROSS_CUTTING]
+
+
+@dataclass
+class TopicPrefilter:
+    """
+    Chunks searched for a topic-specific disclosure
+
+    Tagged chunks of the disclosure's categories plus untagged chunks (text the
+    keyword tagger has no keywords for must not be dropped), and every chunk of
+    the documents with too few tagged chunks to prefilter at all
+    """
+    categories: List[str]
+    full_document_ids: List[int] = field(default_factory=list)
+
+    def condition(self, prefix: str = '') -> Q:
+        """Filter on DocumentChunk (prefix e.g. 'chunk__' from a related model)"""
+        condition = (
+            Q(**{f'{prefix}esrs_categories__has_any_keys': self.categories})
+            | Q(**{f'{prefix}esrs_categories': []})
+        )
+        if self.full_document_ids:
+            condition |= Q(**{f'{prefix}document_id__in': self.full_document_ids})
+        return condition
@@ -0,0 +1,144 @@
+"""
+Vectorized hybrid scoring (semantic + BM25) for RAG retrieval
+Chunk embeddings are kept in one contiguous float32 matrix, all query
+variations are scored with a single matrix multiply and top-k selection
+uses argpartition instead of a full sort
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from accounts.embedding_service import EmbeddingService
+from accounts.embedding_store import load_embeddings, model_dimensions, serving_model
+
+logger = logging.getLogger(__name__)
+
+# Hybrid Score: 60% semantic + 40% BM25
+SEMANTIC_WEIGHT = 0.6
+BM25_WEIGHT = 0.4
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first - O(N + k log k)"""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k >= scores.size:
+        return np.argsort(-scores, kind='stable')
+
+    indices = np.argpartition(-scores, k - 1)[:k]
+    return indices[np.argsort(-scores[indices], kind='stable')]
+
+
+def normalize_bm25(bm25_scores: np.ndarray) -> np.ndarray:
+    """Scale each query row to 0-1 by its maximum score"""
+    maxima = bm25_scores.max(axis=1, keepdims=True) if bm25_scores.size else np.ones((bm25_scores.shape[0], 1))
+    maxima[maxima <= 0] = 1.0
+    return bm25_scores / maxima
+
+
+def query_matrix(query_embeddings: List[Optional[List[float]]], dimensions: int) -> np.ndarray:
+    """Stack query embeddings into a (Q, D) float32 matrix - missing embeddings become zero rows"""
+    queries = np.zeros((len(query_embeddings), dimensions), dtype=np.float32)
+    for row, embedding in enumerate(query_embeddings):
+        if embedding is not None and len(embedding):
+            queries[row] = embedding
+    return queries
+
+
+def bm25_score_matrix(bm25_scores: List[Dict[int, float]], chunk_ids: Sequence[int]) -> np.ndarray:
+    """Scatter sparse {chunk_id: score} results into a normalized (Q, N) matrix aligned with chunk_ids"""
+    lookup = {int(chunk_id): row for row, chunk_id in enumerate(chunk_ids)}
+    matrix = np.zeros((len(bm25_scores), len(lookup)), dtype=np.float32)
+    for row, scores in enumerate(bm25_scores):
+        hits = [(lookup[chunk_id], score) for chunk_id, score in scores.items() if chunk_id in lookup]
+        if hits:
+            columns, values = zip(*hits)
+            matrix[row, list(columns)] = values
+    return normalize_bm25(matrix)
+
+
+@dataclass
+class FusedScores:
+    """Per-chunk scores averaged over all query variations"""
+    hybrid: np.ndarray
+    semantic: np.ndarray
+    bm25: np.ndarray
+
+    def top_k(self, k: int) -> np.ndarray:
+        return top_k_indices(self.hybrid, k)
+
+    def select(self, mask: np.ndarray) -> 'FusedScores':
+        """Scores of the columns where mask is True"""
+        return FusedScores(hybrid=self.hybrid[mask], semantic=self.semantic[mask], bm25=self.bm25[mask])
+
+
+def fuse_scores(semantic: np.ndarray, bm25_norm: Optional[np.ndarray] = None) -> FusedScores:
+    """
+    Combine (Q, N) semantic and normalized BM25 matrices into averaged per-chunk scores
+
+    Without BM25 (TIER 1 disabled) the hybrid score is the semantic score.
+    """
+    if bm25_norm is None:
+        bm25_norm = np.zeros_like(semantic)
+        hybrid = semantic
+    else:
+        hybrid = SEMANTIC_WEIGHT * semantic + BM25_WEIGHT * bm25_norm
+
+    return FusedScores(
+        hybrid=hybrid.mean(axis=0),
+        semantic=semantic.mean(axis=0),
+        bm25=bm25_norm.mean(axis=0)
+    )
+
+
+class ChunkEmbeddingMatrix:
+    """
+    Chunk ids aligned with a row-normalized float32 embedding matrix
+    Chunks without an embedding are stored as zero rows (similarity 0)
+    """
+
+    def __init__(self, chunk_ids: Sequence[int], embeddings: np.ndarray, normalized: bool = False):
+        self.chunk_ids = np.asarray(chunk_ids, dtype=np.int64)
+        self.embeddings = embeddings if normalized else EmbeddingService.normalize_rows(embeddings)
+
+    @classmethod
+    def from_chunks(cls, chunks: Sequence, model: Optional[Tuple[str, str]] = None) -> 'ChunkEmbeddingMatrix':
+        """Build the matrix for DocumentChunk rows from their stored vectors (serving model by default)"""
+        provider, model_id = model or serving_model()
+        vectors = load_embeddings([chunk.id for chunk in chunks], provider, model_id)
+        matrix = np.zeros((len(chunks), model_dimensions(provider, model_id)), dtype=np.float32)
+        for row, chunk in enumerate(chunks):
+            vector = vectors.get(chunk.id)
+            if vector is not None:
+                matrix[row] = vector
+        return cls([chunk.id for chunk in chunks], matrix)
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    @property
+    def dimensions(self) -> int:
+        return self.embeddings.shape[1]
+
+    def semantic_scores(self, query_embeddings: List[Optional[List[float]]]) -> np.ndarray:
+        """(Q, N) cosine similarities - missing query embeddings score 0 everywhere"""
+        return EmbeddingService.cosine_similarity_matrix(
+            query_matrix(query_embeddings, self.dimensions), self.embeddings, doc_vecs_normalized=True
+        )
+
+    def bm25_matrix(self, bm25_scores: List[Dict[int, float]]) -> np.ndarray:
+        """Normalized (Q, N) BM25 matrix aligned with the matrix rows"""
+        return bm25_score_matrix(bm25_scores, self.chunk_ids)
+
+    def score(
+        self,
+        query_embeddings: List[Optional[List[float]]],
+        bm25_scores: Optional[List[Dict[int, float]]] = None
+    ) -> FusedScores:
+        """Hybrid scores for every chunk, averaged over query variations"""
+        semantic = self.semantic_scores(query_embeddings)
+        bm25_norm = self.bm25_matrix(bm25_scores) if bm25_scores is not None else None
+        return fuse_scores(semantic, bm25_norm)
@@ -0,0 +1,109 @@
+"""
+Content-addressed caches for document ingest
+Embeddings are keyed by (embedding model, sha256 of the contextualized chunk text)
+and generated contexts by (sha256 of the document, sha256 of the chunk), so
+re-uploads, re-scrapes and reprocessing only pay for text that actually changed
+"""
+
+import hashlib
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from accounts.embedding_service import estimate_tokens
+from accounts.rate_budget import provider_budget
+from accounts.vector_models import ChunkContextCache, EmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+# Hashes per IN (...) lookup
+LOOKUP_BATCH_SIZE = 1000
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def hit_rate(hits: int, misses: int) -> float:
+    total = hits + misses
+    return round(hits / total, 3) if total else 0.0
+
+
+def embed_with_cache(
+    embedding_service,
+    texts: List[str],
+    on_progress: Optional[Callable[[int, int], None]] = None
+) -> Tuple[List[List[float]], Dict]:
+    """
+    Embeddings for texts, calling the provider only for text not seen before
+
+    Identical texts within the batch are embedded once. New embeddings are
+    stored as each request lands, so an interrupted run keeps its progress.
+    Hosted providers' token usage is recorded in the shared rate budget.
+
+    Args:
+        embedding_service: EmbeddingService to use for misses
+        texts: Texts to embed
+        on_progress: Called with (texts done, total) as results arrive
+
+    Returns:
+        (embeddings in input order, {'hits', 'misses', 'hit_rate'})
+    """
+    provider, model = embedding_service.provider, embedding_service.model
+    hashes = [text_hash(text) for text in texts]
+    unique = list(dict.fromkeys(hashes))
+
+    found: Dict[str, List[float]] = {}
+    for start in range(0, len(unique), LOOKUP_BATCH_SIZE):
+        rows = EmbeddingCache.objects.filter(
+            provider=provider,
+            model_id=model,
+            content_hash__in=unique[start:start + LOOKUP_BATCH_SIZE]
+        ).values_list('content_hash', 'embedding')
+        found.update((digest, embedding.tolist()) for digest, embedding in rows)
+
+    missing = [digest for digest in unique if digest not in found]
+    text_by_hash = dict(zip(hashes, texts))
+    hits = sum(1 for digest in hashes if digest in found)
+
+    if on_progress:
+        on_progress(hits, len(texts))
+
+    if missing:
+        budget = None if provider in embedding_service.LOCAL_PROVIDERS else provider_budget(provider)
+        missing_texts = [text_by_hash[digest] for digest in missing]
+        for first, batch_embeddings in embedding_service.iter_embed_batches(missing_texts):
+            batch_hashes = missing[first:first + len(batch_embeddings)]
+            if budget:
+                budget.record(sum(estimate_tokens(text) for text in missing_texts[first:first + len(batch_embeddings)]))
+            found.update(zip(batch_hashes, batch_embeddings))
+            EmbeddingCache.objects.bulk_create([
+                EmbeddingCache(provider=provider, model_id=model, content_hash=digest, embedding=embedding)
+                for digest, embedding in zip(batch_hashes, batch_embeddings)
+            ], ignore_conflicts=True)
+            if on_progress:
+                on_progress(sum(1 for digest in hashes if digest in found), len(texts))
+
+    stats = {'hits': hits, 'misses': len(texts) - hits, 'hit_rate': hit_rate(hits, len(texts) - hits)}
+    logger.info(
+        f"[IngestCache] Embeddings {provider}/{model}: {stats['hits']} cached, "
+        f"{len(missing)} embedded ({stats['misses'] - len(missing)} duplicates)"
+    )
+    return [found[digest] for digest in hashes], stats
+
+
+def cached_contexts(document_hash: str, chunk_texts: List[str]) -> Dict[str, str]:
+    """Stored contexts for the document's chunks: {chunk hash: context}"""
+    chunk_hashes = list(dict.fromkeys(text_hash(text) for text in chunk_texts))
+    contexts = {}
+    for start in range(0, len(chunk_hashes), LOOKUP_BATCH_SIZE):
+        contexts.update(ChunkContextCache.objects.filter(
+            document_hash=document_hash,
+            chunk_hash__in=chunk_hashes[start:start + LOOKUP_BATCH_SIZE]
+        ).values_list('chunk_hash', 'context'))
+    return contexts
+
+
+def store_context(document_hash: str, chunk_hash: str, context: str, generator: str = ''):
+    ChunkContextCache.objects.bulk_create([
+        ChunkContextCache(document_hash=document_hash, chunk_hash=chunk_hash, context=context, generator=generator)
+    ], ignore_conflicts=True)
@@ -0,0 +1,69 @@
+"""
+Management command to micro-benchmark vectorized hybrid scoring
+Measures ms/query for semantic matmul + BM25 fusion + top-k on synthetic corpora
+"""
+
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from accounts.hybrid_scoring import ChunkEmbeddingMatrix
+from accounts.vector_models import EMBEDDING_DIMENSIONS
+
+
+class Command(BaseCommand):
+    help = 'Benchmark vectorized hybrid scoring (ms/query) at 1k, 10k and 100k chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                            help='Corpus sizes (number of chunks)')
+        parser.add_argument('--dimensions', type=int, default=EMBEDDING_DIMENSIONS,
+                            help='Embedding dimensions')
+        parser.add_argument('--queries', type=int, default=4,
+                            help='Query variations scored together (original + 3 variations)')
+        parser.add_argument('--bm25-hits', type=float, default=0.05,
+                            help='Fraction of chunks with a BM25 match per query')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Timed repetitions per corpus size')
+        parser.add_argument('--top-k', type=int, default=10)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(42)
+        dims = options['dimensions']
+        num_queries = options['queries']
+
+        self.stdout.write(
+            f"Hybrid scoring benchmark: {dims} dims, {num_queries} query variations, "
+            f"top-{options['top_k']}, {options['repeat']} runs"
+        )
+        self.stdout.write(f"{'chunks':>10} {'ms/query':>10} {'ms/batch':>10} {'matrix MB':>10}")
+
+        for size in options['sizes']:
+            embeddings = rng.standard_normal((size, dims), dtype=np.float32)
+            matrix = ChunkEmbeddingMatrix(np.arange(size), embeddings)
+            del embeddings
+
+            query_embeddings = [rng.standard_normal(dims).tolist() for _ in range(num_queries)]
+            hits = max(1, int(size * options['bm25_hits']))
+            bm25_scores = [
+                dict(zip(rng.choice(size, hits, replace=False).tolist(), rng.random(hits).tolist()))
+                for _ in range(num_queries)
+            ]
+
+            # Warm-up (BLAS thread pools, page faults)
+            matrix.score(query_embeddings, bm25_scores).top_k(options['top_k'])
+
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                matrix.score(query_embeddings, bm25_scores).top_k(options['top_k'])
+                timings.append(time.perf_counter() - start)
+
+            batch_ms = float(np.median(timings)) * 1000
+            self.stdout.write(
+                f"{size:>10} {batch_ms / num_queries:>10.2f} {batch_ms:>10.2f} "
+                f"{matrix.embeddings.nbytes / 1024 / 1024:>10.1f}"
+            )
+
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark complete'))
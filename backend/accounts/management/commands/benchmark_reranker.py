@@ -0,0 +1,69 @@
+"""
+Management command to benchmark the local cross-encoder rerank stage
+Measures ms per query for N candidates of a given length through RerankerService.score
+(uncached - the Redis score cache is bypassed), for one or more models
+"""
+
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.embedding_service import RerankerService
+from accounts.reranking import RERANK_BATCH_SIZE, RERANK_CANDIDATES
+
+SAMPLE_TEXT = (
+    "The company reports gross Scope 1 greenhouse gas emissions of 12,450 tCO2e for the reporting year, "
+    "a reduction of 8% compared to the base year, mainly from replacing natural gas boilers with heat pumps. "
+    "Podjetje poroča o bruto emisijah toplogrednih plinov obsega 1 in o ukrepih za njihovo zmanjšanje. "
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark local cross-encoder reranking (ms/query) for the configured or given models'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--models', nargs='+',
+                            default=[getattr(settings, 'RAG_RERANKER_MODEL', 'mmarco-mMiniLMv2-L12-H384-v1')],
+                            help="Model names from RerankerService.SUPPORTED_MODELS['bge']")
+        parser.add_argument('--candidates', type=int, nargs='+', default=[RERANK_CANDIDATES],
+                            help='Candidates scored per query')
+        parser.add_argument('--words', type=int, default=200,
+                            help='Approximate words per candidate chunk')
+        parser.add_argument('--batch-size', type=int, default=RERANK_BATCH_SIZE)
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Timed repetitions per setting')
+
+    def handle(self, *args, **options):
+        words = SAMPLE_TEXT.split()
+        chunk = ' '.join(words[i % len(words)] for i in range(options['words']))
+        query = 'What are the gross Scope 1 GHG emissions and how did they change?'
+
+        self.stdout.write(
+            f"Reranker benchmark: ~{options['words']} words/chunk, batch {options['batch_size']}, "
+            f"max_length {getattr(settings, 'RAG_RERANKER_MAX_LENGTH', 256)}, "
+            f"int8 {getattr(settings, 'RAG_RERANKER_QUANTIZE', True)}, {options['repeat']} runs"
+        )
+        self.stdout.write(f"{'model':<32} {'candidates':>10} {'load s':>8} {'ms/query':>10} {'ms/pair':>8}")
+
+        for model in options['models']:
+            start = time.perf_counter()
+            reranker = RerankerService(provider='bge', model=model)
+            load_s = time.perf_counter() - start
+
+            for count in options['candidates']:
+                documents = [f"{i}. {chunk}" for i in range(count)]
+                # Warm-up (thread pools, first-call allocations)
+                reranker.score(query, documents, batch_size=options['batch_size'])
+
+                timings = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    reranker.score(query, documents, batch_size=options['batch_size'])
+                    timings.append(time.perf_counter() - start)
+
+                query_ms = float(np.median(timings)) * 1000
+                self.stdout.write(f"{model:<32} {count:>10} {load_s:>8.1f} {query_ms:>10.1f} {query_ms / count:>8.2f}")
+
+        self.stdout.write(self.style.SUCCESS('✓ Benchmark complete'))
@@ -166,6 +166,30 @@ class Command(BaseCommand):
         if created:
             self.stdout.write(self.style.SUCCESS(f'✓ Created {bge_base.name}'))
         
+        bge_m3, created = RerankerModel.objects.get_or_create(
+            name='BGE Reranker v2 M3 (Multilingual)',
+            defaults={
+                'provider': 'bge',
+                'model_id': 'bge-reranker-v2-m3',
+                'cost_per_1k_searches': 0.00,
+                'is_active': False,
+            }
+        )
+        if created:
+            self.stdout.write(self.style.SUCCESS(f'✓ Created {bge_m3.name}'))
+        
+        mminilm, created = RerankerModel.objects.get_or_create(
+            name='mMiniLM L12 Cross-Encoder (Multilingual)',
+            defaults={
+                'provider': 'bge',
+                'model_id': 'mmarco-mMiniLMv2-L12-H384-v1',
+                'cost_per_1k_searches': 0.00,
+                'is_active': False,
+            }
+        )
+        if created:
+            self.stdout.write(self.style.SUCCESS(f'✓ Created {mminilm.name}'))
+        
         self.stdout.write('\n' + '='*60)
         self.stdout.write(self.style.SUCCESS('✓ Successfully populated embedding and reranker models'))
         self.stdout.write('='*60)
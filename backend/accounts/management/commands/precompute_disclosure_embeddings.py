@@ -0,0 +1,46 @@
+"""
+Management command to precompute disclosure query embeddings
+Embeds each disclosure's retrieval query once per active embedding model
+"""
+
+from django.core.management.base import BaseCommand
+
+from accounts.disclosure_embeddings import (
+    PRECOMPUTE_BATCH_SIZE,
+    active_embedding_services,
+    precompute_disclosure_embeddings,
+)
+from accounts.embedding_service import EmbeddingService
+from accounts.models import ESRSDisclosure
+
+
+class Command(BaseCommand):
+    help = 'Precompute query embeddings for ESRS/ISO disclosures (skips texts that are already embedded)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--standard-type', type=str, help='Only disclosures of this standard type (e.g. ESRS)')
+        parser.add_argument('--provider', type=str, help='Only this embedding provider')
+        parser.add_argument('--model', type=str, help='Only this embedding model (requires --provider)')
+        parser.add_argument('--batch-size', type=int, default=PRECOMPUTE_BATCH_SIZE,
+                            help='Texts per embedding request')
+
+    def handle(self, *args, **options):
+        disclosures = ESRSDisclosure.objects.only('id', 'code', 'name', 'requirement_text', 'ai_prompt')
+        if options['standard_type']:
+            disclosures = disclosures.filter(standard_type=options['standard_type'])
+
+        if options['provider']:
+            services = [EmbeddingService(provider=options['provider'], model=options['model'])]
+        else:
+            services = active_embedding_services()
+
+        if not services:
+            self.stdout.write(self.style.WARNING('No active embedding model with an API key found'))
+            return
+
+        self.stdout.write(f'Embedding {disclosures.count()} disclosures with {len(services)} model(s)...')
+
+        created = precompute_disclosure_embeddings(disclosures, services, batch_size=options['batch_size'])
+
+        for label, count in created.items():
+            self.stdout.write(self.style.SUCCESS(f'✓ {label}: {count} new embeddings'))
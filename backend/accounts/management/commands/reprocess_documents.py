@@ -0,0 +1,48 @@
+"""
+Management command to start, resume or inspect the corpus reprocessing job
+Run after changing the chunker or the embedding model
+"""
+
+from django.core.management.base import BaseCommand
+
+from accounts.models import User
+from accounts.reprocessing import REPROCESS_BATCH_SIZE, active_job
+
+
+class Command(BaseCommand):
+    help = 'Reprocess all documents in low-priority batches (resumes an unfinished job)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--status', action='store_true', help='Only show the unfinished job')
+        parser.add_argument('--user-email', type=str, help='Owner of the job status (default: first superuser)')
+        parser.add_argument('--batch-size', type=int, default=REPROCESS_BATCH_SIZE, help='Documents per batch task')
+
+    def handle(self, *args, **options):
+        job = active_job()
+
+        if options['status']:
+            if job is None:
+                self.stdout.write('No reprocessing job running')
+                return
+            meta = job.metadata
+            self.stdout.write(
+                f"Job {job.pk}: {job.completed_items}/{job.total_items} documents "
+                f"({meta['failed']} failed), {meta.get('docs_per_minute', 0)} docs/min, "
+                f"ETA {meta.get('eta_seconds')}s, checkpoint document {meta['checkpoint']}"
+            )
+            return
+
+        user_id = None
+        if options['user_email']:
+            user_id = User.objects.filter(email=options['user_email']).values_list('id', flat=True).first()
+            if user_id is None:
+                self.stdout.write(self.style.ERROR(f"No user {options['user_email']}"))
+                return
+
+        from accounts.document_rag_tasks import reprocess_all_documents
+
+        reprocess_all_documents.delay(user_id=user_id, batch_size=options['batch_size'])
+        if job:
+            self.stdout.write(self.style.SUCCESS(f'✓ Resuming job {job.pk} at document {job.metadata["checkpoint"]}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✓ Reprocessing job queued'))
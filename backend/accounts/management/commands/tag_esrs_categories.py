@@ -0,0 +1,46 @@
+"""
+Management command to tag existing document chunks with ESRS topic categories
+New chunks are tagged at ingest; this backfills chunks processed before that
+"""
+
+from django.core.management.base import BaseCommand
+
+from accounts.esrs_classifier import classify_text
+from accounts.vector_models import DocumentChunk
+
+
+class Command(BaseCommand):
+    help = 'Populate DocumentChunk.esrs_categories with the keyword ESRS topic classifier'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Re-tag every chunk (default: only chunks without categories)')
+        parser.add_argument('--user-id', type=int, help='Only chunks of this user\'s documents')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunks = DocumentChunk.objects.only('id', 'content', 'esrs_categories').order_by('id')
+        if not options['all']:
+            chunks = chunks.filter(esrs_categories=[])
+        if options['user_id']:
+            chunks = chunks.filter(document__user_id=options['user_id'])
+
+        total = chunks.count()
+        self.stdout.write(f'Tagging {total} chunks...')
+
+        batch, tagged, processed = [], 0, 0
+        for chunk in chunks.iterator(chunk_size=options['batch_size']):
+            chunk.esrs_categories = classify_text(chunk.content)
+            tagged += bool(chunk.esrs_categories)
+            batch.append(chunk)
+            processed += 1
+
+            if len(batch) >= options['batch_size']:
+                DocumentChunk.objects.bulk_update(batch, ['esrs_categories'])
+                batch = []
+                self.stdout.write(f'  {processed}/{total}')
+
+        if batch:
+            DocumentChunk.objects.bulk_update(batch, ['esrs_categories'])
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Tagged {tagged} of {processed} chunks with ESRS categories'))
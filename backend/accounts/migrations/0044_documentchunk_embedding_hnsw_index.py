@@ -0,0 +1,35 @@
+# Generated by Django 5.0 on 2026-10-17 09:12
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+import pgvector.django.indexes
+import pgvector.django.halfvec
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0043_add_company_branding_fields'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='documentchunk',
+            index=pgvector.django.indexes.HnswIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.comparison.Cast(
+                        'embedding',
+                        output_field=pgvector.django.halfvec.HalfVectorField(dimensions=3072)
+                    ),
+                    name='halfvec_cosine_ops'
+                ),
+                ef_construction=64,
+                m=16,
+                name='chunk_embedding_hnsw_idx'
+            ),
+        ),
+    ]
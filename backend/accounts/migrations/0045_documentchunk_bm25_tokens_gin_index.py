@@ -0,0 +1,41 @@
+# Generated by Django 5.0 on 2026-10-17 10:05
+
+import django.contrib.postgres.indexes
+from collections import Counter
+from django.db import migrations, models
+
+
+def backfill_bm25_tokens(apps, schema_editor):
+    """Compute BM25 postings for chunks created before the inverted index existed"""
+    DocumentChunk = apps.get_model('accounts', 'DocumentChunk')
+    
+    batch = []
+    for chunk in DocumentChunk.objects.filter(bm25_tokens={}).only('id', 'content').iterator(chunk_size=500):
+        chunk.bm25_tokens = dict(Counter(chunk.content.lower().split()))
+        batch.append(chunk)
+        if len(batch) >= 500:
+            DocumentChunk.objects.bulk_update(batch, ['bm25_tokens'])
+            batch = []
+    
+    if batch:
+        DocumentChunk.objects.bulk_update(batch, ['bm25_tokens'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0044_documentchunk_embedding_hnsw_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='documentchunk',
+            name='bm25_tokens',
+            field=models.JSONField(blank=True, default=dict, help_text='Token frequencies for BM25: {token: frequency}'),
+        ),
+        migrations.RunPython(backfill_bm25_tokens, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='documentchunk',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['bm25_tokens'], name='bm25_tokens_gin_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0 on 2026-10-17 01:13
+
+import django.db.models.deletion
+import pgvector.django.vector
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0045_documentchunk_bm25_tokens_gin_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DisclosureQueryEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(max_length=50)),
+                ('model_id', models.CharField(max_length=200)),
+                ('content_hash', models.CharField(help_text='sha256 of the query text', max_length=64)),
+                ('query_text', models.TextField()),
+                ('embedding', pgvector.django.vector.VectorField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('disclosure', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='query_embeddings', to='accounts.esrsdisclosure')),
+            ],
+            options={
+                'db_table': 'disclosure_query_embeddings',
+                'indexes': [models.Index(fields=['disclosure', 'provider', 'model_id'], name='disclosure__disclos_ec825f_idx')],
+                'unique_together': {('provider', 'model_id', 'content_hash')},
+            },
+        ),
+    ]
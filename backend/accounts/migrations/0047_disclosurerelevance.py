@@ -0,0 +1,31 @@
+# Generated by Django 5.0 on 2026-10-17 01:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0046_disclosurequeryembedding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DisclosureRelevance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('embedding_model', models.CharField(help_text='provider/model the scores were computed with', max_length=250)),
+                ('chunk_scores', models.JSONField(blank=True, default=list, help_text='[[chunk_id, document_id, cosine similarity], ...] best first')),
+                ('document_ids', models.JSONField(blank=True, default=list, help_text='Documents included in the scores')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('disclosure', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relevance', to='accounts.esrsdisclosure')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='disclosure_relevance', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'disclosure_relevance',
+                'unique_together': {('user', 'disclosure')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0 on 2026-10-17 11:20
+
+import pgvector.django.indexes
+import pgvector.django.vector
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0047_disclosurerelevance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentchunk',
+            name='local_embedding',
+            field=pgvector.django.vector.VectorField(blank=True, dimensions=384, null=True),
+        ),
+        AddIndexConcurrently(
+            model_name='documentchunk',
+            index=pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['local_embedding'], m=16, name='chunk_local_embedding_hnsw_idx', opclasses=['vector_cosine_ops']),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.0 on 2026-10-17 01:22
+
+import pgvector.django.vector
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0048_documentchunk_local_embedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aitaskstatus',
+            name='metadata',
+            field=models.JSONField(blank=True, default=dict, help_text='Stage details and statistics (e.g. ingest cache hit rates)'),
+        ),
+        migrations.CreateModel(
+            name='ChunkContextCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document_hash', models.CharField(max_length=64)),
+                ('chunk_hash', models.CharField(max_length=64)),
+                ('context', models.TextField()),
+                ('generator', models.CharField(blank=True, help_text='Model that generated the context', max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'chunk_context_cache',
+                'unique_together': {('document_hash', 'chunk_hash')},
+            },
+        ),
+        migrations.CreateModel(
+            name='EmbeddingCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(max_length=50)),
+                ('model_id', models.CharField(max_length=200)),
+                ('content_hash', models.CharField(help_text='sha256 of the embedded text', max_length=64)),
+                ('embedding', pgvector.django.vector.VectorField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'embedding_cache',
+                'unique_together': {('provider', 'model_id', 'content_hash')},
+            },
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.0 on 2026-10-17 12:25
+
+import django.db.models.deletion
+import pgvector.django.vector
+from django.db import migrations, models
+
+
+# Existing vectors in DocumentChunk.embedding were produced by this model
+LEGACY_PROVIDER = 'openai'
+LEGACY_MODEL = 'text-embedding-3-large'
+
+
+class Migration(migrations.Migration):
+
+    # The per-model ANN index is built concurrently
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0049_ingest_caches_aitaskstatus_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='embeddingmodel',
+            name='is_serving',
+            field=models.BooleanField(default=False, help_text="Retrieval reads this model's vectors; moves to the default model once it is fully backfilled"),
+        ),
+        migrations.CreateModel(
+            name='ChunkEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(max_length=50)),
+                ('model_id', models.CharField(max_length=200)),
+                ('embedding', pgvector.django.vector.VectorField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('chunk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='model_embeddings', to='accounts.documentchunk')),
+            ],
+            options={
+                'db_table': 'chunk_embeddings',
+                'indexes': [models.Index(fields=['provider', 'model_id', 'chunk'], name='chunk_emb_model_chunk_idx')],
+                'unique_together': {('chunk', 'provider', 'model_id')},
+            },
+        ),
+        migrations.RunSQL(
+            sql=[(
+                "INSERT INTO chunk_embeddings (chunk_id, provider, model_id, embedding, created_at) "
+                "SELECT id, %s, %s, embedding, NOW() FROM document_chunks WHERE embedding IS NOT NULL "
+                "ON CONFLICT DO NOTHING",
+                [LEGACY_PROVIDER, LEGACY_MODEL]
+            )],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            sql=[(
+                "UPDATE embedding_models SET is_serving = (provider = %s AND model_id = %s)",
+                [LEGACY_PROVIDER, LEGACY_MODEL]
+            )],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        # Same definition as accounts.embedding_store.ensure_model_index
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS chunk_emb_openai_text_embedding_3_large_hnsw "
+                "ON chunk_embeddings USING hnsw ((embedding::halfvec(3072)) halfvec_cosine_ops) "
+                "WITH (m = 16, ef_construction = 64) "
+                "WHERE provider = 'openai' AND model_id = 'text-embedding-3-large'"
+            ),
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS chunk_emb_openai_text_embedding_3_large_hnsw",
+        ),
+    ]
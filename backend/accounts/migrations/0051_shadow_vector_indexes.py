@@ -0,0 +1,41 @@
+# Generated by Django 5.0 on 2026-10-17 13:40
+
+from django.contrib.postgres.operations import RemoveIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0050_chunkembedding_embeddingmodel_is_serving'),
+    ]
+
+    operations = [
+        # Retrieval reads chunk_embeddings since 0050
+        RemoveIndexConcurrently(
+            model_name='documentchunk',
+            name='chunk_embedding_hnsw_idx',
+        ),
+        # Same definition as accounts.embedding_store.ensure_model_index (Matryoshka shadow)
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS chunk_emb_openai_text_embedding_3_large_m256_hnsw "
+                "ON chunk_embeddings USING hnsw ((subvector(embedding, 1, 256)::halfvec(256)) halfvec_cosine_ops) "
+                "WITH (m = 16, ef_construction = 64) "
+                "WHERE provider = 'openai' AND model_id = 'text-embedding-3-large'"
+            ),
+            reverse_sql="DROP INDEX CONCURRENTLY IF EXISTS chunk_emb_openai_text_embedding_3_large_m256_hnsw",
+        ),
+        # Full-vector index is superseded by the shadow index + exact rescoring
+        migrations.RunSQL(
+            sql="DROP INDEX CONCURRENTLY IF EXISTS chunk_emb_openai_text_embedding_3_large_hnsw",
+            reverse_sql=(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS chunk_emb_openai_text_embedding_3_large_hnsw "
+                "ON chunk_embeddings USING hnsw ((embedding::halfvec(3072)) halfvec_cosine_ops) "
+                "WITH (m = 16, ef_construction = 64) "
+                "WHERE provider = 'openai' AND model_id = 'text-embedding-3-large'"
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0 on 2026-10-17 14:05
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0051_shadow_vector_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('upload_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('file_name', models.CharField(max_length=255)),
+                ('file_size', models.BigIntegerField(help_text='Declared total size in bytes')),
+                ('file_type', models.CharField(blank=True, max_length=100)),
+                ('sha256', models.CharField(help_text='Expected SHA-256 of the whole file (hex)', max_length=64)),
+                ('received_bytes', models.BigIntegerField(default=0, help_text='Bytes appended so far - next part starts here')),
+                ('is_global', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('uploading', 'Uploading'), ('completed', 'Completed'), ('aborted', 'Aborted')], default='uploading', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('document', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='uploads', to='accounts.document')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'document_uploads',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-17 14:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0052_documentupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentchunk',
+            name='metadata',
+            field=models.JSONField(blank=True, default=dict, help_text='Structure of the chunk, e.g. {"type": "table", "sheet", "row_start", "row_end"}'),
+        ),
+    ]
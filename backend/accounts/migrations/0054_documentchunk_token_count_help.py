@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-17 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0053_documentchunk_metadata'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='documentchunk',
+            name='token_count',
+            field=models.IntegerField(default=0, help_text='Token count (cl100k_base)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-17 02:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0054_documentchunk_token_count_help'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentchunk',
+            name='staging_run',
+            field=models.CharField(blank=True, default='', help_text='Ingest run still writing this chunk (empty once the chunk is live)', max_length=32),
+        ),
+    ]
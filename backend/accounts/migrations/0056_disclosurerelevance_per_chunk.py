@@ -0,0 +1,40 @@
+# Generated by Django 5.0 on 2026-10-17 02:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    One row per (disclosure, chunk) instead of one JSON list per (user, disclosure)
+    The old rows are a derived cache - they are dropped and rebuilt as documents are reprocessed
+    """
+
+    dependencies = [
+        ('accounts', '0055_documentchunk_staging_run'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='DisclosureRelevance',
+        ),
+        migrations.CreateModel(
+            name='DisclosureRelevance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(help_text='Cosine similarity of the chunk to the disclosure query')),
+                ('embedding_model', models.CharField(help_text='provider/model the score was computed with', max_length=250)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('chunk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='disclosure_relevance', to='accounts.documentchunk')),
+                ('disclosure', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relevance', to='accounts.esrsdisclosure')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='disclosure_relevance', to='accounts.document')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='disclosure_relevance', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'disclosure_relevance',
+                'indexes': [models.Index(fields=['user', 'disclosure', '-score'], name='disclosure_rel_score_idx')],
+                'unique_together': {('disclosure', 'chunk')},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0 on 2026-10-17 14:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Local model vectors live in chunk_embeddings since 0050; this column was only written
+    in between and does not record which 384-d local model produced it, so it is dropped
+    rather than copied - backfill_embeddings re-embeds chunks for the local model in use
+    """
+
+    dependencies = [
+        ('accounts', '0056_disclosurerelevance_per_chunk'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='documentchunk',
+            name='chunk_local_embedding_hnsw_idx',
+        ),
+        migrations.RemoveField(
+            model_name='documentchunk',
+            name='local_embedding',
+        ),
+    ]
@@ -1,12 +1,18 @@
+import uuid
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 # Import vector models
 from .vector_models import (
     DocumentChunk, 
+    ChunkEmbedding,
     SearchQuery, 
     EmbeddingModel, 
-    RerankerModel
+    RerankerModel,
+    DisclosureQueryEmbedding,
+    DisclosureRelevance,
+    EmbeddingCache,
+    ChunkContextCache
 )
 
 # Import version models
@@ -172,6 +178,35 @@ class Document(models.Model):
         ordering = ['-uploaded_at']
 
 
+class DocumentUpload(models.Model):
+    """Resumable multipart upload - parts are appended to a partial file until complete"""
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('completed', 'Completed'),
+        ('aborted', 'Aborted'),
+    ]
+    
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='document_uploads')
+    file_name = models.CharField(max_length=255)
+    file_size = models.BigIntegerField(help_text='Declared total size in bytes')
+    file_type = models.CharField(max_length=100, blank=True)
+    sha256 = models.CharField(max_length=64, help_text='Expected SHA-256 of the whole file (hex)')
+    received_bytes = models.BigIntegerField(default=0, help_text='Bytes appended so far - next part starts here')
+    is_global = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    document = models.ForeignKey(Document, on_delete=models.SET_NULL, null=True, blank=True, related_name='uploads')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.user.email} - {self.file_name} ({self.received_bytes}/{self.file_size})"
+    
+    class Meta:
+        db_table = 'document_uploads'
+        ordering = ['-created_at']
+
+
 class ESRSCategory(models.Model):
     """Generic Standard Category - supports ESRS, ISO, GDPR, and EU Regulations"""
     STANDARD_TYPE_CHOICES = [
@@ -364,6 +399,7 @@ class AITaskStatus(models.Model):
     chunks_used = models.IntegerField(default=0, help_text='Number of chunks/sections analyzed')
     confidence_score = models.FloatField(default=0.0, help_text='AI confidence score 0-100')
     reasoning_summary = models.TextField(blank=True, null=True, help_text='AI reasoning summary from OpenAI o1 models (gpt-5, gpt-5-mini, gpt-5-nano). Shows thinking process before generating answer.')
+    metadata = models.JSONField(default=dict, blank=True, help_text='Stage details and statistics (e.g. ingest cache hit rates)')
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -10,12 +10,19 @@ Key improvements:
 5. Multi-query expansion - better coverage
 """
 
+import hashlib
+import json
 import logging
+import os
 import re
-from typing import List, Dict, Tuple, Optional
+import shutil
+import time
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from dataclasses import dataclass
 import numpy as np
-from .embedding_service import get_embedding_service, get_reranker_service
+from .embedding_service import EmbeddingService
+from .tokenization import count_tokens, spans_to_token_indices, token_offsets
 
 logger = logging.getLogger(__name__)
 
@@ -115,6 +122,76 @@ class SemanticChunker:
         
         return chunks
     
+    @staticmethod
+    def chunk_by_tokens(
+        text: str,
+        max_tokens: int = 256,
+        overlap_tokens: int = 50
+    ) -> List[Tuple[str, int]]:
+        """
+        Split text into chunks of at most max_tokens from a single tokenization pass
+        
+        Cuts at the last paragraph break in the window, else the last sentence end,
+        else at the token limit. Consecutive chunks share up to overlap_tokens tokens,
+        starting at a sentence boundary when the overlap window has one.
+        Linear in the text length.
+        
+        Args:
+            text: Full document text
+            max_tokens: Maximum tokens per chunk
+            overlap_tokens: Token overlap between chunks (at most max_tokens // 4)
+        
+        Returns:
+            [(chunk text, token count)]
+        """
+        chunks = []
+        for start, end, tokens in SemanticChunker.token_spans(text, max_tokens, overlap_tokens):
+            chunk = text[start:end].strip()
+            if chunk:
+                chunks.append((chunk, tokens))
+        return chunks
+    
+    @staticmethod
+    def token_spans(
+        text: str,
+        max_tokens: int = 256,
+        overlap_tokens: int = 50
+    ) -> List[Tuple[int, int, int]]:
+        """(start char, end char, token count) of every chunk_by_tokens chunk, before stripping"""
+        offsets = token_offsets(text)
+        total = len(offsets)
+        if not total:
+            return []
+        
+        overlap_tokens = min(overlap_tokens, max_tokens // 4)
+        min_tokens = max_tokens // 2
+        # Token index where the text after each boundary starts
+        paragraph_breaks = spans_to_token_indices(offsets, [m.start() for m in re.finditer(r'\n\s*\n', text)])
+        sentence_breaks = spans_to_token_indices(offsets, [m.start() + 1 for m in re.finditer(r'[.!?]\s', text)])
+        
+        spans = []
+        start = 0
+        while start < total:
+            end = min(start + max_tokens, total)
+            if end < total:
+                for breaks in (paragraph_breaks, sentence_breaks):
+                    i = bisect_right(breaks, end) - 1
+                    if i >= 0 and breaks[i] > start + min_tokens:
+                        end = breaks[i]
+                        break
+            
+            spans.append((offsets[start], offsets[end] if end < total else len(text), end - start))
+            if end >= total:
+                break
+            
+            next_start = max(end - overlap_tokens, start + 1)
+            i = bisect_left(sentence_breaks, next_start)
+            if i < len(sentence_breaks) and sentence_breaks[i] < end:
+                next_start = sentence_breaks[i]
+            start = next_start
+        
+        return spans
+    
     @staticmethod
     def chunk_by_sections(text: str) -> List[Tuple[str, str]]:
         """
@@ -147,6 +224,215 @@ class SemanticChunker:
         return sections
 
 
+class _RowGroups:
+    """Push-style whole-row grouping of one table (see TableChunker.chunk_table)"""
+    
+    def __init__(self, table: Dict, max_tokens: int):
+        label = 'Table' if table['kind'] == 'table' else 'Sheet'
+        self.table = table
+        self.prefix = f"{label}: {table['name']}" + (f"\n{table['header']}" if table['header'] else '')
+        self.prefix_tokens = count_tokens(self.prefix)
+        self.max_tokens = max_tokens
+        self.rows: List[str] = []
+        self.tokens = self.prefix_tokens
+        self.first_row = 1
+    
+    def add(self, row: str) -> Optional[Tuple[str, Dict, int]]:
+        """Add a row; returns the previous row group when this row does not fit in it"""
+        # +1 for the joining newline
+        row_tokens = count_tokens(row) + 1
+        chunk = None
+        # A row larger than the budget becomes its own chunk rather than being split
+        if self.rows and self.tokens + row_tokens > self.max_tokens:
+            chunk = self._flush()
+        self.rows.append(row)
+        self.tokens += row_tokens
+        return chunk
+    
+    def finish(self) -> List[Tuple[str, Dict, int]]:
+        if self.rows:
+            return [self._flush()]
+        if self.first_row == 1 and self.table['header']:
+            return [(self.prefix, {'type': 'table', 'sheet': self.table['name'], 'row_start': 0, 'row_end': 0}, self.prefix_tokens)]
+        return []
+    
+    def _flush(self) -> Tuple[str, Dict, int]:
+        metadata = {
+            'type': 'table',
+            'sheet': self.table['name'],
+            'row_start': self.first_row,
+            'row_end': self.first_row + len(self.rows) - 1,
+        }
+        chunk = self.prefix + '\n' + '\n'.join(self.rows)
+        self.first_row += len(self.rows)
+        self.rows, self.tokens = [], self.prefix_tokens
+        return chunk, metadata, count_tokens(chunk)
+
+
+class TableChunker:
+    """
+    Chunks tabular text by whole rows
+    Understands the extracted layouts of spreadsheet sheets, CSV data and Word
+    tables ('=== SHEET: name ===', header line, dashes, 'a | b | c' rows). Every
+    chunk starts with the sheet name and the column header line, is sized by
+    tokens and never splits or repeats a row. Text outside tables goes through
+    SemanticChunker.chunk_by_tokens.
+    """
+    
+    TABLE_START = re.compile(r'^=== (SHEET|TABLE): (.+) ===$')
+    TABLE_END = re.compile(r'^=== END OF (SHEET|TABLE): (.+) ===$')
+    CSV_START = '=== CSV Data ==='
+    RULE = re.compile(r'^(=+|-+)$')
+    
+    # chunk_stream chunks buffered prose once it reaches this size, carrying the last chunk over
+    PROSE_BUFFER_CHARS = 256 * 1024
+    
+    @classmethod
+    def _line_events(cls, lines: Iterable[str]) -> Iterator[Tuple[str, Any]]:
+        """
+        ('prose', line) | ('table', {'kind', 'name', 'header'}) | ('row', row) | ('end', None)
+        A table is announced once its header line is known
+        """
+        table = None
+        announced = False
+        
+        for line in lines:
+            stripped = line.strip()
+            start = cls.TABLE_START.match(stripped)
+            
+            if start or stripped == cls.CSV_START:
+                if table is not None:
+                    if not announced:
+                        yield 'table', table
+                    yield 'end', None
+                kind, name = (start.group(1).lower(), start.group(2)) if start else ('csv', 'CSV')
+                table, announced = {'kind': kind, 'name': name, 'header': None}, False
+            elif table is None:
+                if not cls.RULE.match(stripped):
+                    yield 'prose', line
+            elif cls.TABLE_END.match(stripped):
+                if not announced:
+                    yield 'table', table
+                yield 'end', None
+                table = None
+            elif not stripped or cls.RULE.match(stripped):
+                continue
+            elif not announced:
+                table['header'] = stripped
+                announced = True
+                yield 'table', table
+            else:
+                yield 'row', stripped
+        
+        if table is not None:
+            if not announced:
+                yield 'table', table
+            yield 'end', None
+    
+    @classmethod
+    def split_segments(cls, text: str) -> List[Tuple[str, Optional[Dict]]]:
+        """
+        [(prose text, None) | ('', {'kind', 'name', 'header', 'rows'})] in document order
+        """
+        segments = []
+        prose: List[str] = []
+        
+        def flush_prose():
+            if any(line.strip() for line in prose):
+                segments.append(('\n'.join(prose), None))
+            prose.clear()
+        
+        for event, value in cls._line_events(text.split('\n')):
+            if event == 'prose':
+                prose.append(value)
+            elif event == 'table':
+                flush_prose()
+                segments.append(('', dict(value, rows=[])))
+            elif event == 'row':
+                segments[-1][1]['rows'].append(value)
+        
+        flush_prose()
+        return segments
+    
+    @staticmethod
+    def chunk_table(table: Dict, max_tokens: int = 400) -> List[Tuple[str, Dict, int]]:
+        """Whole-row chunks with the sheet name and header line prepended: (text, metadata, tokens)"""
+        groups = _RowGroups(table, max_tokens)
+        chunks = [chunk for chunk in map(groups.add, table['rows']) if chunk]
+        return chunks + groups.finish()
+    
+    @classmethod
+    def chunk_document(
+        cls,
+        text: str,
+        max_tokens: int = 256,
+        overlap_tokens: int = 50,
+        max_table_tokens: int = 400
+    ) -> List[Tuple[str, Dict, int]]:
+        """
+        Chunks of a document with tables in it: (chunk text, metadata, token count)
+        Prose metadata is empty; table chunks carry sheet and row range
+        """
+        return list(cls.chunk_stream([text], max_tokens, overlap_tokens, max_table_tokens))
+    
+    @classmethod
+    def chunk_stream(
+        cls,
+        blocks: Iterable[str],
+        max_tokens: int = 256,
+        overlap_tokens: int = 50,
+        max_table_tokens: int = 400
+    ) -> Iterator[Tuple[str, Dict, int]]:
+        """
+        chunk_document over text arriving in blocks, e.g. document_parser.iter_document_text
+        
+        Chunks are yielded as soon as they are complete - a row group when the
+        next row does not fit, prose every PROSE_BUFFER_CHARS - so only the
+        current block, one row group and the prose buffer are held in memory.
+        """
+        prose: List[str] = []
+        prose_chars = 0
+        
+        def flush_prose(final: bool) -> List[Tuple[str, Dict, int]]:
+            nonlocal prose_chars
+            text = '\n'.join(prose)
+            spans = SemanticChunker.token_spans(text, max_tokens, overlap_tokens)
+            carry = len(text)
+            if not final and len(spans) > 1:
+                # The last chunk may still grow - chunk it again with the text that follows
+                carry = spans.pop()[0]
+            prose[:] = [text[carry:]] if carry < len(text) else []
+            prose_chars = len(text) - carry
+            return [(text[start:end].strip(), {}, tokens) for start, end, tokens in spans if text[start:end].strip()]
+        
+        def lines() -> Iterator[str]:
+            pending = ''
+            for block in blocks:
+                *complete, pending = (pending + block).split('\n')
+                yield from complete
+            yield pending
+        
+        groups = None
+        for event, value in cls._line_events(lines()):
+            if event == 'prose':
+                prose.append(value)
+                prose_chars += len(value) + 1
+                if prose_chars >= cls.PROSE_BUFFER_CHARS:
+                    yield from flush_prose(final=False)
+            elif event == 'table':
+                yield from flush_prose(final=True)
+                groups = _RowGroups(value, max_table_tokens)
+            elif event == 'row':
+                chunk = groups.add(value)
+                if chunk:
+                    yield chunk
+            else:
+                yield from groups.finish()
+                groups = None
+        
+        yield from flush_prose(final=True)
+
+
 class ContextGenerator:
     """
     Generates contextual descriptions for document chunks
@@ -277,201 +563,332 @@ class BM25Retriever:
 
 class HybridRAGEngine:
     """
-    Advanced RAG engine combining:
-    1. BM25 sparse retrieval (exact matches)
-    2. Semantic embeddings (meaning-based)
-    3. Contextual chunking (better retrieval)
-    4. Reranking (quality filtering)
+    Per-user corpus index backed by a memory-mapped embedding snapshot
+    
+    Snapshot layout ({RAG_SNAPSHOT_ROOT}/user_{id}/{version}/):
+        embeddings.npy    (N, D) float32, L2-normalized rows
+        chunk_ids.npy     (N,) int64 DocumentChunk ids in row order
+        document_ids.npy  (D,) int64 documents in row order
+        offsets.npy       (D+1,) int64 - rows of document i are offsets[i]:offsets[i+1]
+        lengths.npy       (N,) int32 BM25 chunk lengths
+        manifest.json     version, embedding model, dimensions, {document_id: rag_processed_at}
+    {RAG_SNAPSHOT_ROOT}/user_{id}/CURRENT holds the active version name
+    
+    Arrays are opened with np.load(mmap_mode='r') so every Uvicorn and Celery
+    worker on a host shares the same page cache instead of re-reading vectors
+    from Postgres. A snapshot is only used when the manifest matches the
+    documents' rag_processed_at and was built from the serving embedding model -
+    otherwise callers fall back to the database.
     """
     
-    def __init__(
-        self,
-        embedding_model: str = "text-embedding-3-large",
-        reranker_model: str = "cohere",
-        alpha: float = 0.5  # Hybrid search weight (0=pure BM25, 1=pure semantic)
-    ):
-        self.embedding_model = embedding_model
-        self.reranker_model = reranker_model
-        self.alpha = alpha
-        
-        self.chunker = SemanticChunker()
-        self.context_generator = ContextGenerator()
-        self.bm25 = BM25Retriever()
-        
-        self.chunks: List[DocumentChunk] = []
-        self.embeddings = None
+    ARRAYS = ('embeddings', 'chunk_ids', 'document_ids', 'offsets', 'lengths')
+    
+    # Open snapshots per process: {user_id: HybridRAGEngine}
+    _open_snapshots: Dict[int, 'HybridRAGEngine'] = {}
+    
+    def __init__(self, user_id: int, path: str, manifest: Dict):
+        self.user_id = user_id
+        self.path = path
+        self.manifest = manifest
+        self.version = manifest['version']
+        self.documents = manifest['documents']  # {str(document_id): iso timestamp}
+        
+        for name in self.ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r'))
+        
+        self._document_rows = {
+            int(document_id): (int(self.offsets[i]), int(self.offsets[i + 1]))
+            for i, document_id in enumerate(self.document_ids)
+        }
+    
+    # ----- Opening -----
+    
+    @staticmethod
+    def snapshot_root(user_id: int) -> str:
+        from django.conf import settings
+        return os.path.join(str(settings.RAG_SNAPSHOT_ROOT), f'user_{user_id}')
+    
+    @classmethod
+    def open(cls, user_id: int) -> Optional['HybridRAGEngine']:
+        """Open the current snapshot for a user (cached per process), or None if there is none"""
+        root = cls.snapshot_root(user_id)
+        try:
+            with open(os.path.join(root, 'CURRENT'), 'r') as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        
+        cached = cls._open_snapshots.get(user_id)
+        if cached and cached.version == version:
+            return cached
+        
+        try:
+            path = os.path.join(root, version)
+            with open(os.path.join(path, 'manifest.json'), 'r') as f:
+                manifest = json.load(f)
+            snapshot = cls(user_id, path, manifest)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"[Snapshot] Cannot open snapshot {version} for user {user_id}: {e}")
+            return None
+        
+        cls._open_snapshots[user_id] = snapshot
+        return snapshot
+    
+    @classmethod
+    def open_fresh(cls, user_id: int, document_ids: List[int]) -> Optional['HybridRAGEngine']:
+        """Open the snapshot only if it is up to date for the given documents"""
+        snapshot = cls.open(user_id)
+        if snapshot and snapshot.is_fresh(document_ids):
+            return snapshot
+        return None
     
-    def process_document(
+    def is_fresh(self, document_ids: List[int]) -> bool:
+        """Check the manifest against the serving model and the documents' current rag_processed_at"""
+        from accounts.embedding_store import LEGACY_MODEL, model_label, serving_model
+        from accounts.models import Document
+        
+        serving = model_label(*serving_model())
+        if self.manifest.get('embedding_model', model_label(*LEGACY_MODEL)) != serving:
+            logger.info(f"[Snapshot] User {self.user_id} snapshot {self.version} predates the switch to {serving}")
+            return False
+        
+        processed = Document.objects.filter(id__in=document_ids).values_list('id', 'rag_processed_at')
+        for document_id, processed_at in processed:
+            snapshot_at = self.documents.get(str(document_id))
+            current_at = processed_at.isoformat() if processed_at else None
+            if snapshot_at != current_at:
+                logger.info(f"[Snapshot] User {self.user_id} snapshot {self.version} is stale for document {document_id}")
+                return False
+        return True
+    
+    # ----- Retrieval -----
+    
+    def _row_ranges(self, document_ids: List[int]) -> List[Tuple[int, int]]:
+        return [self._document_rows[doc_id] for doc_id in document_ids if doc_id in self._document_rows]
+    
+    def chunk_ids_for(self, document_ids: List[int]) -> np.ndarray:
+        ranges = self._row_ranges(document_ids)
+        if not ranges:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.chunk_ids[start:end] for start, end in ranges])
+    
+    def semantic_scores(
         self,
-        document_id: int,
-        document_name: str,
-        content: str,
-        metadata: Dict = None
-    ) -> List[DocumentChunk]:
+        query_embeddings: List[Optional[List[float]]],
+        document_ids: List[int]
+    ) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Process a document into contextualized chunks
+        Cosine similarity of every chunk in the given documents against all queries
         
-        Returns list of DocumentChunk objects ready for indexing
-        """
-        # Semantic chunking
-        raw_chunks = self.chunker.chunk_by_paragraphs(content, max_chunk_size=1000)
-        
-        processed_chunks = []
-        total_chunks = len(raw_chunks)
-        
-        for idx, chunk_text in enumerate(raw_chunks):
-            # Determine position
-            if idx == 0:
-                position = 'beginning'
-            elif idx == total_chunks - 1:
-                position = 'end'
-            else:
-                position = 'middle'
-            
-            # Generate contextual description
-            context = self.context_generator.generate_chunk_context(
-                chunk_text=chunk_text,
-                document_name=document_name,
-                chunk_position=position
-            )
-            
-            # Create chunk object
-            chunk = DocumentChunk(
-                chunk_id=f"{document_id}_chunk_{idx}",
-                content=chunk_text,
-                context=context,
-                document_id=document_id,
-                document_name=document_name,
-                chunk_index=idx,
-                total_chunks=total_chunks,
-                metadata=metadata or {}
-            )
-            
-            processed_chunks.append(chunk)
+        Each document's rows are multiplied straight from the memory map, so
+        nothing is copied besides the (Q, N) score matrix.
         
-        return processed_chunks
-    
-    def index_chunks(self, chunks: List[DocumentChunk]):
-        """
-        Build search indices for chunks
-        - BM25 index for sparse retrieval
-        - Embeddings for semantic retrieval
+        Returns:
+            (chunk_ids (N,), scores (Q, N))
         """
-        self.chunks = chunks
+        from accounts.hybrid_scoring import query_matrix
         
-        # Build BM25 index with contextualized content
-        corpus = [chunk.contextualized_content for chunk in chunks]
-        self.bm25.fit(corpus)
+        queries = EmbeddingService.normalize_rows(
+            query_matrix(query_embeddings, self.embeddings.shape[1])
+        )
+        ranges = self._row_ranges(document_ids)
+        if not ranges:
+            return np.empty(0, dtype=np.int64), np.zeros((len(query_embeddings), 0), dtype=np.float32)
         
-        logger.info(f"Indexed {len(chunks)} chunks with hybrid search")
+        scores = np.concatenate([queries @ self.embeddings[start:end].T for start, end in ranges], axis=1)
+        return self.chunk_ids_for(document_ids), scores
     
-    def search(
+    def score(
         self,
-        query: str,
-        top_k: int = 20,
-        initial_k: int = 150,
-        use_reranking: bool = True
-    ) -> List[SearchResult]:
+        query_embeddings: List[Optional[List[float]]],
+        document_ids: List[int],
+        bm25_scores: Optional[List[Dict[int, float]]] = None
+    ):
         """
-        Hybrid search with reranking
-        
-        Args:
-            query: Search query
-            top_k: Final number of results to return
-            initial_k: Number of candidates before reranking
-            use_reranking: Whether to use reranker
+        Hybrid scores for every chunk in the given documents, averaged over query variations
         
         Returns:
-            List of SearchResult objects sorted by relevance
+            (chunk_ids (N,), FusedScores aligned with chunk_ids)
         """
-        if not self.chunks:
-            logger.warning("No chunks indexed yet")
-            return []
+        from accounts.hybrid_scoring import bm25_score_matrix, fuse_scores
         
-        # Step 1: BM25 retrieval
-        bm25_scores = self.bm25.get_scores(query)
-        
-        # Step 2: Semantic retrieval (placeholder - would use actual embeddings)
-        # For now, use simple text similarity as placeholder
-        embedding_scores = self._placeholder_semantic_scores(query)
-        
-        # Step 3: Hybrid scoring
-        results = []
-        for idx, chunk in enumerate(self.chunks):
-            # Normalize scores to 0-1 range
-            bm25_norm = bm25_scores[idx] / (max(bm25_scores) + 1e-8)
-            embed_norm = embedding_scores[idx]
-            
-            # Hybrid score with alpha weighting
-            hybrid_score = (1 - self.alpha) * bm25_norm + self.alpha * embed_norm
-            
-            results.append(SearchResult(
-                chunk=chunk,
-                bm25_score=bm25_scores[idx],
-                embedding_score=embedding_scores[idx],
-                rerank_score=0,
-                final_score=hybrid_score,
-                rank=0
-            ))
-        
-        # Step 4: Sort by hybrid score and take top initial_k
-        results.sort(key=lambda x: x.final_score, reverse=True)
-        candidates = results[:initial_k]
-        
-        # Step 5: Reranking (if enabled)
-        if use_reranking and len(candidates) > top_k:
-            candidates = self._rerank(query, candidates, top_k)
-        else:
-            candidates = candidates[:top_k]
-        
-        # Update ranks
-        for idx, result in enumerate(candidates):
-            result.rank = idx + 1
-        
-        return candidates
-    
-    def _placeholder_semantic_scores(self, query: str) -> List[float]:
+        chunk_ids, semantic = self.semantic_scores(query_embeddings, document_ids)
+        bm25_norm = bm25_score_matrix(bm25_scores, chunk_ids) if bm25_scores is not None else None
+        return chunk_ids, fuse_scores(semantic, bm25_norm)
+    
+    def bm25_stats(self, document_ids: List[int]) -> Tuple[int, float]:
+        """(chunk count, average chunk length) for BM25 over the given documents"""
+        ranges = self._row_ranges(document_ids)
+        total = sum(end - start for start, end in ranges)
+        if not total:
+            return 0, 0.0
+        length_sum = sum(int(self.lengths[start:end].sum()) for start, end in ranges)
+        return total, length_sum / total
+    
+    # ----- Building -----
+    
+    @classmethod
+    def refresh(cls, user_id: int) -> 'HybridRAGEngine':
         """
-        Placeholder for semantic scoring
-        In production, this would use actual embeddings and cosine similarity
+        Rebuild the user's snapshot after ingest
+        Rows of documents that did not change are copied from the current snapshot;
+        only new or reprocessed documents are read from Postgres.
         """
-        query_words = set(query.lower().split())
-        scores = []
-        
-        for chunk in self.chunks:
-            chunk_words = set(chunk.contextualized_content.lower().split())
-            # Jaccard similarity as placeholder
-            intersection = len(query_words & chunk_words)
-            union = len(query_words | chunk_words)
-            score = intersection / union if union > 0 else 0
-            scores.append(score)
+        from django.core.cache import cache
         
-        return scores
+        with cache.lock(f'rag_snapshot_lock:{user_id}', timeout=600, blocking_timeout=600):
+            return cls._build(user_id, previous=cls.open(user_id))
     
-    def _rerank(
-        self,
-        query: str,
-        candidates: List[SearchResult],
-        top_k: int
-    ) -> List[SearchResult]:
-        """
-        Rerank candidates using reranker model
-        In production, this would call Cohere Rerank API or bge-reranker
-        """
-        # Placeholder: use existing scores with small adjustment
-        # In production, replace with actual reranker API call
-        
-        for result in candidates:
-            # Boost scores based on chunk position and metadata
-            position_boost = 1.0
-            if result.chunk.chunk_index == 0:
-                position_boost = 1.1  # Beginning chunks often important
-            
-            result.rerank_score = result.final_score * position_boost
-            result.final_score = result.rerank_score
+    @staticmethod
+    def _chunk_counts(document_ids: List[int]) -> Dict[int, int]:
+        from django.db.models import Count
+        from accounts.vector_models import DocumentChunk
+        
+        return dict(
+            DocumentChunk.objects.filter(document_id__in=document_ids).order_by()
+            .values('document_id').annotate(total=Count('id')).values_list('document_id', 'total')
+        )
+    
+    @classmethod
+    def _build(cls, user_id: int, previous: Optional['HybridRAGEngine'] = None) -> 'HybridRAGEngine':
+        from accounts.embedding_store import (
+            LEGACY_MODEL, embeddings_for, model_dimensions, model_label, serving_model
+        )
+        from accounts.models import Document
+        from accounts.vector_models import DocumentChunk
+        
+        provider, model = serving_model()
+        embedding_model = model_label(provider, model)
+        dimensions = model_dimensions(provider, model)
+        
+        documents = list(Document.objects.filter(
+            user_id=user_id,
+            rag_processing_status='completed'
+        ).order_by('id').values_list('id', 'rag_processed_at'))
+        
+        chunk_counts = cls._chunk_counts([doc_id for doc_id, _ in documents])
+        
+        manifest_documents = {
+            str(doc_id): processed_at.isoformat() if processed_at else None
+            for doc_id, processed_at in documents
+        }
+        # Random suffix: two builds in the same second may see the same manifest
+        version = time.strftime('%Y%m%d%H%M%S') + '-' + hashlib.sha1(
+            json.dumps(manifest_documents, sort_keys=True).encode()
+        ).hexdigest()[:12] + '-' + os.urandom(3).hex()
+        
+        root = cls.snapshot_root(user_id)
+        tmp_path = os.path.join(root, f'.{version}.{os.getpid()}.tmp')
+        os.makedirs(tmp_path, exist_ok=True)
+        
+        # Documents whose rows can be copied from the previous snapshot (same embedding model only)
+        if previous and previous.manifest.get('embedding_model', model_label(*LEGACY_MODEL)) != embedding_model:
+            previous = None
+        reusable = {
+            doc_id: previous._document_rows[doc_id]
+            for doc_id, _ in documents
+            if previous and doc_id in previous._document_rows
+            and previous.documents.get(str(doc_id)) == manifest_documents[str(doc_id)]
+        }
         
-        candidates.sort(key=lambda x: x.final_score, reverse=True)
-        return candidates[:top_k]
+        total = sum(
+            reusable[doc_id][1] - reusable[doc_id][0] if doc_id in reusable else chunk_counts.get(doc_id, 0)
+            for doc_id, _ in documents
+        )
+        embeddings = np.lib.format.open_memmap(
+            os.path.join(tmp_path, 'embeddings.npy'), mode='w+',
+            dtype=np.float32, shape=(total, dimensions)
+        )
+        chunk_ids = np.zeros(total, dtype=np.int64)
+        lengths = np.zeros(total, dtype=np.int32)
+        offsets = [0]
+        reused = 0
+        incomplete = []
+        
+        row = 0
+        for doc_id, _ in documents:
+            if doc_id in reusable:
+                start, end = reusable[doc_id]
+                count = end - start
+                embeddings[row:row + count] = previous.embeddings[start:end]
+                chunk_ids[row:row + count] = previous.chunk_ids[start:end]
+                lengths[row:row + count] = previous.lengths[start:end]
+                reused += 1
+            else:
+                vectors = dict(
+                    embeddings_for(provider, model).filter(chunk__document_id=doc_id).values_list('chunk_id', 'embedding')
+                )
+                rows = DocumentChunk.objects.filter(document_id=doc_id).order_by('chunk_index').values_list(
+                    'id', 'word_count'
+                )
+                expected = chunk_counts.get(doc_id, 0)
+                count = 0
+                for chunk_id, word_count in rows.iterator(chunk_size=500):
+                    if count == expected:
+                        count += 1  # More chunks than counted - marks the document incomplete
+                        break
+                    embedding = vectors.get(chunk_id)
+                    if embedding is not None:
+                        embeddings[row + count] = EmbeddingService.normalize_rows(embedding)[0]
+                    chunk_ids[row + count] = chunk_id
+                    lengths[row + count] = word_count
+                    count += 1
+                
+                if count != expected:
+                    # Chunks changed while the document was read (reprocessed mid-build): keep what
+                    # was read but leave it out of the manifest, so it is neither served nor reused
+                    count = min(count, expected)
+                    incomplete.append(doc_id)
+                    manifest_documents.pop(str(doc_id))
+            
+            row += count
+            offsets.append(row)
+        
+        embeddings.flush()
+        del embeddings
+        
+        np.save(os.path.join(tmp_path, 'chunk_ids.npy'), chunk_ids[:row])
+        np.save(os.path.join(tmp_path, 'lengths.npy'), lengths[:row])
+        np.save(os.path.join(tmp_path, 'document_ids.npy'), np.array([doc_id for doc_id, _ in documents], dtype=np.int64))
+        np.save(os.path.join(tmp_path, 'offsets.npy'), np.array(offsets, dtype=np.int64))
+        if row != total:
+            # Fewer rows than counted (chunks deleted mid-build) - trim the matrix
+            trimmed = np.load(os.path.join(tmp_path, 'embeddings.npy'), mmap_mode='r')[:row]
+            np.save(os.path.join(tmp_path, 'embeddings_trimmed.npy'), trimmed)
+            del trimmed
+            os.replace(os.path.join(tmp_path, 'embeddings_trimmed.npy'), os.path.join(tmp_path, 'embeddings.npy'))
+        
+        with open(os.path.join(tmp_path, 'manifest.json'), 'w') as f:
+            json.dump({
+                'version': version,
+                'user_id': user_id,
+                'embedding_model': embedding_model,
+                'dimensions': dimensions,
+                'total_chunks': row,
+                'documents': manifest_documents,
+            }, f)
+        
+        # Publish atomically: rename the directory, then swap the CURRENT pointer
+        path = os.path.join(root, version)
+        os.replace(tmp_path, path)
+        current_tmp = os.path.join(root, f'.CURRENT.{os.getpid()}.tmp')
+        with open(current_tmp, 'w') as f:
+            f.write(version)
+        os.replace(current_tmp, os.path.join(root, 'CURRENT'))
+        
+        # Old versions can go - processes that still map them keep the inodes alive
+        for entry in os.listdir(root):
+            if entry not in (version, 'CURRENT') and not entry.startswith('.'):
+                shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+        
+        logger.info(
+            f"[Snapshot] User {user_id}: built {version} with {row} chunks from {len(documents)} documents "
+            f"({reused} reused from previous snapshot)"
+        )
+        if incomplete:
+            logger.warning(f"[Snapshot] User {user_id}: documents {incomplete} changed during the build - left out of {version}")
+        
+        return cls.open(user_id)
 
 
 # Utility functions
@@ -492,8 +909,8 @@ def generate_query_variations(query: str, num_variations: int = 3) -> List[str]:
 
 
 def estimate_token_count(text: str) -> int:
-    """Rough estimate of token count (1 token ≈ 4 characters)"""
-    return len(text) // 4
+    """Token count (cl100k_base; approximate when tiktoken is not installed)"""
+    return count_tokens(text)
 
 
 def should_use_prompt_caching(total_tokens: int) -> bool:
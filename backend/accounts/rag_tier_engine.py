@@ -5,11 +5,23 @@ Used by both conversation_api.py and tasks.py
 
 import logging
 import json
+import numpy as np
 from typing import List, Tuple, Dict, Any, Optional
-from accounts.models import DocumentChunk, User
+from django.conf import settings
+from django.db.models import Count, Q
+from accounts.models import DocumentChunk, ESRSDisclosure, User
+from accounts.vector_models import LEGACY_VECTOR_FIELDS
 from accounts.embedding_service import EmbeddingService
+from accounts.embedding_store import model_label, serving_embedding_service
+from accounts.vector_search import ANN_CANDIDATES, ann_candidate_ids, cosine_similarities
+from accounts.bm25_index import BM25Index
+from accounts.disclosure_embeddings import lookup_query_embeddings
+from accounts.disclosure_relevance import disclosure_candidates
+from accounts.esrs_classifier import TopicPrefilter, disclosure_topics
+from accounts.reranking import RERANK_CANDIDATES, rerank_chunks, reranker_enabled
+from accounts.hybrid_scoring import fuse_scores, top_k_indices
+from accounts.rag_engine import HybridRAGEngine
 from accounts.llm_router import LLMRouter, LLMModel
-from rank_bm25 import BM25Okapi
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +30,8 @@ def run_tier_rag(
     user: User,
     query_text: str,
     relevant_doc_ids: List[int],
-    temperature: float = 0.2
+    temperature: float = 0.2,
+    disclosure_id: Optional[int] = None
 ) -> Tuple[str, List[Dict], float, List[Dict]]:
     """
     Run TIER 1 + TIER 2 RAG pipeline
@@ -28,6 +41,7 @@ def run_tier_rag(
         query_text: User's question or disclosure requirement
         relevant_doc_ids: List of document IDs to search
         temperature: AI temperature setting
+        disclosure_id: Disclosure being answered - enables the ingest-time candidate set
         
     Returns:
         Tuple of (context_string, top_chunks, avg_confidence, processing_steps)
@@ -39,17 +53,60 @@ def run_tier_rag(
     tier1_enabled = user.rag_tier1_enabled
     tier2_threshold = user.rag_tier2_threshold
     
-    # Get all chunks from relevant documents
-    all_chunks = list(DocumentChunk.objects.filter(
-        document_id__in=relevant_doc_ids
-    ).select_related('document').order_by('document_id', 'chunk_index'))
+    # Query vectors must come from the model whose chunk vectors are being served
+    embedding_service = serving_embedding_service()
     
-    logger.info(f"[RAG] Found {len(all_chunks)} total chunks from {len(relevant_doc_ids)} documents")
+    # Disclosure answers: chunks scored at ingest time replace the corpus-wide search
+    candidates = None
+    if disclosure_id is not None:
+        candidates = disclosure_candidates(
+            user.id, disclosure_id, relevant_doc_ids,
+            embedding_model=model_label(embedding_service.provider, embedding_service.model)
+        )
+    
+    # Get chunks from relevant documents (vectors stay in Postgres - see vector_search)
+    def load_chunks(*conditions, **filters) -> List[DocumentChunk]:
+        return list(DocumentChunk.objects.filter(*conditions, **filters).defer(
+            *LEGACY_VECTOR_FIELDS
+        ).select_related('document').order_by('document_id', 'chunk_index'))
+    
+    all_chunks = []
+    if candidates:
+        all_chunks = load_chunks(id__in=list(candidates))
+        if not all_chunks:
+            # Candidate chunks were deleted - search the documents instead
+            candidates = None
+    
+    # Topic-specific disclosures: skip chunks tagged only with unrelated ESRS topics
+    prefilter = None
+    if not candidates and disclosure_id is not None:
+        prefilter = _topic_prefilter(disclosure_id, relevant_doc_ids)
+        if prefilter:
+            all_chunks = load_chunks(prefilter.condition(), document_id__in=relevant_doc_ids)
+    
+    if candidates:
+        logger.info(f"[RAG] Using {len(all_chunks)} precomputed candidate chunks for disclosure {disclosure_id}")
+    elif prefilter:
+        logger.info(
+            f"[RAG] Prefiltered to {len(all_chunks)} chunks tagged {prefilter.categories} or untagged "
+            f"({len(prefilter.full_document_ids)} documents searched in full)"
+        )
+    else:
+        all_chunks = load_chunks(document_id__in=relevant_doc_ids)
+        logger.info(f"[RAG] Found {len(all_chunks)} total chunks from {len(relevant_doc_ids)} documents")
     
     if not all_chunks:
         logger.warning("[RAG] No chunks available")
         return "", [], 0.0, []
     
+    chunk_lookup = {chunk.id: chunk for chunk in all_chunks}
+    
+    # Memory-mapped embedding snapshot (None if missing or stale - then score in Postgres)
+    snapshot = None if candidates else HybridRAGEngine.open_fresh(user.id, relevant_doc_ids)
+    
+    # Candidates kept for the cross-encoder rerank stage
+    retrieve_k = RERANK_CANDIDATES if reranker_enabled() else 10
+    
     # TIER 2: Multi-Query Generation (if threshold met)
     query_variations = [query_text]  # Start with original
     use_tier2 = False  # We'll decide after initial search
@@ -69,69 +126,53 @@ def run_tier_rag(
             "message": "Running TIER 1: Hybrid BM25+Embeddings search..."
         })
         
-        embedding_service = EmbeddingService()
-        all_scored_chunks = []
-        
-        for query in query_variations:
-            # BM25 Keyword Search
-            chunk_texts = [chunk.content for chunk in all_chunks]
-            tokenized_corpus = [text.lower().split() for text in chunk_texts]
-            bm25 = BM25Okapi(tokenized_corpus)
-            tokenized_query = query.lower().split()
-            bm25_scores = bm25.get_scores(tokenized_query)
-            
-            # Normalize
-            max_bm25 = max(bm25_scores) if max(bm25_scores) > 0 else 1
-            bm25_scores_norm = [score / max_bm25 for score in bm25_scores]
-            
-            # Semantic Embedding Search
-            query_embedding = embedding_service.embed_text(query)
-            
-            semantic_scores = []
-            if query_embedding:
-                for chunk in all_chunks:
-                    if chunk.embedding is not None:
-                        similarity = embedding_service.cosine_similarity(query_embedding, chunk.embedding)
-                        semantic_scores.append(similarity)
-                    else:
-                        semantic_scores.append(0.0)
+        if candidates:
+            # Semantic scores were computed at ingest - only BM25 runs now
+            candidate_ids = [chunk_id for chunk_id in candidates if chunk_id in chunk_lookup]
+            semantic = np.array([[candidates[chunk_id] for chunk_id in candidate_ids]], dtype=np.float32)
+            bm25_scores = BM25Index(relevant_doc_ids).get_scores(query_text)
+            max_bm25 = max(bm25_scores.values(), default=0) or 1
+            bm25 = np.array(
+                [[bm25_scores.get(chunk_id, 0.0) / max_bm25 for chunk_id in candidate_ids]], dtype=np.float32
+            )
+            fused = fuse_scores(semantic, bm25)
+            logger.info(f"[RAG] Scored {len(candidate_ids)} precomputed candidates")
+        elif snapshot:
+            # Score every chunk straight from the memory-mapped snapshot
+            query_embeddings = _embed_queries(embedding_service, query_variations)
+            if prefilter:
+                bm25_index = BM25Index(relevant_doc_ids, prefilter=prefilter)
             else:
-                semantic_scores = [0.0] * len(all_chunks)
-            
-            # Hybrid Score: 60% semantic + 40% BM25
-            for i in range(len(all_chunks)):
-                hybrid_score = (0.6 * semantic_scores[i]) + (0.4 * bm25_scores_norm[i])
-                all_scored_chunks.append((all_chunks[i], hybrid_score, semantic_scores[i], bm25_scores_norm[i]))
-        
-        # Deduplicate and average scores
-        chunk_score_map = {}
-        for chunk, hybrid, semantic, bm25 in all_scored_chunks:
-            if chunk.id not in chunk_score_map:
-                chunk_score_map[chunk.id] = {
-                    'chunk': chunk,
-                    'hybrid_scores': [],
-                    'semantic_scores': [],
-                    'bm25_scores': []
-                }
-            chunk_score_map[chunk.id]['hybrid_scores'].append(hybrid)
-            chunk_score_map[chunk.id]['semantic_scores'].append(semantic)
-            chunk_score_map[chunk.id]['bm25_scores'].append(bm25)
-        
-        averaged_chunks = []
-        for chunk_id, data in chunk_score_map.items():
-            avg_hybrid = sum(data['hybrid_scores']) / len(data['hybrid_scores'])
-            avg_semantic = sum(data['semantic_scores']) / len(data['semantic_scores'])
-            avg_bm25 = sum(data['bm25_scores']) / len(data['bm25_scores'])
-            averaged_chunks.append((data['chunk'], avg_hybrid, avg_semantic, avg_bm25))
-        
-        # Sort and take top 10
-        averaged_chunks.sort(key=lambda x: x[1], reverse=True)
-        top_chunks = averaged_chunks[:10]
+                bm25_index = BM25Index(relevant_doc_ids, corpus_stats=snapshot.bm25_stats(relevant_doc_ids))
+            candidate_ids, fused = snapshot.score(
+                query_embeddings, relevant_doc_ids, bm25_index.get_batch_scores(query_variations)
+            )
+            if prefilter:
+                in_scope = np.isin(candidate_ids, list(chunk_lookup))
+                candidate_ids, fused = candidate_ids[in_scope], fused.select(in_scope)
+            logger.info(f"[RAG] Scored {len(candidate_ids)} chunks from snapshot {snapshot.version}")
+        else:
+            # Precomputed disclosure embeddings first, then one embedding request for the rest
+            query_embeddings = _embed_queries(embedding_service, query_variations)
+            candidate_ids, semantic, bm25 = _score_candidates_in_db(
+                query_variations, query_embeddings, relevant_doc_ids, prefilter
+            )
+            fused = fuse_scores(semantic, bm25)
+            logger.info(f"[RAG] Scored {len(candidate_ids)} candidates out of {len(all_chunks)} chunks")
+        
+        # Top hybrid candidates, reranked by the local cross-encoder down to 10
+        top_chunks = [
+            (chunk_lookup[int(candidate_ids[idx])], float(fused.hybrid[idx]), float(fused.semantic[idx]), float(fused.bm25[idx]))
+            for idx in fused.top_k(retrieve_k)
+            if int(candidate_ids[idx]) in chunk_lookup
+        ]
+        top_chunks, rerank_result = rerank_chunks(query_text, top_chunks, top_n=10)
         
         avg_confidence = sum(score[1] for score in top_chunks) / len(top_chunks) if top_chunks else 0
         
         processing_steps[-1]["status"] = "completed"
         processing_steps[-1]["result"] = f"Top 10 chunks, {avg_confidence:.1%} confidence"
+        processing_steps.append(_rerank_step(rerank_result))
         
         logger.info(f"[RAG] TIER 1 complete: Top 10 chunks, avg confidence: {avg_confidence:.2%}")
         
@@ -146,22 +187,39 @@ def run_tier_rag(
             "message": "TIER 1 disabled - using semantic search only..."
         })
         
-        embedding_service = EmbeddingService()
-        query_embedding = embedding_service.embed_text(query_text)
-        
-        chunk_similarities = []
-        if query_embedding:
-            for chunk in all_chunks:
-                if chunk.embedding is not None:
-                    similarity = embedding_service.cosine_similarity(query_embedding, chunk.embedding)
-                    chunk_similarities.append((chunk, similarity, similarity, 0.0))
+        scored_ids, scores = [], np.zeros(0, dtype=np.float32)
+        if candidates:
+            # Similarities computed at ingest time
+            scored_ids = list(candidates)
+            scores = np.array([candidates[chunk_id] for chunk_id in scored_ids], dtype=np.float32)
+        else:
+            query_embedding = _embed_queries(embedding_service, [query_text])[0]
+            if query_embedding and snapshot:
+                scored_ids, scores = snapshot.semantic_scores([query_embedding], relevant_doc_ids)
+                scores = scores[0]
+                if prefilter:
+                    in_scope = np.isin(scored_ids, list(chunk_lookup))
+                    scored_ids, scores = scored_ids[in_scope], scores[in_scope]
+            elif query_embedding:
+                candidate_ids = ann_candidate_ids(query_embedding, relevant_doc_ids, prefilter=prefilter)
+                similarities = cosine_similarities([query_embedding], candidate_ids)
+                scored_ids = list(similarities)
+                scores = np.array([similarities[chunk_id][0] for chunk_id in scored_ids], dtype=np.float32)
+        
+        top_chunks = []
+        if len(scored_ids):
+            for idx in top_k_indices(scores, retrieve_k):
+                if int(scored_ids[idx]) not in chunk_lookup:
+                    continue
+                similarity = float(scores[idx])
+                top_chunks.append((chunk_lookup[int(scored_ids[idx])], similarity, similarity, 0.0))
+        top_chunks, rerank_result = rerank_chunks(query_text, top_chunks, top_n=10)
         
-        chunk_similarities.sort(key=lambda x: x[1], reverse=True)
-        top_chunks = chunk_similarities[:10]
         avg_confidence = sum(score[1] for score in top_chunks) / len(top_chunks) if top_chunks else 0
         
         processing_steps[-1]["status"] = "completed"
         processing_steps[-1]["result"] = f"Top 10 chunks, {avg_confidence:.1%} confidence"
+        processing_steps.append(_rerank_step(rerank_result))
         
         # TIER 2 always enabled - no confidence check
         use_tier2 = True
@@ -175,26 +233,8 @@ def run_tier_rag(
             "message": "Running TIER 2: Document Expansion..."
         })
         
-        chunk_lookup = {chunk.id: chunk for chunk in all_chunks}
-        
-        for chunk, hybrid_score, semantic_score, bm25_score in top_chunks:
-            # Add main chunk
-            expanded_chunks.append((chunk, hybrid_score, semantic_score, bm25_score, 'main'))
-            
-            # Find neighbors
-            neighbors = DocumentChunk.objects.filter(
-                document_id=chunk.document_id,
-                chunk_index__in=[chunk.chunk_index - 1, chunk.chunk_index + 1]
-            )
-            
-            for neighbor in neighbors:
-                expanded_chunks.append((
-                    neighbor,
-                    hybrid_score * 0.7,
-                    semantic_score * 0.7,
-                    bm25_score * 0.7,
-                    'neighbor'
-                ))
+        # Neighbours come from the chunks already loaded above - no per-chunk queries
+        expanded_chunks = expand_with_neighbors(top_chunks, all_chunks)
         
         processing_steps[-1]["status"] = "completed"
         processing_steps[-1]["result"] = f"{len(expanded_chunks)} total chunks"
@@ -249,6 +289,175 @@ def run_tier_rag(
     return document_context, expanded_chunks, avg_confidence, processing_steps
 
 
+def _rerank_step(result: str) -> Dict:
+    """Processing step recording what the rerank stage did (read back by TIER 3)"""
+    return {
+        "step": "reranking",
+        "status": "completed",
+        "message": "Cross-encoder reranking",
+        "result": result
+    }
+
+
+def _topic_prefilter(disclosure_id: int, document_ids: List[int]) -> Optional[TopicPrefilter]:
+    """
+    Topic prefilter for a disclosure, or None when it needs the full corpus
+    Documents with fewer than RAG_PREFILTER_MIN_CHUNKS chunks tagged with the
+    disclosure's categories are searched in full (None if that is every document)
+    """
+    disclosure = ESRSDisclosure.objects.select_related('standard').filter(id=disclosure_id).first()
+    categories = disclosure_topics(disclosure) if disclosure else None
+    if not categories:
+        return None
+    
+    tagged_counts = dict(
+        DocumentChunk.objects.filter(document_id__in=document_ids, esrs_categories__has_any_keys=categories)
+        .order_by().values('document_id').annotate(tagged=Count('id')).values_list('document_id', 'tagged')
+    )
+    full_document_ids = [
+        document_id for document_id in set(document_ids)
+        if tagged_counts.get(document_id, 0) < settings.RAG_PREFILTER_MIN_CHUNKS
+    ]
+    if len(full_document_ids) == len(set(document_ids)):
+        logger.info(f"[RAG] No document has {settings.RAG_PREFILTER_MIN_CHUNKS} chunks tagged {categories} - searching all chunks")
+        return None
+    return TopicPrefilter(categories, full_document_ids)
+
+
+def _embed_queries(embedding_service: EmbeddingService, queries: List[str]) -> List[List[float]]:
+    """
+    Query embeddings in query order
+    Disclosure queries are read from the precomputed table; only the rest are embedded
+    """
+    precomputed = lookup_query_embeddings(embedding_service.provider, embedding_service.model, queries)
+    missing = [query for query in queries if query not in precomputed]
+    if precomputed:
+        logger.info(f"[RAG] {len(queries) - len(missing)}/{len(queries)} query embeddings precomputed")
+    
+    embedded = dict(zip(missing, embedding_service.embed_queries(missing)))
+    return [precomputed.get(query, embedded.get(query)) for query in queries]
+
+
+def expand_with_neighbors(
+    top_chunks: List[Tuple],
+    loaded_chunks: List[DocumentChunk],
+    window: Optional[int] = None,
+    decay: float = 0.7
+) -> List[Tuple]:
+    """
+    TIER 2 document expansion: add the chunks around each top chunk
+    
+    Neighbours are resolved from a (document_id, chunk_index) map over the
+    chunks already loaded for retrieval. Anything not in that list is fetched
+    with one OR query, so expansion costs at most one round trip for any window.
+    
+    Args:
+        top_chunks: (chunk, hybrid, semantic, bm25) tuples, best first
+        loaded_chunks: Chunks already loaded for the searched documents
+        window: Neighbours on each side (default: settings.RAG_TIER2_NEIGHBOR_WINDOW)
+        decay: Score multiplier per step of distance from the main chunk
+    
+    Returns:
+        (chunk, hybrid, semantic, bm25, 'main' | 'neighbor') tuples
+    """
+    if window is None:
+        window = settings.RAG_TIER2_NEIGHBOR_WINDOW
+    
+    position_lookup = {(chunk.document_id, chunk.chunk_index): chunk for chunk in loaded_chunks}
+    main_keys = {(chunk.document_id, chunk.chunk_index) for chunk, *_ in top_chunks}
+    
+    wanted = {
+        (chunk.document_id, chunk.chunk_index + offset)
+        for chunk, *_ in top_chunks
+        for offset in range(-window, window + 1)
+        if offset and chunk.chunk_index + offset >= 0
+    } - main_keys
+    
+    missing = wanted - position_lookup.keys()
+    if missing:
+        condition = Q()
+        for document_id, chunk_index in missing:
+            condition |= Q(document_id=document_id, chunk_index=chunk_index)
+        for chunk in DocumentChunk.objects.filter(condition).defer(
+            *LEGACY_VECTOR_FIELDS
+        ).select_related('document'):
+            position_lookup[(chunk.document_id, chunk.chunk_index)] = chunk
+    
+    # A neighbour shared by several top chunks keeps its best (closest) score
+    best_neighbors = {}
+    for position, (chunk, hybrid_score, semantic_score, bm25_score) in enumerate(top_chunks):
+        for distance in range(1, window + 1):
+            factor = decay ** distance
+            for key in ((chunk.document_id, chunk.chunk_index - distance),
+                        (chunk.document_id, chunk.chunk_index + distance)):
+                if key in main_keys or key not in position_lookup:
+                    continue
+                scores = (hybrid_score * factor, semantic_score * factor, bm25_score * factor)
+                if key not in best_neighbors or scores[0] > best_neighbors[key][1][0]:
+                    best_neighbors[key] = (position, scores)
+    
+    neighbors_by_main = {}
+    for key, (position, scores) in best_neighbors.items():
+        neighbors_by_main.setdefault(position, []).append((position_lookup[key], *scores, 'neighbor'))
+    
+    expanded_chunks = []
+    for position, (chunk, hybrid_score, semantic_score, bm25_score) in enumerate(top_chunks):
+        expanded_chunks.append((chunk, hybrid_score, semantic_score, bm25_score, 'main'))
+        expanded_chunks.extend(sorted(neighbors_by_main.get(position, []), key=lambda n: n[0].chunk_index))
+    
+    return expanded_chunks
+
+
+def _score_candidates_in_db(
+    query_variations: List[str],
+    query_embeddings: List[Optional[List[float]]],
+    relevant_doc_ids: List[int],
+    prefilter: Optional[TopicPrefilter] = None
+) -> Tuple[List[int], np.ndarray, np.ndarray]:
+    """
+    Hybrid scoring without a snapshot: ANN + BM25 candidates, exact similarities in Postgres
+    
+    Returns:
+        (candidate_ids, semantic (Q, M), normalized bm25 (Q, M))
+    """
+    # BM25 Keyword Search (postings lookup on the persistent inverted index)
+    bm25_index = BM25Index(relevant_doc_ids, prefilter=prefilter)
+    
+    bm25_by_query = []
+    candidate_ids = set()
+    for bm25_scores, query_embedding in zip(bm25_index.get_batch_scores(query_variations), query_embeddings):
+        # Normalize
+        max_bm25 = max(bm25_scores.values(), default=0) or 1
+        bm25_norm = {chunk_id: score / max_bm25 for chunk_id, score in bm25_scores.items()}
+        bm25_by_query.append(bm25_norm)
+        
+        # Candidates: ANN neighbours + best keyword matches
+        candidate_ids.update(ann_candidate_ids(query_embedding, relevant_doc_ids, prefilter=prefilter))
+        candidate_ids.update(
+            sorted(bm25_norm, key=bm25_norm.get, reverse=True)[:ANN_CANDIDATES]
+        )
+    
+    # Exact semantic scores for candidates only (computed in Postgres)
+    candidate_ids = list(candidate_ids)
+    embedded_queries = [i for i, emb in enumerate(query_embeddings) if emb]
+    semantic_by_chunk = cosine_similarities(
+        [query_embeddings[i] for i in embedded_queries],
+        candidate_ids
+    )
+    
+    # (Q, M) score matrices over candidates
+    semantic = np.zeros((len(query_variations), len(candidate_ids)), dtype=np.float32)
+    for col, chunk_id in enumerate(candidate_ids):
+        if chunk_id in semantic_by_chunk:
+            semantic[embedded_queries, col] = semantic_by_chunk[chunk_id]
+    bm25 = np.array(
+        [[bm25_norm.get(chunk_id, 0.0) for chunk_id in candidate_ids] for bm25_norm in bm25_by_query],
+        dtype=np.float32
+    ).reshape(len(query_variations), len(candidate_ids))
+    
+    return candidate_ids, semantic, bm25
+
+
 def run_tier3_refinement(
     user: User,
     query_text: str,
@@ -265,8 +474,8 @@ def run_tier3_refinement(
     Uses LLM to:
     1. Critique the initial answer
     2. Reformulate query if needed
-    3. Rerank documents with cross-encoder logic
-    4. Regenerate answer if quality insufficient
+    3. Regenerate answer if quality insufficient
+    (Reranking runs before generation - see rerank_chunks in run_tier_rag)
     
     Args:
         user: User object with RAG and LLM settings
@@ -455,62 +664,16 @@ Return JSON:
         
         logger.info(f"[TIER 3] Query reformulated: {reformulated_query}")
         
-        # Step 3: Reranking with LLM (cross-encoder simulation)
+        # Step 3: Reranking is done by the local cross-encoder in run_tier_rag (no LLM call) -
+        # report its recorded outcome; callers with their own retrieval never rerank
+        rerank_step = next((step for step in processing_steps if step.get("step") == "reranking"), None)
         processing_steps.append({
             "step": "tier3_reranking",
-            "status": "in_progress",
-            "message": "TIER 3: LLM-based reranking..."
+            "status": "completed",
+            "message": "TIER 3: Reranking",
+            "result": rerank_step["result"] if rerank_step else "Not reranked - retrieval ran without the cross-encoder"
         })
         
-        # Take top 5 chunks and rerank them
-        top_5_chunks = expanded_chunks[:5]
-        reranking_prompt = f"""Rerank these document chunks by relevance to the question.
-
-QUESTION: {reformulated_query}
-
-CHUNKS:
-"""
-        for i, (chunk, _, _, _, _) in enumerate(top_5_chunks):
-            reranking_prompt += f"\n[{i+1}] {chunk.content[:300]}...\n"
-        
-        reranking_prompt += """
-Return the chunks in order of relevance (most relevant first) as JSON:
-{
-    "ranking": [3, 1, 5, 2, 4],  // indices in order of relevance
-    "reasoning": "why this order"
-}"""
-
-        reranking_messages = [
-            {"role": "system", "content": "You are a document relevance expert. Rerank by relevance to the question."},
-            {"role": "user", "content": reranking_prompt}
-        ]
-        
-        reranking_response = llm_router.generate(
-            model=model_enum,
-            messages=reranking_messages,
-            temperature=0.1,
-            max_tokens=300
-        )
-        
-        reranking_text = reranking_response['message']['content']
-        
-        try:
-            import re
-            json_match = re.search(r'\{[\s\S]*\}', reranking_text)
-            if json_match:
-                reranking_data = json.loads(json_match.group())
-                new_order = reranking_data.get('ranking', list(range(1, len(top_5_chunks) + 1)))
-                # Reorder chunks
-                reranked_chunks = [top_5_chunks[idx - 1] for idx in new_order if 1 <= idx <= len(top_5_chunks)]
-            else:
-                reranked_chunks = top_5_chunks
-        except (json.JSONDecodeError, Exception) as e:
-            logger.warning(f"[TIER 3] Failed to parse reranking: {e}")
-            reranked_chunks = top_5_chunks
-        
-        processing_steps[-1]["status"] = "completed"
-        processing_steps[-1]["result"] = f"Reranked {len(reranked_chunks)} chunks"
-        
         # Step 4: Always regenerate answer with FULL original context (not just reranked 5)
         # The reranking was just to identify most relevant chunks, but we use ALL chunks for answer
         processing_steps.append({
@@ -0,0 +1,84 @@
+"""
+Provider token budgets shared by all processes
+Every hosted embedding/context request records its tokens in a per-minute
+counter in the Django cache (Redis); bulk jobs wait for headroom before each
+unit of work so interactive traffic keeps the provider's remaining capacity
+"""
+
+import logging
+import time
+from typing import Dict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SECONDS = 60
+
+
+class ProviderRateBudget:
+    """Fixed one-minute token windows for one provider; limit <= 0 means unlimited"""
+
+    def __init__(self, provider: str, tokens_per_minute: int):
+        self.provider = provider
+        self.tokens_per_minute = tokens_per_minute
+
+    def _key(self, window: int) -> str:
+        return f'rate_budget:{self.provider}:{window}'
+
+    @staticmethod
+    def _window() -> int:
+        return int(time.time() // WINDOW_SECONDS)
+
+    def used(self) -> int:
+        from django.core.cache import cache
+
+        try:
+            return cache.get(self._key(self._window()), 0)
+        except Exception as e:
+            logger.warning(f"[RateBudget] {self.provider}: usage lookup failed: {e}")
+            return 0
+
+    def record(self, tokens: int):
+        from django.core.cache import cache
+
+        if tokens <= 0:
+            return
+        key = self._key(self._window())
+        try:
+            cache.add(key, 0, timeout=WINDOW_SECONDS * 2)
+            cache.incr(key, tokens)
+        except Exception as e:
+            logger.warning(f"[RateBudget] {self.provider}: failed to record {tokens} tokens: {e}")
+
+    def wait(self, share: float = 1.0) -> float:
+        """
+        Block until this minute's usage is below share * limit
+
+        Returns:
+            Seconds waited
+        """
+        if self.tokens_per_minute <= 0:
+            return 0.0
+
+        allowed = self.tokens_per_minute * share
+        waited = 0.0
+        while self.used() >= allowed:
+            pause = WINDOW_SECONDS - (time.time() % WINDOW_SECONDS) + 0.5
+            logger.info(f"[RateBudget] {self.provider}: {self.used()}/{int(allowed)} tokens this minute, waiting {pause:.1f}s")
+            time.sleep(pause)
+            waited += pause
+        return waited
+
+
+_budgets: Dict[str, ProviderRateBudget] = {}
+
+
+def provider_budget(provider: str) -> ProviderRateBudget:
+    if provider not in _budgets:
+        if provider == 'anthropic':
+            limit = settings.ANTHROPIC_TOKENS_PER_MINUTE
+        else:
+            limit = settings.EMBEDDING_TOKENS_PER_MINUTE
+        _budgets[provider] = ProviderRateBudget(provider, limit)
+    return _budgets[provider]
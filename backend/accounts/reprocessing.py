@@ -0,0 +1,119 @@
+"""
+Corpus reprocessing job - re-chunk and re-embed every document after a chunker
+or embedding model change
+
+Job state lives in one AITaskStatus row (task_type='corpus_reprocessing'). Its
+metadata holds the checkpoint (last finished document id), the document id
+range the job covers, counters, throughput and ETA. Documents are processed in
+id order in batches; each batch is its own low-priority Celery task that queues
+the next one, so interactive tasks queued meanwhile run first and a crashed
+batch resumes from the checkpoint
+"""
+
+import logging
+from typing import List, Optional
+
+from django.db.models import Max
+from django.utils import timezone
+
+from accounts.models import AITaskStatus, Document, User
+
+logger = logging.getLogger(__name__)
+
+TASK_TYPE = 'corpus_reprocessing'
+
+# Documents per batch task
+REPROCESS_BATCH_SIZE = 20
+
+# Redis transport priorities: 0 (default, interactive) is served first, 9 last
+REPROCESS_PRIORITY = 9
+
+# Batch lock lifetime - refreshed after every document
+REPROCESS_LOCK_SECONDS = 30 * 60
+
+MAX_RECORDED_ERRORS = 50
+
+
+def active_job() -> Optional[AITaskStatus]:
+    return AITaskStatus.objects.filter(
+        task_type=TASK_TYPE, status__in=['pending', 'running']
+    ).order_by('-created_at').first()
+
+
+def start_job(task_id: str, user: User) -> AITaskStatus:
+    """New job over all documents that exist now (later uploads are processed on upload)"""
+    max_document_id = Document.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+    total = Document.objects.filter(id__lte=max_document_id).count()
+
+    return AITaskStatus.objects.create(
+        task_id=task_id,
+        user=user,
+        task_type=TASK_TYPE,
+        status='running',
+        total_items=total,
+        current_step=f'Queued {total} documents',
+        metadata={
+            'checkpoint': 0,
+            'max_document_id': max_document_id,
+            'next_batch': 0,
+            'processed': 0,
+            'failed': 0,
+            'errors': [],
+            'elapsed_seconds': 0.0,
+            'throttled_seconds': 0.0,
+            'started_at': timezone.now().isoformat(),
+        },
+    )
+
+
+def next_document_ids(job: AITaskStatus, batch_size: int) -> List[int]:
+    return list(
+        Document.objects.filter(
+            id__gt=job.metadata['checkpoint'],
+            id__lte=job.metadata['max_document_id'],
+        ).order_by('id').values_list('id', flat=True)[:batch_size]
+    )
+
+
+def record_document(
+    job: AITaskStatus,
+    document_id: int,
+    success: bool,
+    elapsed: float,
+    throttled: float = 0.0,
+    error: str = ''
+):
+    """Advance the checkpoint past a document and refresh throughput / ETA"""
+    meta = job.metadata
+    meta['checkpoint'] = document_id
+    meta['elapsed_seconds'] = round(meta['elapsed_seconds'] + elapsed, 2)
+    meta['throttled_seconds'] = round(meta['throttled_seconds'] + throttled, 2)
+    if success:
+        meta['processed'] += 1
+    else:
+        meta['failed'] += 1
+        if len(meta['errors']) < MAX_RECORDED_ERRORS:
+            meta['errors'].append({'document_id': document_id, 'error': error[:500]})
+
+    done = meta['processed'] + meta['failed']
+    rate = done / meta['elapsed_seconds'] if meta['elapsed_seconds'] else 0.0
+    remaining = max(job.total_items - done, 0)
+    meta['docs_per_minute'] = round(rate * 60, 2)
+    meta['eta_seconds'] = int(remaining / rate) if rate else None
+
+    job.completed_items = done
+    job.progress = min(99, int(done * 100 / job.total_items)) if job.total_items else 99
+    job.current_step = f'Reprocessed {done}/{job.total_items} documents'
+    job.save(update_fields=['metadata', 'completed_items', 'progress', 'current_step', 'updated_at'])
+
+
+def finish_job(job: AITaskStatus):
+    meta = job.metadata
+    meta['eta_seconds'] = 0
+    meta['finished_at'] = timezone.now().isoformat()
+    job.status = 'completed'
+    job.progress = 100
+    job.current_step = f"Reprocessed {meta['processed']} documents ({meta['failed']} failed)"
+    job.result = job.current_step
+    job.save(update_fields=['metadata', 'status', 'progress', 'current_step', 'result', 'updated_at'])
+    logger.info(f"[Reprocessing] Job {job.pk} finished: {job.current_step} in {meta['elapsed_seconds']:.0f}s")
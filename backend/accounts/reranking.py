@@ -0,0 +1,99 @@
+"""
+Local cross-encoder reranking stage for RAG retrieval
+Scores the top hybrid candidates against the query with a CPU cross-encoder
+(RAG_RERANKER_MODEL via RerankerService, int8 and capped at RAG_RERANKER_MAX_LENGTH tokens) in batches; scores are cached in Redis
+per (model, query hash, chunk id) so re-runs of the same disclosure skip the model
+"""
+
+import hashlib
+import logging
+import time
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from accounts.embedding_service import RerankerService, get_reranker_service
+
+logger = logging.getLogger(__name__)
+
+# Hybrid candidates passed to the cross-encoder - rerank latency grows linearly with this
+RERANK_CANDIDATES = getattr(settings, 'RAG_RERANKER_CANDIDATES', 30)
+
+# Query-chunk pairs per forward pass
+RERANK_BATCH_SIZE = 16
+
+# Rerank score cache lifetime (chunk ids change when a document is reprocessed)
+RERANK_CACHE_TTL = 7 * 24 * 3600
+
+
+def reranker_enabled() -> bool:
+    return getattr(settings, 'RAG_RERANKER_ENABLED', True)
+
+
+def get_local_reranker() -> RerankerService:
+    """Local cross-encoder; the model itself is loaded once per process by the model registry"""
+    return get_reranker_service('bge', getattr(settings, 'RAG_RERANKER_MODEL', 'mmarco-mMiniLMv2-L12-H384-v1'))
+
+
+def _cache_keys(model: str, query: str, chunk_ids: List[int]) -> Dict[int, str]:
+    query_hash = hashlib.sha256(query.encode('utf-8')).hexdigest()[:32]
+    return {chunk_id: f'rerank:{model}:{query_hash}:{chunk_id}' for chunk_id in chunk_ids}
+
+
+def cross_encoder_scores(query: str, chunks: List, batch_size: int = RERANK_BATCH_SIZE) -> Dict[int, float]:
+    """
+    Cross-encoder relevance score per chunk id
+    Cached scores are read in one get_many; only uncached pairs go through the model
+    """
+    reranker = get_local_reranker()
+    keys = _cache_keys(reranker.model, query, [chunk.id for chunk in chunks])
+
+    try:
+        cached = cache.get_many(list(keys.values()))
+    except Exception as e:
+        logger.warning(f"[Rerank] Score cache lookup failed: {e}")
+        cached = {}
+
+    scores = {chunk_id: cached[key] for chunk_id, key in keys.items() if key in cached}
+    missing = [chunk for chunk in chunks if chunk.id not in scores]
+
+    if missing:
+        new_scores = reranker.score(query, [chunk.content for chunk in missing], batch_size=batch_size)
+        fresh = {chunk.id: float(score) for chunk, score in zip(missing, new_scores)}
+        scores.update(fresh)
+        try:
+            cache.set_many({keys[chunk_id]: score for chunk_id, score in fresh.items()}, timeout=RERANK_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"[Rerank] Score cache store failed: {e}")
+
+    logger.info(f"[Rerank] {len(chunks)} chunks: {len(chunks) - len(missing)} cached, {len(missing)} scored")
+    return scores
+
+
+def rerank_chunks(query: str, scored_chunks: List[Tuple], top_n: int = 10) -> Tuple[List[Tuple], str]:
+    """
+    Reorder (chunk, hybrid, semantic, bm25) tuples by cross-encoder relevance
+
+    Hybrid scores are kept (they feed the confidence estimate); only the order
+    and the cut to top_n change. Falls back to the hybrid order if the model fails.
+
+    Returns:
+        (top_n tuples, description of what happened - shown as a processing step)
+    """
+    if not reranker_enabled():
+        return scored_chunks[:top_n], "Reranking disabled - hybrid order"
+    if len(scored_chunks) <= 1:
+        return scored_chunks[:top_n], f"Not reranked - {len(scored_chunks)} candidate(s)"
+
+    start = time.time()
+    try:
+        scores = cross_encoder_scores(query, [entry[0] for entry in scored_chunks])
+    except Exception as e:
+        logger.warning(f"[Rerank] Cross-encoder failed, keeping hybrid order: {e}")
+        return scored_chunks[:top_n], "Cross-encoder failed - kept hybrid order"
+
+    reranked = sorted(scored_chunks, key=lambda entry: scores.get(entry[0].id, float('-inf')), reverse=True)
+    elapsed_ms = (time.time() - start) * 1000
+    logger.info(f"[Rerank] Reranked {len(scored_chunks)} candidates in {elapsed_ms:.0f}ms")
+    return reranked[:top_n], f"Reranked {len(scored_chunks)} candidates by cross-encoder in {elapsed_ms:.0f}ms"
@@ -350,3 +350,20 @@ class UpdateRAGSettingsSchema(Schema):
     rag_tier2_threshold: int
     rag_tier3_enabled: bool
     rag_tier3_threshold: int
+
+class DocumentUploadInitSchema(Schema):
+    """Start a resumable upload"""
+    file_name: str
+    file_size: int
+    sha256: str  # hex SHA-256 of the whole file, verified on complete
+    file_type: str = ''
+    is_global: Optional[bool] = None
+    company_type: str = ''
+
+class DocumentUploadStatusSchema(Schema):
+    upload_id: str
+    file_name: str
+    file_size: int
+    received_bytes: int
+    part_size: int
+    status: str
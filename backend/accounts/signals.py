@@ -1,6 +1,13 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+import logging
+
+from accounts.models import ESRSDisclosure
+
+logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
@@ -12,3 +19,21 @@ def set_default_standards(sender, instance, created, **kwargs):
         # Set ESRS as default
         instance.allowed_standards = ['ESRS']
         instance.save(update_fields=['allowed_standards'])
+
+
+# Catalog imports save many disclosures in a row - schedule one precompute run for all of them
+DISCLOSURE_EMBEDDING_DEBOUNCE_SECONDS = 60
+
+
+@receiver(post_save, sender=ESRSDisclosure)
+def schedule_disclosure_embeddings(sender, instance, **kwargs):
+    """Precompute query embeddings for new or edited disclosures after the import settles"""
+    def schedule():
+        try:
+            if cache.add('disclosure_embeddings_scheduled', True, timeout=DISCLOSURE_EMBEDDING_DEBOUNCE_SECONDS):
+                from accounts.tasks import precompute_disclosure_embeddings_task
+                precompute_disclosure_embeddings_task.apply_async(countdown=DISCLOSURE_EMBEDDING_DEBOUNCE_SECONDS)
+        except Exception as e:
+            logger.warning(f'Could not schedule disclosure embedding precompute: {e}')
+    
+    transaction.on_commit(schedule)
@@ -92,6 +92,16 @@ def cleanup_inactive_users():
     return count
 
 
+@shared_task
+def precompute_disclosure_embeddings_task():
+    """Embed disclosure query texts that have no precomputed embedding (runs after catalog imports)"""
+    from accounts.disclosure_embeddings import precompute_disclosure_embeddings
+    
+    created = precompute_disclosure_embeddings()
+    logger.info(f'Precomputed disclosure query embeddings: {created}')
+    return created
+
+
 @shared_task(bind=True)
 def generate_ai_answer_task(
     self,
@@ -244,14 +254,18 @@ Write a complete, professional answer for this disclosure requirement using the
             # Use unified TIER 1+2 RAG engine
             from accounts.rag_tier_engine import run_tier_rag
             
-            query_text = f"{disclosure.code} {disclosure.name} {disclosure_requirement}"
+            from accounts.disclosure_embeddings import disclosure_query_text
+            
+            # Same text as the precomputed disclosure embeddings, so no query embedding call is needed
+            query_text = disclosure_query_text(disclosure)
             
             # Run TIER 1+2 RAG with user's settings
             rag_context, expanded_chunks, avg_confidence, processing_steps = run_tier_rag(
                 user=user,
                 query_text=query_text,
                 relevant_doc_ids=relevant_doc_ids,
-                temperature=ai_temperature
+                temperature=ai_temperature,
+                disclosure_id=disclosure.id
             )
             
             logger.info(f'TIER RAG complete: {len(expanded_chunks)} chunks, {avg_confidence:.2%} confidence, context={len(rag_context)} chars')
@@ -1,3 +1,564 @@
-from django.test import TestCase
+import hashlib
+import io
+import math
+import os
+import shutil
+import sys
+import tempfile
+from types import SimpleNamespace
+from unittest.mock import patch
 
-# Create your tests here.
+import numpy as np
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from accounts.bm25_index import BM25Index, term_frequencies
+from accounts.chunked_upload import UploadOffsetMismatch, append_part, init_upload, partial_path
+from accounts.disclosure_relevance import DocumentRelevance, disclosure_candidates
+from accounts.document_rag_tasks import _swap_in_chunks
+from accounts.models import Document, ESRSCategory, ESRSDisclosure, ESRSStandard, User
+from accounts import tokenization
+from accounts.embedding_store import store_chunk_embeddings
+from accounts.rag_engine import HybridRAGEngine, SemanticChunker, TableChunker
+from accounts.rag_tier_engine import expand_with_neighbors
+from accounts.reranking import rerank_chunks
+from accounts.tokenization import count_tokens, tokenizer_name
+from accounts.vector_models import DisclosureRelevance, DocumentChunk
+
+
+class ChunkFixtureMixin:
+    """One user with a document and helpers to add chunks to it"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', email='owner@example.com', password='x')
+        self.document = self.make_document('report.pdf')
+
+    def make_document(self, file_name):
+        return Document.objects.create(
+            user=self.user, file_name=file_name, file_path=f'documents/{file_name}', file_size=1, file_type='pdf'
+        )
+
+    def make_chunk(self, chunk_index, content, document=None):
+        return DocumentChunk.objects.create(
+            document=document or self.document, chunk_index=chunk_index, content=content
+        )
+
+
+class BM25IndexTests(ChunkFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.emissions = self.make_chunk(0, 'Scope 1 emissions fell in 2024 emissions report')
+        self.water = self.make_chunk(1, 'Water withdrawal by site in 2023')
+        self.policy = self.make_chunk(2, 'Anti corruption policy and training')
+
+    def test_term_frequencies(self):
+        self.assertEqual(term_frequencies('CO2 co2 Scope'), {'co2': 2, 'scope': 1})
+
+    def test_corpus_stats_from_selected_documents(self):
+        self.make_chunk(0, 'other document words', document=self.make_document('other.pdf'))
+        index = BM25Index([self.document.id])
+        self.assertEqual(index.corpus_size, 3)
+        self.assertAlmostEqual(index.avgdl, (8 + 6 + 5) / 3)
+
+    def test_scores_match_bm25(self):
+        index = BM25Index([self.document.id])
+        scores = index.get_scores('emissions')
+
+        self.assertEqual(set(scores), {self.emissions.id})
+        idf = math.log((3 - 1 + 0.5) / (1 + 0.5) + 1)
+        tf, doc_len = 2, 8
+        expected = idf * tf * 2.5 / (tf + 1.5 * (1 - 0.75 + 0.75 * doc_len / index.avgdl))
+        self.assertAlmostEqual(scores[self.emissions.id], expected)
+
+    def test_numeric_terms_score(self):
+        scores = BM25Index([self.document.id]).get_scores('2024')
+        self.assertEqual(set(scores), {self.emissions.id})
+        self.assertGreater(scores[self.emissions.id], 0)
+
+    def test_stopwords_are_not_indexed_or_queried(self):
+        self.assertEqual(term_frequencies('The emissions of the site'), {'emissions': 1, 'site': 1})
+        self.assertEqual(BM25Index([self.document.id]).get_scores('what are the'), {})
+
+    def test_common_terms_dropped_from_queries(self):
+        self.make_chunk(3, 'policy note')
+        self.make_chunk(4, 'policy memo')
+        with patch('accounts.bm25_index.MIN_CORPUS_FOR_DF_CUT', 0):
+            index = BM25Index([self.document.id])
+            self.assertEqual(index.get_scores('policy training'), index.get_scores('training'))
+            self.assertEqual(index.get_scores('policy'), {})
+            self.assertEqual(set(index.get_scores('emissions')), {self.emissions.id})
+
+    def test_batch_scores_in_query_order(self):
+        index = BM25Index([self.document.id])
+        by_year, by_topic, missing = index.get_batch_scores(['2023', 'policy training', 'biodiversity'])
+
+        self.assertEqual(set(by_year), {self.water.id})
+        self.assertEqual(set(by_topic), {self.policy.id})
+        self.assertEqual(missing, {})
+        self.assertEqual(by_topic, index.get_scores('policy training'))
+
+
+class ChunkGenerationTests(ChunkFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.old = self.make_chunk(0, 'old text')
+        self.staged = DocumentChunk.objects.create(
+            document=self.document, chunk_index=0, chunk_id=f'{self.document.id}_0_run1',
+            staging_run='run1', content='new text'
+        )
+
+    def test_staged_chunks_are_not_live(self):
+        self.assertEqual(list(DocumentChunk.objects.filter(document=self.document)), [self.old])
+        self.assertEqual(DocumentChunk.all_objects.filter(document=self.document).count(), 2)
+
+    def test_swap_replaces_live_generation(self):
+        _swap_in_chunks(self.document, 'run1')
+
+        live = DocumentChunk.objects.get(document=self.document)
+        self.assertEqual((live.id, live.content, live.chunk_id), (self.staged.id, 'new text', f'{self.document.id}_0'))
+        self.assertFalse(DocumentChunk.all_objects.filter(id=self.old.id).exists())
+
+
+class DisclosureRelevanceTests(ChunkFixtureMixin, TestCase):
+    """Disclosure 0 matches chunks along [1, 0], disclosure 1 along [0, 1]"""
+
+    def setUp(self):
+        super().setUp()
+        category = ESRSCategory.objects.create(name='Environmental', code='E')
+        standard = ESRSStandard.objects.create(category=category, code='E1', name='Climate change', description='')
+        self.disclosures = [
+            ESRSDisclosure.objects.create(standard=standard, code=f'E1-{i}', name=f'D{i}', description='', requirement_text='')
+            for i in range(2)
+        ]
+        matrix = patch(
+            'accounts.disclosure_relevance.disclosure_embedding_matrix',
+            return_value=([d.id for d in self.disclosures], np.eye(2, dtype=np.float32))
+        )
+        matrix.start()
+        self.addCleanup(matrix.stop)
+
+        self.other = self.make_document('other.pdf')
+        Document.objects.filter(id__in=[self.document.id, self.other.id]).update(rag_processing_status='completed')
+        self.chunks = [self.make_chunk(i, f'chunk {i}') for i in range(4)]
+        self.other_chunks = [self.make_chunk(i, f'other {i}', document=self.other) for i in range(2)]
+
+    def relevance(self, chunks, vectors, model='local', top_k=2):
+        relevance = DocumentRelevance('local', model, top_k=top_k)
+        relevance.add([chunk.id for chunk in chunks], vectors)
+        return relevance
+
+    def test_add_keeps_top_k_across_batches(self):
+        relevance = DocumentRelevance('local', 'm', top_k=2)
+        relevance.add([c.id for c in self.chunks[:2]], [[1.0, 0.0], [0.6, 0.8]])
+        relevance.add([c.id for c in self.chunks[2:]], [[0.0, 1.0], None])
+
+        self.assertEqual(relevance.chunks_scored, 3)
+        best = [dict(zip(ids, scores)) for ids, scores in zip(relevance.chunk_ids, relevance.scores)]
+        self.assertEqual(set(best[0]), {self.chunks[0].id, self.chunks[1].id})
+        self.assertEqual(set(best[1]), {self.chunks[1].id, self.chunks[2].id})
+        self.assertAlmostEqual(best[1][self.chunks[1].id], 0.8, places=5)
+
+    def test_save_replaces_only_this_documents_rows(self):
+        self.relevance(self.other_chunks, [[1.0, 0.0], [0.0, 1.0]], model='m').save(self.user.id, self.other.id)
+        self.relevance(self.chunks[:2], [[1.0, 0.0], [0.0, 1.0]], model='m').save(self.user.id, self.document.id)
+        written = self.relevance(self.chunks[2:], [[1.0, 0.0], [0.0, 1.0]], model='m').save(self.user.id, self.document.id)
+
+        self.assertEqual(written, 4)
+        self.assertEqual(
+            set(DisclosureRelevance.objects.filter(document=self.document).values_list('chunk_id', flat=True)),
+            {self.chunks[2].id, self.chunks[3].id}
+        )
+        self.assertEqual(DisclosureRelevance.objects.filter(document=self.other).count(), 4)
+
+    def test_candidates_best_first_across_documents(self):
+        self.relevance(self.chunks[:2], [[1.0, 0.0], [0.6, 0.8]], model='m').save(self.user.id, self.document.id)
+        self.relevance(self.other_chunks, [[0.8, 0.6], [0.0, 1.0]], model='m').save(self.user.id, self.other.id)
+
+        candidates = disclosure_candidates(
+            self.user.id, self.disclosures[0].id, [self.document.id, self.other.id], 'local/m', min_candidates=1
+        )
+        self.assertEqual(list(candidates), [self.chunks[0].id, self.other_chunks[0].id, self.chunks[1].id, self.other_chunks[1].id])
+        self.assertAlmostEqual(candidates[self.other_chunks[0].id], 0.8, places=5)
+
+    def test_candidates_fall_back_to_full_search(self):
+        self.relevance(self.chunks[:2], [[1.0, 0.0], [0.6, 0.8]], model='m').save(self.user.id, self.document.id)
+        disclosure_id = self.disclosures[0].id
+
+        # Processed document without rows, rows from another model, too few candidates
+        self.assertIsNone(disclosure_candidates(self.user.id, disclosure_id, [self.document.id, self.other.id], min_candidates=1))
+        self.assertIsNone(disclosure_candidates(self.user.id, disclosure_id, [self.document.id], 'local/other', min_candidates=1))
+        self.assertIsNone(disclosure_candidates(self.user.id, disclosure_id, [self.document.id], 'local/m', min_candidates=3))
+        self.assertEqual(len(disclosure_candidates(self.user.id, disclosure_id, [self.document.id], 'local/m', min_candidates=2)), 2)
+
+    def test_rows_go_away_with_their_chunks(self):
+        self.relevance(self.chunks[:2], [[1.0, 0.0], [0.6, 0.8]], model='m').save(self.user.id, self.document.id)
+        DocumentChunk.objects.filter(document=self.document).delete()
+        self.assertFalse(DisclosureRelevance.objects.exists())
+        self.assertIsNone(disclosure_candidates(self.user.id, self.disclosures[0].id, [self.document.id], min_candidates=1))
+
+
+class ExpandWithNeighborsTests(ChunkFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.chunks = [self.make_chunk(i, f'chunk {i}') for i in range(10)]
+
+    def top(self, *scored):
+        return [(self.chunks[index], score, score, score) for index, score in scored]
+
+    def summary(self, expanded):
+        return [(chunk.chunk_index, kind, round(hybrid, 4)) for chunk, hybrid, _, _, kind in expanded]
+
+    def test_neighbors_follow_their_main_chunk(self):
+        expanded = expand_with_neighbors(self.top((2, 1.0), (6, 0.8)), self.chunks, window=1)
+        self.assertEqual(self.summary(expanded), [
+            (2, 'main', 1.0), (1, 'neighbor', 0.7), (3, 'neighbor', 0.7),
+            (6, 'main', 0.8), (5, 'neighbor', 0.56), (7, 'neighbor', 0.56),
+        ])
+
+    def test_score_decays_with_distance(self):
+        expanded = expand_with_neighbors(self.top((5, 1.0)), self.chunks, window=2, decay=0.5)
+        self.assertEqual(self.summary(expanded), [
+            (5, 'main', 1.0), (3, 'neighbor', 0.25), (4, 'neighbor', 0.5), (6, 'neighbor', 0.5), (7, 'neighbor', 0.25),
+        ])
+
+    def test_shared_neighbor_keeps_best_score(self):
+        expanded = expand_with_neighbors(self.top((2, 1.0), (4, 0.5)), self.chunks, window=1)
+        self.assertEqual(self.summary(expanded), [
+            (2, 'main', 1.0), (1, 'neighbor', 0.7), (3, 'neighbor', 0.7),
+            (4, 'main', 0.5), (5, 'neighbor', 0.35),
+        ])
+
+    def test_adjacent_main_chunks_are_not_repeated(self):
+        expanded = expand_with_neighbors(self.top((0, 1.0), (1, 0.9)), self.chunks, window=1)
+        self.assertEqual(self.summary(expanded), [(0, 'main', 1.0), (1, 'main', 0.9), (2, 'neighbor', 0.63)])
+
+    def test_missing_neighbors_fetched_in_one_query(self):
+        other = self.make_document('other.pdf')
+        self.make_chunk(4, 'other document', document=other)
+        top = self.top((3, 1.0), (8, 0.9))
+
+        with self.assertNumQueries(1):
+            expanded = expand_with_neighbors(top, [chunk for chunk, *_ in top], window=1)
+
+        self.assertEqual([(chunk.chunk_index, kind) for chunk, *_, kind in expanded], [
+            (3, 'main'), (2, 'neighbor'), (4, 'neighbor'), (8, 'main'), (7, 'neighbor'), (9, 'neighbor'),
+        ])
+        self.assertTrue(all(chunk.document_id == self.document.id for chunk, *_ in expanded))
+
+
+class RerankChunksTests(SimpleTestCase):
+    """rerank_chunks reorders by cross-encoder score and reports what actually happened"""
+
+    def setUp(self):
+        self.scored = [(SimpleNamespace(id=chunk_id), 0.5, 0.5, 0.0) for chunk_id in (1, 2, 3)]
+
+    def ids(self, entries):
+        return [entry[0].id for entry in entries]
+
+    @override_settings(RAG_RERANKER_ENABLED=True)
+    def test_reranks_by_cross_encoder_score(self):
+        with patch('accounts.reranking.cross_encoder_scores', return_value={1: 0.1, 2: 0.9, 3: 0.5}):
+            top, result = rerank_chunks('query', self.scored, top_n=2)
+
+        self.assertEqual(self.ids(top), [2, 3])
+        self.assertTrue(result.startswith('Reranked 3 candidates'))
+
+    @override_settings(RAG_RERANKER_ENABLED=True)
+    def test_failure_keeps_hybrid_order_and_says_so(self):
+        with patch('accounts.reranking.cross_encoder_scores', side_effect=RuntimeError('no model')):
+            top, result = rerank_chunks('query', self.scored, top_n=2)
+
+        self.assertEqual(self.ids(top), [1, 2])
+        self.assertIn('failed', result)
+
+    @override_settings(RAG_RERANKER_ENABLED=False)
+    def test_disabled(self):
+        with patch('accounts.reranking.cross_encoder_scores') as scores:
+            top, result = rerank_chunks('query', self.scored, top_n=2)
+
+        scores.assert_not_called()
+        self.assertEqual(self.ids(top), [1, 2])
+        self.assertIn('disabled', result)
+
+
+class SnapshotBuildTests(ChunkFixtureMixin, TestCase):
+
+    model = ('local', 'multilingual-e5-small')
+
+    def setUp(self):
+        super().setUp()
+        snapshot_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, snapshot_root)
+        snapshots = override_settings(RAG_SNAPSHOT_ROOT=snapshot_root)
+        snapshots.enable()
+        self.addCleanup(snapshots.disable)
+        serving = patch('accounts.embedding_store.serving_model', return_value=self.model)
+        serving.start()
+        self.addCleanup(serving.stop)
+
+        self.other = self.make_document('other.pdf')
+        self.chunks = {self.document.id: [], self.other.id: []}
+        for document, count in ((self.document, 3), (self.other, 2)):
+            for i in range(count):
+                self.add_chunk(document, i)
+            self.mark_processed(document)
+
+    def add_chunk(self, document, chunk_index):
+        chunk = self.make_chunk(chunk_index, f'chunk {chunk_index}', document=document)
+        vector = np.zeros(384, dtype=np.float32)
+        vector[chunk.id % 384] = 1.0
+        store_chunk_embeddings([chunk.id], [vector.tolist()], *self.model)
+        self.chunks[document.id].append(chunk.id)
+
+    def mark_processed(self, document):
+        document.rag_processing_status = 'completed'
+        document.rag_processed_at = timezone.now()
+        document.save(update_fields=['rag_processing_status', 'rag_processed_at'])
+
+    def build(self):
+        return HybridRAGEngine._build(self.user.id, previous=HybridRAGEngine.open(self.user.id))
+
+    def test_build_then_reuse_unchanged_documents(self):
+        first = self.build()
+        documents = [self.document.id, self.other.id]
+        self.assertTrue(first.is_fresh(documents))
+        self.assertEqual(list(first.chunk_ids_for(documents)), self.chunks[self.document.id] + self.chunks[self.other.id])
+
+        self.add_chunk(self.document, 3)
+        self.mark_processed(self.document)
+        self.assertFalse(first.is_fresh(documents))
+
+        with self.assertLogs('accounts.rag_engine', 'INFO') as logs:
+            second = self.build()
+        self.assertTrue(any('(1 reused' in line for line in logs.output))
+        self.assertTrue(second.is_fresh(documents))
+        self.assertEqual(list(second.chunk_ids_for([self.document.id])), self.chunks[self.document.id])
+        self.assertEqual(list(second.chunk_ids_for([self.other.id])), self.chunks[self.other.id])
+
+    def test_document_changed_mid_build_is_left_out(self):
+        # The first document gains a chunk between counting and reading its rows
+        counts = {self.document.id: 3, self.other.id: 2}
+        self.add_chunk(self.document, 3)
+        with patch.object(HybridRAGEngine, '_chunk_counts', return_value=counts):
+            snapshot = self.build()
+
+        # Later documents keep all their rows; the changed one is neither fresh nor reused
+        self.assertEqual(list(snapshot.chunk_ids_for([self.other.id])), self.chunks[self.other.id])
+        self.assertTrue(snapshot.is_fresh([self.other.id]))
+        self.assertFalse(snapshot.is_fresh([self.document.id]))
+
+        rebuilt = self.build()
+        self.assertTrue(rebuilt.is_fresh([self.document.id]))
+        self.assertEqual(list(rebuilt.chunk_ids_for([self.document.id])), self.chunks[self.document.id])
+
+
+SHEET_TEXT = (
+    "Intro paragraph about the workbook.\n\n"
+    + "=" * 80 + "\n=== SHEET: Emissions ===\n" + "=" * 80 + "\n\n"
+    + "year | scope | tco2e\n" + "-" * 20 + "\n"
+    + "".join(f"{2000 + i} | scope {i % 3 + 1} | {i * 10}\n" for i in range(40))
+    + "\n" + "=" * 80 + "\n=== END OF SHEET: Emissions ===\n" + "=" * 80 + "\n\n"
+    + "Closing remarks."
+)
+
+
+class TableChunkerTests(SimpleTestCase):
+
+    def table(self, rows):
+        return {'kind': 'sheet', 'name': 'Emissions', 'header': 'year | scope | tco2e', 'rows': rows}
+
+    def test_split_segments(self):
+        segments = TableChunker.split_segments(SHEET_TEXT)
+        self.assertEqual([bool(table) for _, table in segments], [False, True, False])
+        table = segments[1][1]
+        self.assertEqual((table['kind'], table['name'], table['header']), ('sheet', 'Emissions', 'year | scope | tco2e'))
+        self.assertEqual(len(table['rows']), 40)
+        self.assertEqual(table['rows'][0], '2000 | scope 1 | 0')
+
+    def test_chunk_table_row_ranges_cover_every_row_once(self):
+        rows = [f"{2000 + i} | scope {i % 3 + 1} | {i * 10}" for i in range(40)]
+        chunks = TableChunker.chunk_table(self.table(rows), max_tokens=60)
+
+        self.assertGreater(len(chunks), 1)
+        expected_start = 1
+        for text, metadata, tokens in chunks:
+            self.assertEqual(metadata['type'], 'table')
+            self.assertEqual(metadata['sheet'], 'Emissions')
+            self.assertEqual(metadata['row_start'], expected_start)
+            body = text.split('\n')[2:]
+            self.assertEqual(body, rows[metadata['row_start'] - 1:metadata['row_end']])
+            self.assertLessEqual(tokens, 60)
+            self.assertEqual(tokens, count_tokens(text))
+            expected_start = metadata['row_end'] + 1
+        self.assertEqual(expected_start, 41)
+
+    def test_chunk_table_repeats_sheet_and_header(self):
+        rows = [f"row {i} | value {i}" for i in range(30)]
+        for text, _, _ in TableChunker.chunk_table(self.table(rows), max_tokens=40):
+            self.assertTrue(text.startswith('Sheet: Emissions\nyear | scope | tco2e\n'))
+
+    def test_oversized_row_is_not_split(self):
+        long_row = ' | '.join(f'cell{i}' for i in range(100))
+        chunks = TableChunker.chunk_table(self.table(['a | b', long_row, 'c | d']), max_tokens=30)
+        self.assertEqual([(m['row_start'], m['row_end']) for _, m, _ in chunks], [(1, 1), (2, 2), (3, 3)])
+        self.assertIn(long_row, chunks[1][0])
+
+    def test_header_only_table(self):
+        chunks = TableChunker.chunk_table(self.table([]))
+        self.assertEqual(chunks, [('Sheet: Emissions\nyear | scope | tco2e', {
+            'type': 'table', 'sheet': 'Emissions', 'row_start': 0, 'row_end': 0
+        }, count_tokens('Sheet: Emissions\nyear | scope | tco2e'))])
+
+    def test_chunk_document_keeps_prose_and_tables_in_order(self):
+        chunks = TableChunker.chunk_document(SHEET_TEXT, max_table_tokens=80)
+        kinds = [metadata.get('type', 'prose') for _, metadata, _ in chunks]
+        self.assertEqual(kinds[0], 'prose')
+        self.assertEqual(kinds[-1], 'prose')
+        self.assertEqual(set(kinds[1:-1]), {'table'})
+        self.assertIn('Intro paragraph', chunks[0][0])
+        self.assertEqual(chunks[-1][0], 'Closing remarks.')
+
+    def test_chunk_stream_matches_chunk_document_for_any_block_size(self):
+        expected = TableChunker.chunk_document(SHEET_TEXT, max_table_tokens=80)
+        for size in (1, 13, 500, len(SHEET_TEXT)):
+            blocks = (SHEET_TEXT[i:i + size] for i in range(0, len(SHEET_TEXT), size))
+            self.assertEqual(list(TableChunker.chunk_stream(blocks, max_table_tokens=80)), expected)
+
+    def test_chunk_stream_yields_row_groups_before_the_table_ends(self):
+        def blocks():
+            yield "=== SHEET: Big ===\nid | value\n"
+            for i in range(100):
+                yield f"{i} | {i}\n"
+            raise AssertionError('stream must not be read to the end')
+
+        stream = TableChunker.chunk_stream(blocks(), max_table_tokens=40)
+        text, metadata, _ = next(stream)
+        self.assertEqual(metadata['row_start'], 1)
+        self.assertTrue(text.startswith('Sheet: Big\nid | value\n0 | 0'))
+
+
+class ChunkByTokensTests(SimpleTestCase):
+
+    words = ' '.join(f'word{i}' for i in range(2000))
+
+    def test_chunks_stay_within_max_tokens(self):
+        chunks = SemanticChunker.chunk_by_tokens(self.words, max_tokens=64, overlap_tokens=16)
+        self.assertGreater(len(chunks), 1)
+        for chunk, tokens in chunks:
+            self.assertLessEqual(tokens, 64)
+            self.assertLessEqual(count_tokens(chunk), 64)
+
+    def test_consecutive_chunks_overlap(self):
+        spans = SemanticChunker.token_spans(self.words, max_tokens=64, overlap_tokens=16)
+        self.assertEqual(spans[0][0], 0)
+        self.assertEqual(spans[-1][1], len(self.words))
+        for (_, previous_end, _), (start, _, _) in zip(spans, spans[1:]):
+            self.assertLess(start, previous_end)
+            self.assertLessEqual(count_tokens(self.words[start:previous_end]), 16)
+
+    def test_overlap_capped_at_quarter_of_max_tokens(self):
+        spans = SemanticChunker.token_spans(self.words, max_tokens=40, overlap_tokens=40)
+        for (_, previous_end, _), (start, _, _) in zip(spans, spans[1:]):
+            self.assertLessEqual(count_tokens(self.words[start:previous_end]), 10)
+
+    def test_cuts_at_paragraph_break(self):
+        first = ' '.join(f'alpha{i}' for i in range(40))
+        text = first + '\n\n' + ' '.join(f'beta{i}' for i in range(40))
+        chunks = SemanticChunker.chunk_by_tokens(text, max_tokens=64, overlap_tokens=0)
+        self.assertEqual(chunks[0][0], first)
+
+    def test_text_is_tokenized_once(self):
+        text = '\n\n'.join(f'Sentence {i} about emissions. Another one here.' for i in range(2000))
+        with patch('accounts.rag_engine.token_offsets', wraps=tokenization.token_offsets) as offsets:
+            SemanticChunker.chunk_by_tokens(text)
+        self.assertEqual(offsets.call_count, 1)
+
+
+class TokenizerFallbackTests(SimpleTestCase):
+
+    def setUp(self):
+        state = patch.dict(tokenization._encoding, {'value': None, 'loaded': False})
+        state.start()
+        self.addCleanup(state.stop)
+
+    def test_regex_fallback_is_recorded(self):
+        with patch.dict(sys.modules, {'tiktoken': None}):
+            self.assertEqual(count_tokens('Scope 1, 2 and 3.'), 7)
+            self.assertEqual(tokenizer_name(), 'regex')
+
+    @override_settings(TOKENIZER_REQUIRE_TIKTOKEN=True)
+    def test_required_tiktoken_fails_loudly(self):
+        with patch.dict(sys.modules, {'tiktoken': None}):
+            with self.assertRaises(ImproperlyConfigured):
+                count_tokens('Scope 1 emissions')
+            self.assertFalse(tokenization._encoding['loaded'])
+
+
+class AppendPartTests(TestCase):
+
+    data = b'0123456789'
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.user = User.objects.create_user(username='uploader', email='uploader@example.com', password='x')
+        self.upload = init_upload(self.user, 'report.pdf', len(self.data), hashlib.sha256(self.data).hexdigest())
+
+    def append(self, offset, part, part_sha256=None):
+        return append_part(self.upload.upload_id, self.user, offset, io.BytesIO(part), part_sha256)
+
+    def partial(self):
+        with open(partial_path(self.upload), 'rb') as f:
+            return f.read()
+
+    def received_bytes(self):
+        self.upload.refresh_from_db()
+        return self.upload.received_bytes
+
+    def test_parts_append_at_offset(self):
+        self.assertEqual(self.append(0, self.data[:4], hashlib.sha256(self.data[:4]).hexdigest()), 4)
+        self.assertEqual(self.append(4, self.data[4:]), 10)
+        self.assertEqual(self.partial(), self.data)
+        self.assertEqual(self.received_bytes(), 10)
+
+    def test_offset_mismatch_reports_received_bytes(self):
+        self.append(0, self.data[:4])
+        for offset in (0, 6):
+            with self.assertRaises(UploadOffsetMismatch) as raised:
+                self.append(offset, self.data[offset:])
+            self.assertEqual(raised.exception.received_bytes, 4)
+        self.assertEqual(self.partial(), self.data[:4])
+
+    def test_checksum_mismatch_truncates_to_offset(self):
+        self.append(0, self.data[:4])
+        with self.assertRaisesMessage(ValueError, 'checksum mismatch'):
+            self.append(4, self.data[4:], part_sha256='0' * 64)
+        self.assertEqual(self.partial(), self.data[:4])
+        self.assertEqual(self.received_bytes(), 4)
+
+        # The client resends the same part
+        self.assertEqual(self.append(4, self.data[4:], hashlib.sha256(self.data[4:]).hexdigest()), 10)
+        self.assertEqual(self.partial(), self.data)
+
+    def test_part_beyond_declared_size_rejected(self):
+        self.append(0, self.data[:4])
+        with self.assertRaisesMessage(ValueError, 'exceeds declared file size'):
+            self.append(4, self.data[4:] + b'extra')
+        self.assertEqual(self.partial(), self.data[:4])
+        self.assertEqual(self.received_bytes(), 4)
+
+    def test_bytes_past_offset_from_interrupted_part_are_overwritten(self):
+        self.append(0, self.data[:4])
+        with open(partial_path(self.upload), 'ab') as f:
+            f.write(b'garbage')
+        self.append(4, self.data[4:])
+        self.assertEqual(self.partial(), self.data)
+        self.assertEqual(os.path.getsize(partial_path(self.upload)), len(self.data))
@@ -0,0 +1,82 @@
+"""
+Tokenizer for chunk sizing and stored token counts
+Uses tiktoken's cl100k_base (the text-embedding-3 / GPT-4 tokenizer); without
+tiktoken a regex word/punctuation tokenizer keeps chunking working with
+approximate counts, unless TOKENIZER_REQUIRE_TIKTOKEN is set (the default with
+DEBUG off). tiktoken downloads the encoding on first use - the Docker image
+fetches it into TIKTOKEN_CACHE_DIR at build time so workers need no egress
+"""
+
+import logging
+import re
+from typing import List
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+ENCODING_NAME = 'cl100k_base'
+FALLBACK_NAME = 'regex'
+
+_FALLBACK_TOKEN = re.compile(r'\s*(?:\w+|[^\w\s])', re.UNICODE)
+
+_encoding = {'value': None, 'loaded': False}
+
+
+def _get_encoding():
+    if not _encoding['loaded']:
+        try:
+            import tiktoken
+            _encoding['value'] = tiktoken.get_encoding(ENCODING_NAME)
+        except Exception as e:
+            if getattr(settings, 'TOKENIZER_REQUIRE_TIKTOKEN', False):
+                # Not cached as loaded - a later call retries once the encoding is reachable
+                raise ImproperlyConfigured(
+                    f"tiktoken {ENCODING_NAME} encoding unavailable ({e}); install tiktoken and pre-fetch the "
+                    f"encoding into TIKTOKEN_CACHE_DIR, or set TOKENIZER_REQUIRE_TIKTOKEN=False"
+                ) from e
+            logger.warning(f"[Tokenization] tiktoken unavailable ({e}), using approximate regex tokenizer")
+        _encoding['loaded'] = True
+    return _encoding['value']
+
+
+def tokenizer_name() -> str:
+    """Tokenizer behind count_tokens ('cl100k_base' or 'regex'), stored next to token counts"""
+    return ENCODING_NAME if _get_encoding() is not None else FALLBACK_NAME
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return sum(1 for _ in _FALLBACK_TOKEN.finditer(text))
+
+
+def token_offsets(text: str) -> List[int]:
+    """
+    Start character offset of every token of text, from one tokenization pass
+    len(result) is the token count; text[offsets[i]:offsets[j]] is tokens i..j-1
+    """
+    if not text:
+        return []
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        _, offsets = encoding.decode_with_offsets(tokens)
+        return offsets
+    return [match.start() for match in _FALLBACK_TOKEN.finditer(text)]
+
+
+def spans_to_token_indices(offsets: List[int], positions: List[int]) -> List[int]:
+    """Sorted character positions -> index of the first token starting at or after each (linear merge)"""
+    indices = []
+    token = 0
+    for position in positions:
+        while token < len(offsets) and offsets[token] < position:
+            token += 1
+        indices.append(token)
+    return indices
+
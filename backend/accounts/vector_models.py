@@ -7,11 +7,29 @@ from django.db import models
 from django.contrib.postgres.indexes import GinIndex
 from pgvector.django import VectorField
 
+# OpenAI text-embedding-3-large (3072 dimensions)
+EMBEDDING_DIMENSIONS = 3072
+
+# Fixed-dimension vector columns on DocumentChunk - superseded by ChunkEmbedding,
+# no longer written and deferred whenever chunks are loaded
+LEGACY_VECTOR_FIELDS = ('embedding', 'voyage_embedding', 'jina_embedding')
+
+
+class LiveChunkManager(models.Manager):
+    """Chunks retrieval may read - excludes rows an ingest run is still writing"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(staging_run='')
+
 
 class DocumentChunk(models.Model):
     """
     Individual chunks of documents with embeddings and metadata
     Supports hybrid search (BM25 + semantic)
+
+    Reprocessing writes the new chunks as a staged generation (staging_run set)
+    next to the live ones and swaps them in one transaction when the run
+    succeeds; `objects` only returns live chunks, `all_objects` returns both
     """
     document = models.ForeignKey(
         'Document', 
@@ -22,6 +40,12 @@ class DocumentChunk(models.Model):
     # Chunk identification
     chunk_index = models.IntegerField(help_text='Position of chunk in document (0-based)')
     chunk_id = models.CharField(max_length=100, unique=True, help_text='Unique identifier: doc_{id}_chunk_{idx}')
+    staging_run = models.CharField(
+        max_length=32,
+        blank=True,
+        default='',
+        help_text='Ingest run still writing this chunk (empty once the chunk is live)'
+    )
     
     # Content
     content = models.TextField(help_text='Actual chunk text content')
@@ -43,11 +67,16 @@ class DocumentChunk(models.Model):
     )
     char_count = models.IntegerField(default=0)
     word_count = models.IntegerField(default=0)
-    token_count = models.IntegerField(default=0, help_text='Approximate token count')
+    token_count = models.IntegerField(default=0, help_text='Token count (cl100k_base)')
+    metadata = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text='Structure of the chunk, e.g. {"type": "table", "sheet", "row_start", "row_end"}'
+    )
     
     # Vector embeddings (pgvector)
     embedding = VectorField(
-        dimensions=3072,  # OpenAI text-embedding-3-large (3072 dimensions)
+        dimensions=EMBEDDING_DIMENSIONS,
         blank=True,
         null=True,
         help_text='Semantic embedding vector'
@@ -61,7 +90,7 @@ class DocumentChunk(models.Model):
     bm25_tokens = models.JSONField(
         default=dict,
         blank=True,
-        help_text='Token frequencies for BM25: {token_id: frequency}'
+        help_text='Token frequencies for BM25: {token: frequency}'
     )
     
     # Timestamps
@@ -85,6 +114,9 @@ class DocumentChunk(models.Model):
     esrs_categories = models.JSONField(default=list, blank=True, help_text='[E1, E2, S1, etc]')
     language = models.CharField(max_length=10, default='en')
     
+    objects = LiveChunkManager()
+    all_objects = models.Manager()
+    
     class Meta:
         db_table = 'document_chunks'
         ordering = ['document', 'chunk_index']
@@ -93,6 +125,7 @@ class DocumentChunk(models.Model):
             models.Index(fields=['document_type']),
             models.Index(fields=['date_range']),
             GinIndex(fields=['esrs_categories'], name='esrs_cat_gin_idx'),
+            GinIndex(fields=['bm25_tokens'], name='bm25_tokens_gin_idx'),
         ]
     
     def __str__(self):
@@ -110,11 +143,152 @@ class DocumentChunk(models.Model):
         if self.content:
             self.char_count = len(self.content)
             self.word_count = len(self.content.split())
-            self.token_count = len(self.content) // 4  # Rough estimate
+            if not self.token_count:
+                from accounts.tokenization import count_tokens
+                self.token_count = count_tokens(self.content)
+            
+            if not self.bm25_tokens:
+                from accounts.bm25_index import term_frequencies
+                self.bm25_tokens = term_frequencies(self.content)
         
         super().save(*args, **kwargs)
 
 
+class ChunkEmbedding(models.Model):
+    """
+    Chunk vectors per embedding model
+    Retrieval reads the serving model's rows (see accounts.embedding_store); each
+    model gets a partial HNSW index over a halfvec cast of its dimensions
+    """
+    chunk = models.ForeignKey(
+        DocumentChunk,
+        on_delete=models.CASCADE,
+        related_name='model_embeddings'
+    )
+    provider = models.CharField(max_length=50)
+    model_id = models.CharField(max_length=200)
+    
+    # No fixed dimensions - one row per embedding model
+    embedding = VectorField()
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'chunk_embeddings'
+        unique_together = [['chunk', 'provider', 'model_id']]
+        indexes = [
+            models.Index(fields=['provider', 'model_id', 'chunk'], name='chunk_emb_model_chunk_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.chunk_id} - {self.provider}/{self.model_id}"
+
+
+class DisclosureQueryEmbedding(models.Model):
+    """
+    Precomputed retrieval query embeddings for the static disclosure catalog
+    Keyed by (provider, model, sha256 of the query text) so edits to a
+    disclosure produce a new row instead of a stale hit
+    """
+    disclosure = models.ForeignKey(
+        'ESRSDisclosure',
+        on_delete=models.CASCADE,
+        related_name='query_embeddings'
+    )
+    provider = models.CharField(max_length=50)
+    model_id = models.CharField(max_length=200)
+    content_hash = models.CharField(max_length=64, help_text='sha256 of the query text')
+    query_text = models.TextField()
+    
+    # No fixed dimensions - one row per embedding model
+    embedding = VectorField()
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'disclosure_query_embeddings'
+        unique_together = [['provider', 'model_id', 'content_hash']]
+        indexes = [
+            models.Index(fields=['disclosure', 'provider', 'model_id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.disclosure_id} - {self.provider}/{self.model_id}"
+
+
+class DisclosureRelevance(models.Model):
+    """
+    Ingest-time retrieval candidates: one row per top-k chunk of a document per disclosure
+    A document's rows are replaced whenever it finishes RAG processing and go
+    away with its chunks, so AI answer tasks read their candidate set with one
+    index range scan instead of scanning the whole corpus
+    """
+    user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='disclosure_relevance')
+    disclosure = models.ForeignKey(
+        'ESRSDisclosure',
+        on_delete=models.CASCADE,
+        related_name='relevance'
+    )
+    document = models.ForeignKey('Document', on_delete=models.CASCADE, related_name='disclosure_relevance')
+    chunk = models.ForeignKey(DocumentChunk, on_delete=models.CASCADE, related_name='disclosure_relevance')
+    score = models.FloatField(help_text='Cosine similarity of the chunk to the disclosure query')
+    embedding_model = models.CharField(max_length=250, help_text='provider/model the score was computed with')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'disclosure_relevance'
+        unique_together = [['disclosure', 'chunk']]
+        indexes = [
+            models.Index(fields=['user', 'disclosure', '-score'], name='disclosure_rel_score_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.disclosure_id} - chunk {self.chunk_id} ({self.score:.3f})"
+
+
+class EmbeddingCache(models.Model):
+    """
+    Content-addressed chunk embeddings
+    Keyed by (provider, model, sha256 of the contextualized chunk text) so
+    re-uploads and reprocessing of unchanged text skip the embedding API
+    """
+    provider = models.CharField(max_length=50)
+    model_id = models.CharField(max_length=200)
+    content_hash = models.CharField(max_length=64, help_text='sha256 of the embedded text')
+    
+    # No fixed dimensions - one row per embedding model
+    embedding = VectorField()
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'embedding_cache'
+        unique_together = [['provider', 'model_id', 'content_hash']]
+    
+    def __str__(self):
+        return f"{self.provider}/{self.model_id} - {self.content_hash[:12]}"
+
+
+class ChunkContextCache(models.Model):
+    """
+    LLM-generated chunk contexts keyed by (sha256 of document text, sha256 of chunk text)
+    The context depends on the whole document, so both hashes are part of the key
+    """
+    document_hash = models.CharField(max_length=64)
+    chunk_hash = models.CharField(max_length=64)
+    context = models.TextField()
+    generator = models.CharField(max_length=100, blank=True, help_text='Model that generated the context')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'chunk_context_cache'
+        unique_together = [['document_hash', 'chunk_hash']]
+    
+    def __str__(self):
+        return f"{self.document_hash[:12]} - {self.chunk_hash[:12]}"
+
+
 class SearchQuery(models.Model):
     """
     Track search queries for RAG evaluation
@@ -230,6 +404,10 @@ class EmbeddingModel(models.Model):
     
     is_active = models.BooleanField(default=True)
     is_default = models.BooleanField(default=False)
+    is_serving = models.BooleanField(
+        default=False,
+        help_text='Retrieval reads this model\'s vectors; moves to the default model once it is fully backfilled'
+    )
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
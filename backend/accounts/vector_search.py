@@ -0,0 +1,154 @@
+"""
+pgvector-backed candidate search for RAG retrieval
+First stage of hybrid search: Postgres returns only the nearest chunks,
+so full vectors never leave the database. Vectors come from chunk_embeddings
+for the serving embedding model (see accounts.embedding_store)
+
+Large models are searched in two steps: an HNSW scan over a compact shadow
+vector (256-d Matryoshka prefix or binary-quantized bits) picks a shortlist,
+which is then rescored exactly against the full vectors
+"""
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Func, Value
+from django.db.models.functions import Cast
+from pgvector import Bit, HalfVector
+from pgvector.django import BitField, CosineDistance, HalfVectorField, HammingDistance, VectorField
+
+from accounts.embedding_store import (
+    MAX_INDEX_DIMENSIONS, SHADOW_DIMENSIONS, embeddings_for, model_dimensions, serving_model, shadow_kind,
+)
+from accounts.esrs_classifier import TopicPrefilter
+
+logger = logging.getLogger(__name__)
+
+# Number of nearest chunks returned by the ANN stage per query
+ANN_CANDIDATES = 100
+
+# HNSW search breadth - must be >= LIMIT for good recall (pgvector caps it at 1000)
+HNSW_EF_SEARCH = 200
+HNSW_EF_SEARCH_MAX = 1000
+
+
+def _halfvec_embedding(dimensions: int):
+    """Expression matching the per-model partial HNSW index (embedding_store.ensure_model_index)"""
+    return Cast('embedding', output_field=HalfVectorField(dimensions=dimensions))
+
+
+def _shadow_distance(kind: str, query_embedding: List[float], dimensions: int):
+    """
+    Distance over the shadow vector - expressions must match embedding_store.ensure_model_index
+    """
+    if kind == 'matryoshka':
+        prefix = Func(F('embedding'), Value(1), Value(SHADOW_DIMENSIONS), function='subvector', output_field=VectorField())
+        return CosineDistance(
+            Cast(prefix, output_field=HalfVectorField(dimensions=SHADOW_DIMENSIONS)),
+            HalfVector(query_embedding[:SHADOW_DIMENSIONS])
+        )
+
+    bits = Func(F('embedding'), function='binary_quantize', output_field=BitField())
+    query_bits = Bit(np.asarray(query_embedding) > 0).to_text()
+    return HammingDistance(
+        Cast(bits, output_field=BitField(length=dimensions)),
+        Cast(Value(query_bits), output_field=BitField(length=dimensions))
+    )
+
+
+def ann_candidate_ids(
+    query_embedding: List[float],
+    document_ids: List[int],
+    limit: int = ANN_CANDIDATES,
+    prefilter: Optional[TopicPrefilter] = None,
+    model: Optional[Tuple[str, str]] = None
+) -> List[int]:
+    """
+    Approximate nearest neighbour search over chunk embeddings
+
+    Runs ORDER BY embedding::halfvec <=> query LIMIT k over one model's vectors,
+    filtered by document_id. Models with a shadow vector first take the
+    RAG_SHADOW_CANDIDATES nearest by the shadow index, then order those by
+    exact distance on the full vectors. Uses iterative HNSW scans so the
+    document filter does not starve the result set.
+
+    Args:
+        query_embedding: Query vector (same model as the searched vectors)
+        document_ids: Documents to search in
+        limit: Number of candidates to return
+        prefilter: Only the chunks a topic prefilter keeps
+        model: (provider, model) to search - defaults to the serving model
+
+    Returns:
+        Chunk IDs ordered by ascending cosine distance
+    """
+    if not query_embedding or not document_ids:
+        return []
+
+    provider, model_id = model or serving_model()
+    queryset = embeddings_for(provider, model_id).filter(chunk__document_id__in=document_ids)
+    if prefilter:
+        queryset = queryset.filter(prefilter.condition(prefix='chunk__'))
+
+    dimensions = model_dimensions(provider, model_id)
+    kind = shadow_kind(provider, model_id)
+    search_breadth = limit
+
+    if kind:
+        shortlist_size = max(settings.RAG_SHADOW_CANDIDATES, limit)
+        shortlist = queryset.annotate(
+            shadow_distance=_shadow_distance(kind, query_embedding, dimensions)
+        ).order_by('shadow_distance').values('id')[:shortlist_size]
+        queryset = embeddings_for(provider, model_id).filter(id__in=shortlist)
+        distance = CosineDistance('embedding', query_embedding)
+        search_breadth = shortlist_size
+    elif dimensions <= MAX_INDEX_DIMENSIONS:
+        distance = CosineDistance(_halfvec_embedding(dimensions), HalfVector(query_embedding))
+    else:
+        distance = CosineDistance('embedding', query_embedding)
+
+    queryset = queryset.annotate(distance=distance).order_by('distance').values_list('chunk_id', flat=True)[:limit]
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL hnsw.ef_search = %s", [min(max(HNSW_EF_SEARCH, search_breadth), HNSW_EF_SEARCH_MAX)])
+            cursor.execute("SET LOCAL hnsw.iterative_scan = relaxed_order")
+        return list(queryset)
+
+
+def cosine_similarities(
+    query_embeddings: List[List[float]],
+    chunk_ids: List[int],
+    model: Optional[Tuple[str, str]] = None
+) -> Dict[int, List[float]]:
+    """
+    Exact cosine similarity of selected chunks against several queries
+
+    Computed in Postgres on the full-precision vectors, one row per chunk.
+
+    Returns:
+        {chunk_id: [similarity per query, in query order]}
+    """
+    if not chunk_ids or not query_embeddings:
+        return {}
+
+    provider, model_id = model or serving_model()
+    annotations = {
+        f'distance_{i}': CosineDistance('embedding', embedding)
+        for i, embedding in enumerate(query_embeddings)
+    }
+
+    rows = embeddings_for(provider, model_id).filter(
+        chunk_id__in=chunk_ids
+    ).annotate(**annotations).values('chunk_id', *annotations.keys())
+
+    similarities = {}
+    for row in rows:
+        similarities[row['chunk_id']] = [
+            1.0 - row[f'distance_{i}'] for i in range(len(query_embeddings))
+        ]
+
+    return similarities
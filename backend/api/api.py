@@ -13,7 +13,7 @@ from accounts.schemas import (
     StartConversationSchema, SendMessageSchema, SelectVersionSchema, ToggleChartSelectionSchema,
     StandardTypeSchema, CategoryWithProgressSchema, UpdateChartSchema, UpdateTableSchema,
     ChartSelectionResponseSchema, WebsiteUrlSchema, AssignDisclosureSchema, UpdateRAGSettingsSchema,
-    BulkAIAnswerSchema
+    BulkAIAnswerSchema, DocumentUploadInitSchema, DocumentUploadStatusSchema
 )
 from django.contrib.auth import get_user_model, authenticate
 from django.contrib.auth.hashers import make_password
@@ -22,6 +22,7 @@ from accounts.tasks import send_welcome_email
 from accounts.team_models import ActivityLog
 from datetime import datetime
 from typing import Optional
+from uuid import UUID
 import logging
 
 logger = logging.getLogger(__name__)
@@ -373,12 +374,10 @@ async def complete_wizard(request):
 
 @api.post("/documents/upload", auth=JWTAuth())
 async def upload_document(request):
-    """Naloži dokument in izvleči tekst za AI"""
+    """Naloži dokument - tekst za AI se izvleče v ozadju (process_document_with_rag)"""
     from django.core.files.storage import default_storage
-    from django.core.files.base import ContentFile
     from accounts.models import Document
-    from accounts.document_parser import parse_document, is_supported_format, get_supported_formats_message
-    from django.conf import settings
+    from accounts.document_parser import is_supported_format, get_supported_formats_message
     import os
 
     if not request.FILES.get('file'):
@@ -402,38 +401,10 @@ async def upload_document(request):
         user_folder = f"documents/user_{user.id}"
         os.makedirs(os.path.join('media', user_folder), exist_ok=True)
         
-        # Shrani original datoteko
+        # Shrani original datoteko - storage copies the upload in chunks (large uploads are
+        # already spooled to a temp file), text extraction runs in the RAG task
         file_path = f"{user_folder}/{file.name}"
-        saved_path = default_storage.save(file_path, ContentFile(file.read()))
-        full_file_path = os.path.join(settings.MEDIA_ROOT, saved_path)
-        
-        # Extract text content for AI
-        try:
-            extracted_text, format_info = await sync_to_async(parse_document)(
-                full_file_path,
-                file.name
-            )
-            
-            # Save extracted text as .txt file for AI to use
-            text_file_name = f"{file.name}.extracted.txt"
-            text_file_path = f"{user_folder}/{text_file_name}"
-            text_saved_path = default_storage.save(
-                text_file_path,
-                ContentFile(extracted_text.encode('utf-8'))
-            )
-            
-            logger.info(f'Document parsed successfully: {file.name} ({format_info})')
-            
-        except ValueError as e:
-            # Unsupported format
-            default_storage.delete(saved_path)
-            return JsonResponse({"message": str(e), "success": False}, status=400)
-        
-        except Exception as e:
-            # Parsing failed but keep original file
-            logger.error(f'Document parsing failed for {file.name}: {str(e)}')
-            extracted_text = None
-            text_saved_path = None
+        saved_path = await sync_to_async(default_storage.save)(file_path, file)
         
         # Check if this is a wizard upload (has company_type) - make documents global
         company_type = request.POST.get('company_type', '')
@@ -466,10 +437,10 @@ async def upload_document(request):
         logger.info(f'Started RAG processing for document {document.id} (task: {task.id})')
         
         return {
-            "message": "File uploaded successfully" + (" and text extracted for AI" if extracted_text else ""),
+            "message": "File uploaded successfully, text extraction and indexing started",
             "file_id": document.id,
             "file_name": document.file_name,
-            "text_extracted": extracted_text is not None,
+            "text_extracted": False,
             "rag_task_id": task.id
         }
     
@@ -480,6 +451,105 @@ async def upload_document(request):
             "success": False
         }, status=500)
 
+def _upload_status(upload):
+    from accounts.chunked_upload import UPLOAD_PART_SIZE
+    return {
+        "upload_id": str(upload.upload_id),
+        "file_name": upload.file_name,
+        "file_size": upload.file_size,
+        "received_bytes": upload.received_bytes,
+        "part_size": UPLOAD_PART_SIZE,
+        "status": upload.status,
+    }
+
+
+@api.post("/documents/uploads/init", response=DocumentUploadStatusSchema, auth=JWTAuth())
+async def init_document_upload(request, data: DocumentUploadInitSchema):
+    """Start a resumable upload - send parts with PUT .../parts?offset=N, then POST .../complete"""
+    from accounts.chunked_upload import init_upload
+
+    # Same default as upload_document: wizard uploads are global
+    is_global = data.is_global if data.is_global is not None else bool(data.company_type)
+    try:
+        upload = await sync_to_async(init_upload)(
+            request.auth, data.file_name, data.file_size, data.sha256, data.file_type, is_global
+        )
+    except ValueError as e:
+        return JsonResponse({"message": str(e), "success": False}, status=400)
+
+    logger.info(f"Resumable upload {upload.upload_id} started: {upload.file_name} ({upload.file_size} bytes) by user {request.auth.id}")
+    return _upload_status(upload)
+
+
+@api.get("/documents/uploads/{upload_id}", response=DocumentUploadStatusSchema, auth=JWTAuth())
+async def get_document_upload(request, upload_id: UUID):
+    """Upload progress - received_bytes is the offset to resume from"""
+    from accounts.models import DocumentUpload
+
+    upload = await sync_to_async(DocumentUpload.objects.filter(upload_id=upload_id, user=request.auth).first)()
+    if upload is None:
+        return JsonResponse({"message": "Upload not found"}, status=404)
+    return _upload_status(upload)
+
+
+@api.put("/documents/uploads/{upload_id}/parts", auth=JWTAuth())
+async def upload_document_part(request, upload_id: UUID, offset: int, sha256: str = None):
+    """Append the raw request body at offset (optional sha256 of the part is verified)"""
+    from accounts.chunked_upload import UploadOffsetMismatch, append_part
+    from accounts.models import DocumentUpload
+
+    try:
+        received = await sync_to_async(append_part)(upload_id, request.auth, offset, request, sha256)
+    except DocumentUpload.DoesNotExist:
+        return JsonResponse({"message": "Upload not found or already finished"}, status=404)
+    except UploadOffsetMismatch as e:
+        return JsonResponse({"message": str(e), "received_bytes": e.received_bytes, "success": False}, status=409)
+    except ValueError as e:
+        return JsonResponse({"message": str(e), "received_bytes": offset, "success": False}, status=400)
+
+    return {"received_bytes": received, "success": True}
+
+
+@api.post("/documents/uploads/{upload_id}/complete", auth=JWTAuth())
+async def complete_document_upload(request, upload_id: UUID):
+    """Verify checksum, create the Document and start RAG processing"""
+    from accounts.chunked_upload import complete_upload
+    from accounts.models import DocumentUpload
+
+    try:
+        document = await sync_to_async(complete_upload)(upload_id, request.auth)
+    except DocumentUpload.DoesNotExist:
+        return JsonResponse({"message": "Upload not found or already finished"}, status=404)
+    except ValueError as e:
+        return JsonResponse({"message": str(e), "success": False}, status=400)
+
+    logger.info(f'Document {document.id} saved to database from resumable upload {upload_id}: {document.file_name}')
+
+    # Start RAG processing in background (chunking + embeddings)
+    from accounts.document_rag_tasks import process_document_with_rag
+    task = process_document_with_rag.delay(document.id)
+    logger.info(f'Started RAG processing for document {document.id} (task: {task.id})')
+
+    return {
+        "message": "File uploaded successfully, text extraction and indexing started",
+        "file_id": document.id,
+        "file_name": document.file_name,
+        "rag_task_id": task.id
+    }
+
+
+@api.delete("/documents/uploads/{upload_id}", response=MessageSchema, auth=JWTAuth())
+async def abort_document_upload(request, upload_id: UUID):
+    from accounts.chunked_upload import abort_upload
+    from accounts.models import DocumentUpload
+
+    try:
+        await sync_to_async(abort_upload)(upload_id, request.auth)
+    except DocumentUpload.DoesNotExist:
+        return JsonResponse({"message": "Upload not found or already finished"}, status=404)
+    return {"message": "Upload aborted", "success": True}
+
+
 @api.get("/documents/list", auth=JWTAuth())
 async def list_documents(request):
     """Pridobi seznam dokumentov z usage info"""
@@ -605,6 +675,11 @@ async def delete_document(request, document_id: int):
         if document.file_path and default_storage.exists(document.file_path):
             await sync_to_async(default_storage.delete)(document.file_path)
             logger.debug(f"Deleted file from storage: {document.file_path}")
+        
+        # Extracted text artifact
+        from accounts.document_rag_tasks import extracted_text_path
+        if default_storage.exists(extracted_text_path(document.id)):
+            await sync_to_async(default_storage.delete)(extracted_text_path(document.id))
 
         # Izbriši database zapis
         await sync_to_async(document.delete)()
@@ -2688,7 +2763,7 @@ async def get_embedding_models_list(request):
                 'id', 'name', 'provider', 'model_id', 'dimensions',
                 'cost_per_1m_tokens', 'avg_hit_rate', 'avg_mrr',
                 'avg_retrieval_time_ms', 'total_queries',
-                'is_active', 'is_default', 'created_at'
+                'is_active', 'is_default', 'is_serving', 'created_at'
             ).order_by('-is_default', '-is_active', 'provider'))
         )()
         
@@ -2703,12 +2778,14 @@ async def get_embedding_models_list(request):
 async def toggle_embedding_model_active(request, model_id: int):
     """Toggle embedding model active status - admin only"""
     from accounts.vector_models import EmbeddingModel
+    from accounts.embedding_service import invalidate_default_embedding_model
     
     
     try:
         model = await sync_to_async(EmbeddingModel.objects.get)(id=model_id)
         model.is_active = not model.is_active
         await sync_to_async(model.save)()
+        await sync_to_async(invalidate_default_embedding_model)()
         
         return {"success": True, "model_id": model_id, "is_active": model.is_active}
     
@@ -2721,8 +2798,15 @@ async def toggle_embedding_model_active(request, model_id: int):
 
 @api.post("/admin/rag/embedding-models/{model_id}/set-default", auth=AdminAuth())
 async def set_default_embedding_model_api(request, model_id: int):
-    """Set embedding model as default - admin only"""
+    """
+    Set embedding model as default - admin only
+    New documents are embedded with it right away; retrieval keeps using the
+    serving model until a background job has re-embedded every chunk
+    """
     from accounts.vector_models import EmbeddingModel
+    from accounts.embedding_service import invalidate_default_embedding_model
+    from accounts.embedding_store import serving_model
+    from accounts.document_rag_tasks import reembed_chunks_task
     
     
     try:
@@ -2734,8 +2818,13 @@ async def set_default_embedding_model_api(request, model_id: int):
         model.is_default = True
         model.is_active = True
         await sync_to_async(model.save)()
+        await sync_to_async(invalidate_default_embedding_model)()
+        
+        reembedding = (model.provider, model.model_id) != await sync_to_async(serving_model)()
+        if reembedding:
+            reembed_chunks_task.delay(model.provider, model.model_id)
         
-        return {"success": True, "model_id": model_id, "model_name": model.name}
+        return {"success": True, "model_id": model_id, "model_name": model.name, "reembedding": reembedding}
     
     except EmbeddingModel.DoesNotExist:
         return JsonResponse({"message": "Model not found"}, status=404)
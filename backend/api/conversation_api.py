@@ -13,7 +13,7 @@ from accounts.models import (
 from accounts.vector_models import DocumentChunk
 from accounts.openai_service import OpenAIService
 from accounts.token_tracking import track_openai_usage
-from accounts.rag_tier_engine import run_tier3_refinement
+from accounts.rag_tier_engine import expand_with_neighbors, run_tier3_refinement
 from .api import JWTAuth, MessageSchema
 from .team_api import get_organization_owner
 
@@ -152,9 +152,6 @@ async def send_message(request, thread_id: int, data: SendMessageSchema):
             
             # TIER 2: Multi-Query - Generate query variations (if enabled)
             if tier2_enabled:
-                from accounts.embedding_service import EmbeddingService
-                from rank_bm25 import BM25Okapi
-                
                 processing_steps.append({
                     "step": "multi_query",
                     "status": "in_progress",
@@ -207,15 +204,20 @@ Return only the questions, one per line, without numbering or explanations."""
                 logger.info(f"TIER 2 disabled - using single query only")
             
             # Get all chunks from user documents
-            if tier1_enabled or tier2_enabled:
-                from accounts.embedding_service import EmbeddingService
-                from rank_bm25 import BM25Okapi
+            from accounts.embedding_store import serving_embedding_service
+            from accounts.vector_models import LEGACY_VECTOR_FIELDS
+            from accounts.bm25_index import BM25Index
+            from accounts.hybrid_scoring import ChunkEmbeddingMatrix
+            from accounts.rag_engine import HybridRAGEngine
             
-            all_chunks = await sync_to_async(
-                lambda: list(DocumentChunk.objects.filter(
-                    document_id__in=doc_ids
-                ).select_related('document').order_by('document_id', 'chunk_index'))
-            )()
+            # Memory-mapped embedding snapshot - when fresh, vectors are not loaded from Postgres
+            snapshot = await sync_to_async(HybridRAGEngine.open_fresh)(user.id, doc_ids)
+            
+            def load_chunks():
+                chunks = DocumentChunk.objects.filter(document_id__in=doc_ids).defer(*LEGACY_VECTOR_FIELDS)
+                return list(chunks.select_related('document').order_by('document_id', 'chunk_index'))
+            
+            all_chunks = await sync_to_async(load_chunks)()
             
             logger.info(f"Found {len(all_chunks)} total chunks from {len(doc_ids)} documents")
             print(f"DEBUG: Found {len(all_chunks)} total chunks from {len(doc_ids)} documents")
@@ -246,76 +248,38 @@ Return only the questions, one per line, without numbering or explanations."""
                     })
                     logger.info(f"TIER 1 disabled - using pure semantic search")
                 
-                all_scored_chunks = []  # Collect scores from all queries
-                embedding_service = EmbeddingService()
+                embedding_service = await sync_to_async(serving_embedding_service)()
                 
-                for query_idx, query in enumerate(query_variations):
-                    logger.info(f"Processing query {query_idx + 1}/{len(query_variations)}: {query}")
-                    
-                    if tier1_enabled:
-                        # 1. BM25 Keyword Search
-                        chunk_texts = [chunk.content for chunk in all_chunks]
-                        tokenized_corpus = [text.lower().split() for text in chunk_texts]
-                        bm25 = BM25Okapi(tokenized_corpus)
-                        tokenized_query = query.lower().split()
-                        bm25_scores = bm25.get_scores(tokenized_query)
-                        
-                        # Normalize BM25 scores to 0-1 range
-                    max_bm25 = max(bm25_scores) if max(bm25_scores) > 0 else 1
-                    bm25_scores_norm = [score / max_bm25 for score in bm25_scores]
-                    
-                    # 2. Semantic Embedding Search
-                    query_embedding = await sync_to_async(
-                        lambda q=query: embedding_service.embed_text(q)
+                # 1. BM25 Keyword Search - one postings lookup for all query variations
+                bm25_batch_scores = None
+                if tier1_enabled:
+                    bm25_stats = snapshot.bm25_stats(doc_ids) if snapshot else None
+                    bm25_batch_scores = await sync_to_async(
+                        lambda: BM25Index(doc_ids, corpus_stats=bm25_stats).get_batch_scores(query_variations)
                     )()
-                    
-                    semantic_scores = []
-                    if query_embedding:
-                        for chunk in all_chunks:
-                            if chunk.embedding is not None:
-                                similarity = embedding_service.cosine_similarity(query_embedding, chunk.embedding)
-                                semantic_scores.append(similarity)
-                            else:
-                                semantic_scores.append(0.0)
-                    else:
-                        semantic_scores = [0.0] * len(all_chunks)
-                    
-                    # 3. Hybrid Score or Pure Semantic
-                    if tier1_enabled:
-                        # Hybrid: 60% semantic + 40% BM25
-                        for i in range(len(all_chunks)):
-                            hybrid_score = (0.6 * semantic_scores[i]) + (0.4 * bm25_scores_norm[i])
-                            all_scored_chunks.append((all_chunks[i], hybrid_score, semantic_scores[i], bm25_scores_norm[i]))
-                    else:
-                        # Pure semantic
-                        for i in range(len(all_chunks)):
-                            all_scored_chunks.append((all_chunks[i], semantic_scores[i], semantic_scores[i], 0.0))
                 
-                # Deduplicate and average scores for chunks that appear multiple times
-                chunk_score_map = {}
-                for chunk, hybrid, semantic, bm25 in all_scored_chunks:
-                    if chunk.id not in chunk_score_map:
-                        chunk_score_map[chunk.id] = {
-                            'chunk': chunk,
-                            'hybrid_scores': [],
-                            'semantic_scores': [],
-                            'bm25_scores': []
-                        }
-                    chunk_score_map[chunk.id]['hybrid_scores'].append(hybrid)
-                    chunk_score_map[chunk.id]['semantic_scores'].append(semantic)
-                    chunk_score_map[chunk.id]['bm25_scores'].append(bm25)
+                # 2. Semantic Embedding Search - all query variations in one embedding request
+                logger.info(f"Embedding {len(query_variations)} queries: {query_variations}")
+                query_embeddings = await sync_to_async(
+                    lambda: embedding_service.embed_queries(query_variations)
+                )()
                 
-                # Average scores for each chunk
-                averaged_chunks = []
-                for chunk_id, data in chunk_score_map.items():
-                    avg_hybrid = sum(data['hybrid_scores']) / len(data['hybrid_scores'])
-                    avg_semantic = sum(data['semantic_scores']) / len(data['semantic_scores'])
-                    avg_bm25 = sum(data['bm25_scores']) / len(data['bm25_scores'])
-                    averaged_chunks.append((data['chunk'], avg_hybrid, avg_semantic, avg_bm25))
+                # 3. Hybrid Score (60% semantic + 40% BM25) or Pure Semantic, averaged over all queries
+                if snapshot:
+                    scored_ids, fused = snapshot.score(query_embeddings, doc_ids, bm25_batch_scores)
+                    chunk_by_id = {chunk.id: chunk for chunk in all_chunks}
+                    scored_chunks = [chunk_by_id.get(int(chunk_id)) for chunk_id in scored_ids]
+                else:
+                    chunk_matrix = await sync_to_async(ChunkEmbeddingMatrix.from_chunks)(all_chunks)
+                    fused = chunk_matrix.score(query_embeddings, bm25_batch_scores)
+                    scored_chunks = all_chunks
                 
-                # Sort by hybrid score and take top 10
-                averaged_chunks.sort(key=lambda x: x[1], reverse=True)
-                top_chunks = averaged_chunks[:10]
+                # Take top 10
+                top_chunks = [
+                    (scored_chunks[idx], float(fused.hybrid[idx]), float(fused.semantic[idx]), float(fused.bm25[idx]))
+                    for idx in fused.top_k(10)
+                    if scored_chunks[idx] is not None
+                ]
                 
                 # Calculate average confidence of top chunks
                 avg_confidence = sum(score[1] for score in top_chunks) / len(top_chunks) if top_chunks else 0
@@ -336,31 +300,8 @@ Return only the questions, one per line, without numbering or explanations."""
                     })
                     logger.info(f"TIER 2 expansion triggered - confidence {avg_confidence:.2%} < threshold {tier2_threshold}")
                     
-                    # Convert to format with chunk_type
-                    expanded_chunks = []
-                    chunk_lookup = {chunk.id: chunk for chunk in all_chunks}
-                    
-                    for chunk, hybrid_score, semantic_score, bm25_score in top_chunks:
-                        # Add the main chunk
-                        expanded_chunks.append((chunk, hybrid_score, semantic_score, bm25_score, 'main'))
-                        
-                        # Find neighbors (same document, adjacent chunk_index)
-                        neighbors = await sync_to_async(
-                            lambda c=chunk: list(DocumentChunk.objects.filter(
-                                document_id=c.document_id,
-                                chunk_index__in=[c.chunk_index - 1, c.chunk_index + 1]
-                            ))
-                        )()
-                        
-                        for neighbor in neighbors:
-                            # Add neighbor with slightly reduced score
-                            expanded_chunks.append((
-                                neighbor,
-                                hybrid_score * 0.7,  # Reduced confidence for neighbors
-                                semantic_score * 0.7,
-                                bm25_score * 0.7,
-                                'neighbor'
-                            ))
+                    # Neighbours resolved from the chunks already loaded - no per-chunk queries
+                    expanded_chunks = await sync_to_async(expand_with_neighbors)(top_chunks, all_chunks)
                     
                     logger.info(f"Expanded to {len(expanded_chunks)} chunks (including neighbors)")
                     
@@ -502,8 +443,6 @@ Provide factual, document-based responses only."""
                 "message": "Starting TIER 3: LLM Self-Reflection..."
             })
             
-            from accounts.rag_tier_engine import run_tier3_refinement
-            
             # Run TIER 3 refinement
             refined_answer, new_confidence, processing_steps = await sync_to_async(
                 lambda: run_tier3_refinement(
@@ -668,15 +607,20 @@ async def regenerate_message(request, message_id: int, data: RegenerateMessageSc
         avg_confidence = 0
         
         if doc_ids:
-            from accounts.embedding_service import EmbeddingService
-            from rank_bm25 import BM25Okapi
+            from accounts.embedding_store import serving_embedding_service
+            from accounts.vector_models import LEGACY_VECTOR_FIELDS
+            from accounts.bm25_index import BM25Index
+            from accounts.hybrid_scoring import ChunkEmbeddingMatrix
+            from accounts.rag_engine import HybridRAGEngine
             
-            # Get all chunks
-            all_chunks = await sync_to_async(
-                lambda: list(DocumentChunk.objects.filter(
-                    document_id__in=doc_ids
-                ).select_related('document'))
-            )()
+            snapshot = await sync_to_async(HybridRAGEngine.open_fresh)(thread.user_id, doc_ids)
+            
+            # Get all chunks (vectors are scored from the snapshot or chunk_embeddings)
+            def load_chunks():
+                chunks = DocumentChunk.objects.filter(document_id__in=doc_ids).defer(*LEGACY_VECTOR_FIELDS)
+                return list(chunks.select_related('document'))
+            
+            all_chunks = await sync_to_async(load_chunks)()
             
             # Build document lookup to avoid lazy loading in async context
             doc_lookup = {}
@@ -691,39 +635,31 @@ async def regenerate_message(request, message_id: int, data: RegenerateMessageSc
                 user_message = user_msg.get('content', '')
                 
                 # BM25 search
-                chunk_texts = [chunk.content for chunk in all_chunks]
-                tokenized_corpus = [text.lower().split() for text in chunk_texts]
-                bm25 = BM25Okapi(tokenized_corpus)
-                tokenized_query = user_message.lower().split()
-                bm25_scores = bm25.get_scores(tokenized_query)
-                max_bm25 = max(bm25_scores) if max(bm25_scores) > 0 else 1
-                bm25_scores_norm = [score / max_bm25 for score in bm25_scores]
+                bm25_stats = snapshot.bm25_stats(doc_ids) if snapshot else None
+                bm25_scores = await sync_to_async(
+                    lambda: BM25Index(doc_ids, corpus_stats=bm25_stats).get_scores(user_message)
+                )()
                 
                 # Semantic search
-                embedding_service = EmbeddingService()
+                embedding_service = await sync_to_async(serving_embedding_service)()
                 query_embedding = await sync_to_async(
                     lambda: embedding_service.embed_text(user_message)
                 )()
                 
-                semantic_scores = []
-                if query_embedding:
-                    for chunk in all_chunks:
-                        if chunk.embedding is not None:
-                            similarity = embedding_service.cosine_similarity(query_embedding, chunk.embedding)
-                            semantic_scores.append(similarity)
-                        else:
-                            semantic_scores.append(0.0)
-                else:
-                    semantic_scores = [0.0] * len(all_chunks)
-                
                 # Hybrid scoring
-                hybrid_scores = []
-                for i in range(len(all_chunks)):
-                    hybrid_score = (0.6 * semantic_scores[i]) + (0.4 * bm25_scores_norm[i])
-                    hybrid_scores.append((all_chunks[i], hybrid_score, semantic_scores[i], bm25_scores_norm[i]))
-                
-                hybrid_scores.sort(key=lambda x: x[1], reverse=True)
-                top_chunks = hybrid_scores[:10]
+                if snapshot:
+                    scored_ids, fused = snapshot.score([query_embedding], doc_ids, [bm25_scores])
+                    chunk_by_id = {chunk.id: chunk for chunk in all_chunks}
+                    scored_chunks = [chunk_by_id.get(int(chunk_id)) for chunk_id in scored_ids]
+                else:
+                    chunk_matrix = await sync_to_async(ChunkEmbeddingMatrix.from_chunks)(all_chunks)
+                    fused = chunk_matrix.score([query_embedding], [bm25_scores])
+                    scored_chunks = all_chunks
+                top_chunks = [
+                    (scored_chunks[idx], float(fused.hybrid[idx]), float(fused.semantic[idx]), float(fused.bm25[idx]))
+                    for idx in fused.top_k(10)
+                    if scored_chunks[idx] is not None
+                ]
                 avg_confidence = sum(score[1] for score in top_chunks) / len(top_chunks) if top_chunks else 0
                 
                 seen_docs = set()
@@ -1,3 +1,82 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import numpy as np
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.auth import create_access_token
+from accounts.hybrid_scoring import ChunkEmbeddingMatrix
+from accounts.models import (
+    ConversationThread, Document, ESRSCategory, ESRSDisclosure, ESRSStandard, User
+)
+from accounts.vector_models import DocumentChunk
+
+
+def _completion(content):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5)
+    )
+
+
+class SendMessageTier2Tests(TestCase):
+    """send_message with TIER 2 multi-query and neighbour expansion"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='tier2', email='tier2@example.com', password='x',
+            rag_tier1_enabled=False, rag_tier2_enabled=True, rag_tier3_enabled=False
+        )
+        category = ESRSCategory.objects.create(name='Environmental', code='E')
+        standard = ESRSStandard.objects.create(category=category, code='E1', name='Climate change', description='')
+        disclosure = ESRSDisclosure.objects.create(
+            standard=standard, code='E1-6', name='GHG emissions', description='', requirement_text=''
+        )
+        self.thread = ConversationThread.objects.create(user=self.user, disclosure=disclosure, title='E1-6')
+
+        document = Document.objects.create(
+            user=self.user, file_name='report.pdf', file_path='documents/report.pdf', file_size=1, file_type='pdf'
+        )
+        # Even chunks 0..18 are the top 10 (best first); each has an odd neighbour outside the top 10
+        self.chunks = [
+            DocumentChunk.objects.create(document=document, chunk_index=i, content=f'chunk {i}')
+            for i in range(24)
+        ]
+        self.vectors = np.array(
+            [[1.0, 0.01 * i] if i % 2 == 0 and i < 20 else [0.2, 1.0] for i in range(24)], dtype=np.float32
+        )
+
+    def _matrix(self, chunks):
+        return ChunkEmbeddingMatrix([chunk.id for chunk in chunks], self.vectors)
+
+    def test_low_confidence_expands_with_neighbors(self):
+        openai_service = MagicMock()
+        openai_service.client.chat.completions.create.side_effect = [
+            _completion('Scope 1 emissions?\nGHG totals?'),
+            _completion('Answer from the report.'),
+        ]
+        embedding_service = MagicMock()
+        embedding_service.embed_queries.side_effect = lambda queries: [[1.0, 0.0] for _ in queries]
+
+        with patch('api.conversation_api.OpenAIService', return_value=openai_service), \
+                patch('api.conversation_api.track_openai_usage'), \
+                patch('accounts.rag_engine.HybridRAGEngine.open_fresh', return_value=None), \
+                patch('accounts.embedding_store.serving_embedding_service', return_value=embedding_service), \
+                patch('accounts.hybrid_scoring.ChunkEmbeddingMatrix.from_chunks', side_effect=self._matrix):
+            response = self.client.post(
+                f'/api/esrs/conversation/message/{self.thread.id}',
+                data=json.dumps({'message': 'What are our scope 1 emissions?'}),
+                content_type='application/json',
+                HTTP_AUTHORIZATION=f'Bearer {create_access_token(self.user.id)}'
+            )
+
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        steps = {step['step']: step for step in body['processing_steps']}
+        self.assertEqual(steps['document_expansion']['status'], 'completed')
+
+        sources = body['ai_sources']
+        self.assertEqual([s['chunk_index'] for s in sources[:4]], [0, 1, 2, 3])
+        self.assertEqual([s['chunk_type'] for s in sources[:4]], ['main', 'neighbor', 'main', 'neighbor'])
+        self.assertLess(sources[1]['hybrid_score'], sources[0]['hybrid_score'])
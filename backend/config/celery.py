@@ -1,5 +1,7 @@
+import logging
 import os
 from celery import Celery
+from celery.signals import worker_process_init
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
@@ -13,6 +15,20 @@ app.autodiscover_tasks(['accounts.document_rag_tasks'], related_name='')
 # Import website scraper tasks explicitly
 app.autodiscover_tasks(['accounts.website_scraper_task'], related_name='')
 
+
+@worker_process_init.connect
+def preload_local_models(**kwargs):
+    """Load local models once per worker process so the first task does not pay for it"""
+    from django.conf import settings
+    from accounts.model_registry import get_model_registry
+
+    keys = getattr(settings, 'RAG_PRELOAD_MODELS', [])
+    if keys:
+        registry = get_model_registry()
+        registry.preload(keys)
+        logging.getLogger(__name__).info(f"[Celery] Preloaded local models: {registry.stats()}")
+
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
@@ -93,6 +93,11 @@ CACHES = {
     }
 }
 
+# Query embedding cache: per-process LRU in front of Redis
+EMBEDDING_CACHE_MAX_ENTRIES = config('EMBEDDING_CACHE_MAX_ENTRIES', default=1024, cast=int)
+EMBEDDING_CACHE_LOCAL_TTL = config('EMBEDDING_CACHE_LOCAL_TTL', default=3600, cast=int)
+EMBEDDING_CACHE_REDIS_TTL = config('EMBEDDING_CACHE_REDIS_TTL', default=7 * 24 * 3600, cast=int)
+
 # Celery Configuration
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://127.0.0.1:6379/0')
 CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://127.0.0.1:6379/0')
@@ -100,6 +105,13 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+# Honour per-message priority on Redis (0 = default/interactive first, 9 = bulk jobs last)
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -123,6 +135,65 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads larger than this are spooled to a temp file instead of memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = config('FILE_UPLOAD_MAX_MEMORY_SIZE', default=2621440, cast=int)
+
+# Processes used for PDF text extraction / OCR of one document (0 = min(4, CPUs))
+PDF_EXTRACT_WORKERS = config('PDF_EXTRACT_WORKERS', default=0, cast=int)
+
+# Largest document accepted by the resumable upload API (/documents/uploads/...)
+DOCUMENT_UPLOAD_MAX_SIZE = config('DOCUMENT_UPLOAD_MAX_SIZE', default=500 * 1024 * 1024, cast=int)
+
+# Memory-mapped RAG embedding snapshots (must be on a volume shared by backend and celery workers)
+RAG_SNAPSHOT_ROOT = config('RAG_SNAPSHOT_ROOT', default=str(MEDIA_ROOT / 'rag_snapshots'))
+
+# TIER 2 document expansion: neighbouring chunks added on each side of a top chunk
+RAG_TIER2_NEIGHBOR_WINDOW = config('RAG_TIER2_NEIGHBOR_WINDOW', default=1, cast=int)
+
+# Minimum number of ESRS-tagged chunks a document needs before topic prefiltering is used for it (otherwise all its chunks are searched)
+RAG_PREFILTER_MIN_CHUNKS = config('RAG_PREFILTER_MIN_CHUNKS', default=30, cast=int)
+
+# First-stage ANN over compact shadow vectors, then exact rescoring of the shortlist
+# 'auto' (256-d Matryoshka prefix when the model supports it, else binary), 'binary' or 'off'
+RAG_SHADOW_VECTORS = config('RAG_SHADOW_VECTORS', default='auto')
+RAG_SHADOW_CANDIDATES = config('RAG_SHADOW_CANDIDATES', default=400, cast=int)
+
+# Fail instead of falling back to approximate regex token counts when tiktoken's encoding cannot be loaded
+TOKENIZER_REQUIRE_TIKTOKEN = config('TOKENIZER_REQUIRE_TIKTOKEN', default=not DEBUG, cast=bool)
+
+# Local cross-encoder rerank stage (sentence-transformers, CPU); the default is multilingual because most
+# documents are not in English (bge-reranker-base/large only handle English and Chinese) and small
+# (~118M params vs ~568M for bge-reranker-v2-m3) - time alternatives with `manage.py benchmark_reranker`
+RAG_RERANKER_ENABLED = config('RAG_RERANKER_ENABLED', default=True, cast=bool)
+RAG_RERANKER_MODEL = config('RAG_RERANKER_MODEL', default='mmarco-mMiniLMv2-L12-H384-v1')
+# Hybrid candidates scored per query, tokens per (query, chunk) pair and int8 dynamic quantization
+RAG_RERANKER_CANDIDATES = config('RAG_RERANKER_CANDIDATES', default=30, cast=int)
+RAG_RERANKER_MAX_LENGTH = config('RAG_RERANKER_MAX_LENGTH', default=256, cast=int)
+RAG_RERANKER_QUANTIZE = config('RAG_RERANKER_QUANTIZE', default=True, cast=bool)
+
+# Hosted embedding requests: parallel requests per embed_batch call and retries on 429/5xx
+EMBEDDING_MAX_CONCURRENCY = config('EMBEDDING_MAX_CONCURRENCY', default=4, cast=int)
+EMBEDDING_MAX_RETRIES = config('EMBEDDING_MAX_RETRIES', default=5, cast=int)
+
+# Provider token budgets per minute, shared by all processes (0 = unlimited)
+# Bulk reprocessing only uses RAG_REPROCESS_BUDGET_SHARE of them, the rest stays for interactive work
+EMBEDDING_TOKENS_PER_MINUTE = config('EMBEDDING_TOKENS_PER_MINUTE', default=1000000, cast=int)
+ANTHROPIC_TOKENS_PER_MINUTE = config('ANTHROPIC_TOKENS_PER_MINUTE', default=40000, cast=int)
+RAG_REPROCESS_BUDGET_SHARE = config('RAG_REPROCESS_BUDGET_SHARE', default=0.5, cast=float)
+
+# Local embedding provider (sentence-transformers on CPU)
+LOCAL_EMBEDDING_BACKEND = config('LOCAL_EMBEDDING_BACKEND', default='torch')  # 'torch' or 'onnx'
+LOCAL_EMBEDDING_QUANTIZE = config('LOCAL_EMBEDDING_QUANTIZE', default=True, cast=bool)
+LOCAL_EMBEDDING_BATCH_SIZE = config('LOCAL_EMBEDDING_BATCH_SIZE', default=32, cast=int)
+
+# Local models loaded when a Celery worker process starts ('kind:name', comma separated, e.g.
+# 'cross-encoder:cross-encoder/mmarco-mMiniLMv2-L12-H384-v1'). Off by default: every prefork process loads
+# its own copy (bge-reranker-v2-m3 is ~2 GB fp32 per process), so only preload with a concurrency and
+# RAG_MODEL_MEMORY_BUDGET_MB that fit the host - otherwise models load on first use
+RAG_PRELOAD_MODELS = config('RAG_PRELOAD_MODELS', default='', cast=Csv())
+# Unload least recently used local models above this many MB (0 = no limit)
+RAG_MODEL_MEMORY_BUDGET_MB = config('RAG_MODEL_MEMORY_BUDGET_MB', default=0, cast=int)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # CORS